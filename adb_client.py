@@ -0,0 +1,347 @@
+import os, re, socket, select, struct, threading, queue, io
+
+
+class AdbError(RuntimeError):
+    pass
+
+
+class AdbSentError(AdbError):
+    """
+    คำสั่งถูกเขียนไปถึงเครื่องแล้วแต่ไม่ได้ผลกลับ (timeout / หลุด) — ห้ามส่งซ้ำ เครื่องอาจรันไปแล้ว
+    """
+
+
+EXIT_MARK = "@@EXIT"
+
+
+def split_exit(text):
+    """
+    output ของ `cmd; echo "@@EXIT $?"` -> (output, rc); ไม่มี marker (หลุดก่อนคำสั่งจบ) -> rc=1
+    """
+    i = text.rfind(EXIT_MARK)
+    m = re.match(rf"{EXIT_MARK} (\d+)\s*$", text[i:]) if i >= 0 and (i == 0 or text[i - 1] == "\n") else None
+    return (text[:i], int(m.group(1))) if m else (text, 1)
+
+
+def _recv_exact(sock, n):
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise AdbError("connection closed by adb server")
+        buf += chunk
+    return buf
+
+
+def _status(sock):
+    st = _recv_exact(sock, 4)
+    if st == b"OKAY":
+        return
+    if st == b"FAIL":
+        n = int(_recv_exact(sock, 4), 16)
+        raise AdbError(_recv_exact(sock, n).decode("utf-8", "replace"))
+    raise AdbError(f"bad status {st!r}")
+
+
+def _read_hex_block(sock):
+    n = int(_recv_exact(sock, 4), 16)
+    return _recv_exact(sock, n) if n else b""
+
+
+class _ShellPipe(io.TextIOBase):
+    """
+    ฝั่งเขียนของ SocketShell: close() ส่ง "exit" แทนการปิด socket
+    (adb ไม่มี half-close ถ้าปิดเลยคำสั่งที่ค้างอยู่จะโดนตัด)
+    ก่อน exit พิมพ์ exit marker ให้ SocketShell รู้ว่า shell จบครบ
+    """
+    def __init__(self, sock):
+        self._sock = sock
+        self._buf = []
+
+    def write(self, s):
+        self._buf.append(s)
+        return len(s)
+
+    def flush(self):
+        if self._buf:
+            self._sock.sendall("".join(self._buf).encode("utf-8"))
+            self._buf = []
+
+    def close(self):
+        if not self.closed:
+            try:
+                self.write(f'echo "{EXIT_MARK} $?"\nexit\n'); self.flush()
+            except OSError:
+                pass
+        super().close()
+
+
+class _Lines:
+    """
+    stdout ของ SocketShell: iterate ได้ทีละบรรทัดเหมือน pipe
+    """
+    def __init__(self):
+        self.q = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            line = self.q.get()
+            if line is None:
+                self.q.put(None)
+                return
+            yield line
+
+    def read(self):
+        return "".join(self)
+
+
+class SocketShell:
+    """
+    หน้าตาเหมือน subprocess.Popen (stdin/stdout/stderr/wait/kill) แต่คุยผ่าน socket ของ adb server
+    returncode มาจากบรรทัด "@@EXIT <rc>" ท้าย stream; stream จบโดยไม่มี marker = หลุด (rc=1)
+    """
+    def __init__(self, sock):
+        self._sock = sock
+        self.stdin = _ShellPipe(sock)
+        self.stdout = _Lines()
+        self.stderr = io.StringIO("")
+        self.returncode = None
+        self._exit = None
+        self._pump = threading.Thread(target=self._read, daemon=True)
+        self._pump.start()
+
+    def _read(self):
+        try:
+            for line in self._sock.makefile("r", encoding="utf-8", errors="replace", newline="\n"):
+                m = re.match(rf"{EXIT_MARK} (\d+)\s*$", line)
+                if m:
+                    self._exit = int(m.group(1))
+                    continue
+                self.stdout.q.put(line)
+        except (OSError, ValueError):
+            pass
+        self.stdout.q.put(None)
+
+    def wait(self, timeout=None):
+        self._pump.join(timeout)
+        if self.returncode is None and not self._pump.is_alive():
+            self.returncode = 1 if self._exit is None else self._exit
+        return self.returncode
+
+    def kill(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self.returncode = -9
+
+
+class _Session:
+    """
+    shell:sh ค้างไว้ต่อเครื่อง ใช้ถามคำสั่งสั้นๆ ซ้ำได้โดยไม่เปิด connection ใหม่
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        self.lock = threading.Lock()
+        self.seq = 0
+
+    def alive(self):
+        # ปลายทางปิดไปแล้ว = อ่านได้ทันทีและได้ 0 ไบต์
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            return not readable or self.sock.recv(1, socket.MSG_PEEK) != b""
+        except (OSError, ValueError):
+            return False
+
+    def run(self, cmd):
+        """
+        -> (output, rc); หลังเขียนคำสั่งไปแล้วถ้าพัง = AdbSentError (ห้ามส่งซ้ำ)
+        """
+        with self.lock:
+            self.seq += 1
+            mark = f"@@END{self.seq}:"
+            self.sock.sendall(f"{cmd} 2>&1; echo \"{mark}$?\"\n".encode("utf-8"))
+            out = []
+            try:
+                while True:
+                    line = self.reader.readline()
+                    if not line:
+                        raise AdbError("shell session closed")
+                    text = line.decode("utf-8", "replace")
+                    i = text.find(mark)
+                    if i >= 0:
+                        out.append(text[:i])
+                        rc = text[i + len(mark):].strip()
+                        return "".join(out), int(rc) if rc.isdigit() else 1
+                    out.append(text)
+            except (OSError, AdbError) as e:
+                raise AdbSentError(f"{cmd}: {e or 'timeout'}") from e
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class AdbClient:
+    """
+    client แบบ pure-Python ที่คุย smart-socket protocol กับ adb server (port 5037) โดยตรง
+    ไม่ต้อง spawn adb.exe ทุกครั้ง
+    """
+    def __init__(self, host="127.0.0.1", port=None, timeout=5.0):
+        self.host = host
+        self.port = port or int(os.environ.get("ANDROID_ADB_SERVER_PORT", 5037))
+        self.timeout = timeout
+        self._sessions = {}
+        self._serial_locks = {}
+        self._lock = threading.Lock()  # กันเฉพาะ dict; การต่อ/handshake ใช้ lock ของแต่ละ serial
+
+    def _connect(self, timeout=None):
+        sock = socket.create_connection((self.host, self.port), timeout=timeout or self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _request(self, sock, req):
+        data = req.encode("utf-8")
+        sock.sendall(b"%04x" % len(data) + data)
+        _status(sock)
+
+    def _transport(self, serial, timeout=None):
+        sock = self._connect(timeout)
+        try:
+            self._request(sock, f"host:transport:{serial}")
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    # host services
+    def version(self):
+        with self._connect() as sock:
+            self._request(sock, "host:version")
+            return int(_read_hex_block(sock), 16)
+
+    def available(self):
+        try:
+            self.version()
+            return True
+        except (OSError, AdbError, ValueError):
+            return False
+
+    def devices(self):
+        """
+        -> {serial: state}
+        """
+        with self._connect() as sock:
+            self._request(sock, "host:devices")
+            return parse_device_list(_read_hex_block(sock).decode("utf-8", "replace"))
+
+    def track_devices(self):
+        """
+        คืน file object ของ stream host:track-devices (snapshot = 4 หลัก hex + payload)
+        """
+        sock = self._connect()
+        self._request(sock, "host:track-devices")
+        sock.settimeout(None)
+        return sock, sock.makefile("rb")
+
+    # device services
+    def _session(self, serial):
+        # session ของ serial (ต่อใหม่ถ้ายังไม่มี/ตายแล้ว) เครื่องที่ค้างตอนต่อไม่ถ่วงเครื่องอื่น
+        with self._lock:
+            lock = self._serial_locks.setdefault(serial, threading.Lock())
+        with lock:
+            with self._lock:
+                sess = self._sessions.get(serial)
+            if sess is not None and not sess.alive():
+                self.drop(serial)
+                sess = None
+            if sess is None:
+                sock = self._transport(serial)
+                try:
+                    self._request(sock, "shell:sh")
+                except Exception:
+                    sock.close()
+                    raise
+                sess = _Session(sock)
+                with self._lock:
+                    self._sessions[serial] = sess
+            return sess
+
+    def shell(self, serial, cmd, timeout=None):
+        """
+        รันคำสั่งสั้นผ่าน shell session ที่ค้างไว้ -> (output, rc)
+        ลองใหม่เฉพาะตอนต่อ/เขียนไม่สำเร็จ (คำสั่งยังไม่ถึงเครื่อง) หลังเขียนแล้วไม่ส่งซ้ำ (AdbSentError)
+        """
+        for attempt in (0, 1):
+            try:
+                sess = self._session(serial)
+                sess.sock.settimeout(timeout or self.timeout)
+                return sess.run(cmd)
+            except AdbSentError:
+                self.drop(serial)
+                raise
+            except (OSError, AdbError):
+                self.drop(serial)
+                if attempt:
+                    raise
+
+    def open_shell(self, serial, cmd="sh"):
+        """
+        เปิด shell แบบ stream (stdin/stdout) คืน SocketShell
+        cmd อื่นที่ไม่ใช่ "sh" ต่อท้ายด้วย exit marker (sh รับ stdin จะพิมพ์ marker ตอนปิด stdin)
+        """
+        sock = self._transport(serial)
+        if cmd != "sh":
+            cmd = f'{cmd}; echo "{EXIT_MARK} $?"'
+        try:
+            self._request(sock, f"shell:{cmd}")
+        except Exception:
+            sock.close()
+            raise
+        sock.settimeout(None)
+        return SocketShell(sock)
+
+    def push(self, serial, local, remote, mode=0o644):
+        with open(local, "rb") as f:
+            data = f.read()
+        with self._transport(serial, timeout=60) as sock:
+            self._request(sock, "sync:")
+            spec = f"{remote},{0o100000 | mode}".encode("utf-8")
+            sock.sendall(b"SEND" + struct.pack("<I", len(spec)) + spec)
+            for i in range(0, len(data), 64 * 1024):
+                chunk = data[i:i + 64 * 1024]
+                sock.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+            sock.sendall(b"DONE" + struct.pack("<I", int(os.path.getmtime(local))))
+            rid, n = _recv_exact(sock, 4), struct.unpack("<I", _recv_exact(sock, 4))[0]
+            if rid == b"FAIL":
+                raise AdbError(_recv_exact(sock, n).decode("utf-8", "replace"))
+            if rid != b"OKAY":
+                raise AdbError(f"bad sync reply {rid!r}")
+            sock.sendall(b"QUIT" + struct.pack("<I", 0))
+
+    def drop(self, serial=None):
+        """
+        ปิด session ที่ค้างไว้ (เช่น ตอนเครื่องหลุด)
+        """
+        with self._lock:
+            serials = list(self._sessions) if serial is None else [serial]
+            for s in serials:
+                sess = self._sessions.pop(s, None)
+                if sess:
+                    sess.close()
+
+
+def parse_device_list(text):
+    """
+    "serial\tstate\n..." -> {serial: state}
+    """
+    devs = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 2:
+            devs[parts[0]] = parts[1]
+    return devs
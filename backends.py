@@ -0,0 +1,190 @@
+import re
+
+import numpy as np
+
+from utils import run_adb
+from draw_core import generate_swipe_commands, sample_points, simplify_points
+from strokes import CommandBlob
+
+
+class _Backend:
+    def encode(self, strokes):
+        """
+        StrokeSet -> CommandBlob (bytes ก้อนเดียว)
+        """
+        return CommandBlob.from_lines(c for pts in strokes for c in self.commands(pts))
+
+    def stroke_ends(self, strokes):
+        """
+        index (ใน CommandBlob) ที่แต่ละเส้นจบ -> เริ่มส่งต่อจากต้นเส้นได้ตอน resume
+        """
+        return np.cumsum([len(self.commands(pts)) for pts in strokes], dtype=np.int64)
+
+
+class SwipeBackend(_Backend):
+    """
+    แบบเดิม: tap + swipe ทีละ segment (นิ้วยกทุก segment)
+    """
+    name = "swipe"
+
+    def __init__(self, seg_ms=35, tap_thresh2=4):
+        self.seg_ms = seg_ms; self.tap_thresh2 = tap_thresh2
+        self.cache_key = f"swipe:{seg_ms}:{tap_thresh2}"
+
+    def commands(self, points):
+        return generate_swipe_commands(points, seg_ms=self.seg_ms, tap_thresh2=self.tap_thresh2)
+
+    def encode(self, strokes):
+        return strokes.command_blob(seg_ms=self.seg_ms, tap_thresh2=self.tap_thresh2)
+
+    def stroke_ends(self, strokes):
+        return np.cumsum(strokes.command_counts())
+
+
+class MotionEventBackend(_Backend):
+    """
+    หนึ่งเส้น = หนึ่ง gesture: input motionevent DOWN → MOVE ... → UP
+    """
+    name = "motionevent"
+    cache_key = "motionevent"
+
+    def commands(self, points):
+        if points is None or len(points) < 1:
+            return []
+        pts = [tuple(map(int, p)) for p in points]
+        cmds = [f"input motionevent DOWN {pts[0][0]} {pts[0][1]}"]
+        for x, y in pts[1:]:
+            cmds.append(f"input motionevent MOVE {x} {y}")
+        cmds.append(f"input motionevent UP {pts[-1][0]} {pts[-1][1]}")
+        return cmds
+
+    def stroke_ends(self, strokes):
+        n = strokes.lengths
+        return np.cumsum(np.where(n >= 1, n + 1, 0))
+
+
+# linux input event codes
+EV_SYN, EV_KEY, EV_ABS = 0, 1, 3
+BTN_TOUCH = 330
+ABS_MT_SLOT, ABS_MT_POSITION_X, ABS_MT_POSITION_Y, ABS_MT_TRACKING_ID = 47, 53, 54, 57
+
+
+def parse_getevent(text):
+    """
+    อ่านผล `getevent -p` → [{node, name, x: (min,max), y: (min,max)}] เฉพาะอุปกรณ์ multi-touch
+    """
+    devs, cur = [], None
+    for line in text.splitlines():
+        m = re.match(r"\s*add device \d+:\s*(\S+)", line)
+        if m:
+            cur = {"node": m.group(1), "name": ""}
+            devs.append(cur); continue
+        if cur is None:
+            continue
+        m = re.match(r'\s*name:\s*"(.*)"', line)
+        if m:
+            cur["name"] = m.group(1); continue
+        m = re.search(r"\b(0035|0036)\s*:\s*value\s*-?\d+,\s*min\s*(-?\d+),\s*max\s*(-?\d+)", line)
+        if m:
+            axis = "x" if m.group(1) == "0035" else "y"
+            cur[axis] = (int(m.group(2)), int(m.group(3)))
+    return [d for d in devs if "x" in d and "y" in d]
+
+
+_touch_cache = {}
+
+
+def probe_touch_device(serial):
+    """
+    หา touch node ของเครื่อง (probe ครั้งเดียวต่อ serial)
+    """
+    if serial in _touch_cache:
+        return _touch_cache[serial]
+    out, err, rc = run_adb(["shell", "getevent", "-p"], serial=serial, timeout=10)
+    if rc != 0:
+        return None
+    devs = parse_getevent(out)
+    # เลือกตัวที่ชื่อบอกว่าเป็น touchscreen ก่อน
+    devs.sort(key=lambda d: 0 if "touch" in d["name"].lower() else 1)
+    _touch_cache[serial] = devs[0] if devs else None
+    return _touch_cache[serial]
+
+
+class SendeventBackend(_Backend):
+    """
+    เขียน event ดิบลง /dev/input/eventN ด้วย sendevent (multi-touch protocol B)
+    ต้อง probe อุปกรณ์ก่อนด้วย probe_touch_device()
+    """
+    name = "sendevent"
+
+    def __init__(self, device, screen_w, screen_h):
+        self.node = device["node"]
+        self.x = device["x"]; self.y = device["y"]
+        self.screen_w = screen_w; self.screen_h = screen_h
+        self.cache_key = f"sendevent:{self.node}:{self.x}:{self.y}:{screen_w}x{screen_h}"
+
+    def _abs(self, x, y):
+        (x0, x1), (y0, y1) = self.x, self.y
+        ax = x0 + int(round(int(x) * (x1 - x0) / max(1, self.screen_w - 1)))
+        ay = y0 + int(round(int(y) * (y1 - y0) / max(1, self.screen_h - 1)))
+        return ax, ay
+
+    def _ev(self, *frames):
+        return " ; ".join(f"sendevent {self.node} {t} {c} {v}" for t, c, v in frames)
+
+    def commands(self, points):
+        if points is None or len(points) < 1:
+            return []
+        x, y = self._abs(*points[0])
+        cmds = [self._ev((EV_ABS, ABS_MT_SLOT, 0), (EV_ABS, ABS_MT_TRACKING_ID, 0),
+                         (EV_ABS, ABS_MT_POSITION_X, x), (EV_ABS, ABS_MT_POSITION_Y, y),
+                         (EV_KEY, BTN_TOUCH, 1), (EV_SYN, 0, 0))]
+        for p in points[1:]:
+            x, y = self._abs(*p)
+            cmds.append(self._ev((EV_ABS, ABS_MT_POSITION_X, x), (EV_ABS, ABS_MT_POSITION_Y, y),
+                                 (EV_SYN, 0, 0)))
+        cmds.append(self._ev((EV_ABS, ABS_MT_TRACKING_ID, 4294967295),
+                             (EV_KEY, BTN_TOUCH, 0), (EV_SYN, 0, 0)))
+        return cmds
+
+
+BACKENDS = ("auto", "swipe", "motionevent", "sendevent")
+
+_input_cache = {}
+
+
+def supports_motionevent(serial):
+    if serial not in _input_cache:
+        out, err, rc = run_adb(["shell", "input"], serial=serial, timeout=10)
+        _input_cache[serial] = "motionevent" in (out + err)
+    return _input_cache[serial]
+
+
+def pick_backend(serial, prefer="auto", seg_ms=35, screen_size=None):
+    """
+    เลือก backend ตามอุปกรณ์
+    - auto: swipe (แบบเดิม) — backend อื่นต้องเลือกเอง
+    - motionevent: ใช้ได้ถ้า `input` รองรับ ไม่งั้นถอยไป swipe
+    - sendevent: ใช้ได้ถ้า probe เจอ touch node (ต้องรู้ screen_size) ไม่งั้นถอยไป swipe
+    """
+    if prefer == "sendevent" and screen_size:
+        dev = probe_touch_device(serial)
+        if dev:
+            return SendeventBackend(dev, *screen_size)
+    if prefer == "motionevent" and supports_motionevent(serial):
+        return MotionEventBackend()
+    return SwipeBackend(seg_ms=seg_ms)
+
+
+def iter_stroke_commands(contours, backend, step=6, simplify_tol=None, cancel_check=None):
+    """
+    สร้างคำสั่งทีละเส้นแบบ lazy -> yield (คำสั่งของเส้นนั้น, จำนวนจุดของ contour)
+    """
+    for c in contours:
+        if cancel_check and cancel_check():
+            return
+        if simplify_tol is not None:
+            pts = simplify_points(c, tolerance=simplify_tol)
+        else:
+            pts = sample_points(c, step=step)
+        yield backend.commands(pts), len(c)
@@ -0,0 +1,270 @@
+import os, sys, json, time, argparse, tempfile, tracemalloc, platform
+
+import numpy as np
+import cv2
+
+from draw_core import (
+    preprocess_image, extract_contours, sample_points, simplify_points,
+    order_strokes, generate_swipe_commands, load_gray, _imread_any, thin_zhang_suen, prune_strokes, hatch_fill
+)
+from strokes import StrokeSet
+
+RESOLUTIONS = [(720, 1612), (1080, 2400), (1440, 3200)]
+LOADER_SOURCE = (7952, 5304)  # ~42MP ขนาดรูปจากกล้อง
+SAMPLE_IMAGES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "Preview.png")]
+
+
+def synthetic_image(path, w, h, seed=0):
+    """
+    ภาพทดสอบ: วงกลม สี่เหลี่ยม เส้นสุ่ม และตัวหนังสือ บนพื้นขาว
+    """
+    rng = np.random.default_rng(seed)
+    img = np.full((h, w, 3), 255, np.uint8)
+    for _ in range(40):
+        c = tuple(int(v) for v in rng.integers(0, 200, 3))
+        kind = rng.integers(0, 3)
+        x, y = int(rng.integers(0, w)), int(rng.integers(0, h))
+        if kind == 0:
+            cv2.circle(img, (x, y), int(rng.integers(10, w // 6)), c, int(rng.integers(1, 5)))
+        elif kind == 1:
+            cv2.rectangle(img, (x, y), (x + int(rng.integers(20, w // 4)), y + int(rng.integers(20, h // 6))), c, 2)
+        else:
+            cv2.line(img, (x, y), (int(rng.integers(0, w)), int(rng.integers(0, h))), c, int(rng.integers(1, 4)))
+    cv2.putText(img, "InsDraw", (w // 10, h // 2), cv2.FONT_HERSHEY_SIMPLEX, w / 300, (0, 0, 0), max(2, w // 200))
+    cv2.imwrite(path, img)
+    return path
+
+
+class Recorder:
+    """
+    เก็บเวลา (wall) และ peak memory (tracemalloc: เฉพาะ allocation ฝั่ง Python/NumPy) ต่อ stage
+    รันสองรอบ: รอบแรกจับเวลาอย่างเดียว รอบสองวัด memory (tracemalloc ทำให้ loop Python ช้าลง)
+    """
+    def __init__(self):
+        self.stages = {}
+
+    def measure(self, name, fn, *args, **kw):
+        t0 = time.perf_counter()
+        out = fn(*args, **kw)
+        dt = time.perf_counter() - t0
+        tracemalloc.start()
+        fn(*args, **kw)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.stages[name] = {"time_s": round(dt, 5), "peak_mb": round(peak / 2**20, 3)}
+        return out
+
+
+def bench_pipeline(path, W, H, step=6, tol=1.5, seg_ms=18):
+    rec = Recorder()
+    mask = rec.measure("preprocess_image", preprocess_image, path, W, H, blur=3)
+    contours = rec.measure("extract_contours", extract_contours, mask, min_area=80)
+    stepped = rec.measure("sample_points", lambda: [sample_points(c, step=step) for c in contours])
+    simple = rec.measure("simplify_points", lambda: [simplify_points(c, tolerance=tol) for c in contours])
+    pruned = rec.measure("prune_strokes", prune_strokes, contours, W, H)
+    ordered = rec.measure("order_strokes", order_strokes, stepped)
+
+    def gen(strokes):
+        cmds = []
+        for pts in strokes:
+            cmds.extend(generate_swipe_commands(pts, seg_ms=seg_ms))
+        return cmds
+    cmds = rec.measure("generate_swipe_commands", gen, ordered)
+    rec.measure("StrokeSet.command_bytes", lambda: StrokeSet.from_polylines(ordered).command_bytes(seg_ms=seg_ms))
+    cmds_simple = gen(simple)
+    return {
+        "stages": rec.stages,
+        "contours": len(contours),
+        "commands_step": len(cmds),
+        "commands_simplify": len(cmds_simple),
+        "commands_pruned": StrokeSet.from_polylines([sample_points(c, step=step) for c in pruned]).command_count(),
+    }
+
+
+def bench_loader(tmp, W=1080, H=2400, size=LOADER_SOURCE):
+    """
+    โหลดภาพใหญ่: decode เต็ม (ทางเดิม) เทียบกับ load_gray (draft/reduce/memmap)
+    peak_mb นับเฉพาะ allocation ที่ tracemalloc เห็น (buffer ภายใน PIL ไม่นับ)
+    """
+    base = synthetic_image(os.path.join(tmp, "loader.png"), *size)
+    src = cv2.imread(base)
+    paths = {"png": base, "jpg": os.path.join(tmp, "loader.jpg"), "npy": os.path.join(tmp, "loader.npy")}
+    cv2.imwrite(paths["jpg"], src, [cv2.IMWRITE_JPEG_QUALITY, 92])
+    np.save(paths["npy"], cv2.cvtColor(src, cv2.COLOR_BGR2GRAY))
+    del src
+    out = {}
+    for kind, p in paths.items():
+        rec = Recorder()
+        if kind != "npy":
+            rec.measure("full_decode", _imread_any, p)
+        rec.measure("load_gray", load_gray, p, W, H)
+        out[kind] = rec.stages
+    return {"source": list(size), "target": [W, H], "formats": out}
+
+
+def bench_thinning(path, W, H, step=6):
+    """
+    thinning: NumPy Zhang–Suen เทียบกับ cv2.ximgproc (ถ้ามี) และแบบไม่ thin -> เวลา + จำนวนคำสั่ง
+    """
+    raw = preprocess_image(path, W, H, blur=3, try_skeleton=False)
+    impls = {"none": lambda m: m, "numpy": thin_zhang_suen}
+    if hasattr(cv2, "ximgproc"):
+        impls["opencv-contrib"] = cv2.ximgproc.thinning
+    out = {}
+    for name, fn in impls.items():
+        rec = Recorder()
+        mask = rec.measure("thin", fn, raw)
+        contours = extract_contours(mask, min_area=80)
+        out[name] = dict(rec.stages["thin"], contours=len(contours),
+                         commands=StrokeSet.from_polylines([sample_points(c, step=step) for c in contours])
+                         .command_count())
+    return out
+
+
+def bench_hatch(path, W, H, step=6, spacing=6, angle=45.0):
+    """
+    โหมด threshold: ไล่ขอบพื้นที่ทึบ (contour) เทียบกับเติมด้วย hatch_fill -> เวลา + จำนวนคำสั่ง
+    """
+    mask = preprocess_image(path, W, H, blur=3, use_canny=False, try_skeleton=False)
+    rec = Recorder()
+    contours = rec.measure("outline", extract_contours, mask, min_area=80)
+    runs = rec.measure("hatch_fill", hatch_fill, mask, spacing=spacing, angle=angle)
+    return dict(rec.stages, commands_outline=StrokeSet.from_polylines(
+                    [sample_points(c, step=step) for c in contours]).command_count(),
+                commands_hatch=StrokeSet.from_polylines(runs).command_count(), runs=len(runs))
+
+
+FAKE_ADB = """#!{python}
+import sys, time
+args = sys.argv[1:]
+if args[:1] == ["-s"]:
+    args = args[2:]
+if args == ["shell"]:
+    t0 = time.perf_counter(); n = 0
+    for line in sys.stdin:
+        if line.startswith("echo "):
+            print(line[5:].strip(), flush=True)
+        else:
+            n += 1
+    with open({log!r}, "w") as f:
+        f.write("%d %f" % (n, time.perf_counter() - t0))
+"""
+
+
+def bench_send(n=5000, sleep_ms=0, window=0):
+    """
+    วัด run_adb_batch กับ fake adb (Python script ที่นับบรรทัดที่ได้รับ) -> commands/s
+    """
+    import utils
+    if os.name == "nt":
+        return {"skipped": "fake adb script needs a POSIX shebang"}
+    with tempfile.TemporaryDirectory(prefix="insdraw_bench_") as tmp:
+        log = os.path.join(tmp, "received")
+        fake = os.path.join(tmp, "adb")
+        with open(fake, "w") as f:
+            f.write(FAKE_ADB.format(python=sys.executable, log=log))
+        os.chmod(fake, 0o755)
+        old = utils.ADB, utils.USE_NATIVE
+        utils.ADB, utils.USE_NATIVE = fake, False
+        try:
+            cmds = [f"input swipe {i % 700} {i % 1500} {(i + 7) % 700} {(i + 3) % 1500} 18" for i in range(n)]
+            t0 = time.perf_counter()
+            rc, err = utils.run_adb_batch("BENCH", cmds, sleep_ms=sleep_ms, window=window)
+            dt = time.perf_counter() - t0
+        finally:
+            utils.ADB, utils.USE_NATIVE = old
+        with open(log) as f:
+            received, dev_dt = f.read().split()
+    return {
+        "commands": n, "received": int(received), "rc": rc,
+        "host_cmds_per_s": round(n / dt, 1),
+        "fake_received_cmds_per_s": round(int(received) / max(float(dev_dt), 1e-9), 1),
+        "sleep_ms": sleep_ms, "window": window,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    เทียบกับผลรอบก่อน: stage ที่ช้าลงเกิน threshold (สัดส่วน) ถือว่า regression
+    """
+    regressions = []
+    base_runs = {(r["image"], tuple(r["size"])): r for r in baseline.get("pipeline", [])}
+    for r in results["pipeline"]:
+        b = base_runs.get((r["image"], tuple(r["size"])))
+        if not b:
+            continue
+        for stage, m in r["stages"].items():
+            old = b["stages"].get(stage, {}).get("time_s")
+            if old and old > 1e-4 and m["time_s"] > old * (1 + threshold):
+                regressions.append(f"{r['image']} {r['size'][0]}x{r['size'][1]} {stage}: "
+                                   f"{old:.4f}s -> {m['time_s']:.4f}s")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="InsDraw pipeline + ADB send benchmarks")
+    ap.add_argument("-o", "--out", default="bench.json")
+    ap.add_argument("--compare", metavar="BASELINE.json")
+    ap.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging (0.15 = 15%%)")
+    ap.add_argument("--images", nargs="*", default=None, help="extra sample images")
+    ap.add_argument("--send-n", type=int, default=5000)
+    ap.add_argument("--no-send", action="store_true")
+    ap.add_argument("--no-loader", action="store_true")
+    args = ap.parse_args(argv)
+
+    images = [p for p in (args.images or SAMPLE_IMAGES) if os.path.exists(p)]
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "numpy": np.__version__, "opencv": cv2.__version__,
+        "pipeline": [], "send": [], "loader": None,
+    }
+    # ภาพสังเคราะห์ / ภาพใหญ่ของ bench_loader ลบทิ้งเมื่อจบ
+    with tempfile.TemporaryDirectory(prefix="insdraw_bench_") as tmp:
+        for W, H in RESOLUTIONS:
+            jobs = [("synthetic", synthetic_image(os.path.join(tmp, f"syn_{W}x{H}.png"), W, H))]
+            jobs += [(os.path.basename(p), p) for p in images]
+            for name, path in jobs:
+                r = bench_pipeline(path, W, H)
+                r.update(image=name, size=[W, H])
+                results["pipeline"].append(r)
+                total = sum(m["time_s"] for m in r["stages"].values())
+                print(f"{name:>14} {W}x{H}: {total:.3f}s  contours={r['contours']} "
+                      f"cmds(step)={r['commands_step']} cmds(simplify)={r['commands_simplify']} "
+                      f"cmds(pruned)={r['commands_pruned']}")
+                for stage, m in r["stages"].items():
+                    print(f"{'':>16}{stage:<26}{m['time_s']:.4f}s  peak {m['peak_mb']:.1f}MB")
+                r["thinning"] = bench_thinning(path, W, H)
+                for impl, m in r["thinning"].items():
+                    print(f"{'':>16}thin={impl:<21}{m['time_s']:.4f}s  contours={m['contours']} cmds={m['commands']}")
+                h = r["hatch"] = bench_hatch(path, W, H)
+                print(f"{'':>16}{'hatch_fill':<26}{h['hatch_fill']['time_s']:.4f}s  runs={h['runs']} "
+                      f"cmds={h['commands_hatch']} (outline only: {h['commands_outline']})")
+
+        if not args.no_loader:
+            r = results["loader"] = bench_loader(tmp)
+            print(f"image loading {r['source'][0]}x{r['source'][1]} -> {r['target'][0]}x{r['target'][1]}:")
+            for kind, stages in r["formats"].items():
+                for stage, m in stages.items():
+                    print(f"{'':>16}{kind:<4} {stage:<21}{m['time_s']:.4f}s  peak {m['peak_mb']:.1f}MB")
+
+    if not args.no_send:
+        for sleep_ms, window in ((8, 0), (0, 0), (0, 64)):
+            r = bench_send(args.send_n, sleep_ms=sleep_ms, window=window)
+            results["send"].append(r)
+            print(f"run_adb_batch sleep_ms={sleep_ms} window={window}: {r}")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"saved {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print("REGRESSION " + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import os, json, zlib, zipfile, hashlib, tempfile, threading
+from collections import OrderedDict
+
+import numpy as np
+
+from draw_core import preprocess_image, extract_contours, prune_strokes, hatch_fill, THINNING, MASK_VERSION
+from strokes import CommandBlob, StrokeSet
+
+
+DEFAULT_DIR = os.environ.get("INSDRAW_CACHE", os.path.join(os.path.expanduser("~"), ".insdraw", "cache"))
+
+
+def pack_strokes(strokes):
+    """
+    list ของ (N,2) -> coords (M,2) int32 + offsets (K+1,)
+    """
+    offsets = np.zeros(len(strokes) + 1, dtype=np.int64)
+    if strokes:
+        offsets[1:] = np.cumsum([len(s) for s in strokes])
+        coords = np.concatenate([np.asarray(s, dtype=np.int32).reshape(-1, 2) for s in strokes])
+    else:
+        coords = np.zeros((0, 2), dtype=np.int32)
+    return coords, offsets
+
+
+def unpack_strokes(coords, offsets):
+    return [coords[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def save_strokes(path, strokes, W, H, **meta):
+    """
+    บันทึกงานที่ compile แล้ว (.npz): coords/offsets + ขนาดจอ + พารามิเตอร์
+    """
+    coords, offsets = pack_strokes(strokes)
+    np.savez_compressed(path, coords=coords, offsets=offsets, size=np.array([W, H]),
+                        meta=np.array(json.dumps(meta)))
+
+
+def load_strokes(path):
+    """
+    -> (strokes, (W, H), meta)
+    """
+    with np.load(path) as z:
+        strokes = unpack_strokes(z["coords"], z["offsets"])
+        W, H = (int(v) for v in z["size"])
+        meta = json.loads(str(z["meta"]))
+    return strokes, (W, H), meta
+
+
+def pack_commands(cmds):
+    if not isinstance(cmds, CommandBlob):
+        cmds = CommandBlob.from_lines(cmds)
+    return np.frombuffer(cmds.tobytes(), dtype=np.uint8)
+
+
+def unpack_commands(buf):
+    return CommandBlob(buf.tobytes())
+
+
+class JobCache:
+    """
+    cache ผล mask / contours / commands โดยใช้ hash ของเนื้อไฟล์ + พารามิเตอร์ทั้งหมดเป็น key
+    - memory: LRU mem_items รายการล่าสุด
+    - disk: .npz (compressed) ใน cache_dir, ลบตัวที่ใช้ล่าสุดนานสุดเมื่อขนาดรวมเกิน max_bytes
+    """
+    def __init__(self, cache_dir=DEFAULT_DIR, mem_items=16, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.mem_items = mem_items
+        self.max_bytes = max_bytes
+        self._mem = OrderedDict()
+        self._digests = {}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def file_digest(self, path):
+        # hash เนื้อไฟล์ (จำไว้ตาม mtime/size จะได้ไม่อ่านไฟล์ซ้ำ)
+        st = os.stat(path)
+        stamp = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        digest = self._digests.get(stamp)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            digest = self._digests[stamp] = h.hexdigest()
+        return digest
+
+    def key(self, path, kind, **params):
+        blob = json.dumps([self.file_digest(path), kind, params], sort_keys=True, default=str)
+        return f"{kind}-{hashlib.sha256(blob.encode('utf-8')).hexdigest()[:40]}"
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def get(self, key):
+        """
+        -> dict ของ array หรือ None
+        """
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                return self._mem[key]
+        if not self.cache_dir:
+            return None
+        p = self._disk_path(key)
+        try:
+            with np.load(p) as z:
+                entry = {k: z[k] for k in z.files}
+            os.utime(p)
+        except OSError:
+            return None
+        except (ValueError, EOFError, zipfile.BadZipFile, zlib.error):
+            # ไฟล์เสีย (ถูกตัด / เขียนไม่จบ) = miss แล้วลบทิ้ง
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, **arrays):
+        self._remember(key, arrays)
+        if not self.cache_dir:
+            return
+        p = self._disk_path(key)
+        # ชื่อชั่วคราวไม่ลงท้าย .npz: _evict()/clear() ของ writer อื่นจะได้ไม่นับ/ลบไฟล์ที่กำลังเขียน
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=key + ".", suffix=".npz.tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp, p)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._mem[key] = entry
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.mem_items:
+                self._mem.popitem(last=False)
+
+    def _evict(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            p = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        total = sum(f[1] for f in files)
+        for _, size, p in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    # shortcuts ของ pipeline
+    def mask(self, path, W, H, **pre):
+        key = self.key(path, "mask", W=W, H=H, thinning=THINNING, version=MASK_VERSION, **pre)
+        hit = self.get(key)
+        if hit is not None:
+            return hit["mask"]
+        mask = preprocess_image(path, W, H, **pre)
+        self.put(key, mask=mask)
+        return mask
+
+    def contours(self, path, W, H, min_area=80, prune=False, brush_radius=1, **pre):
+        extra = {"prune": brush_radius} if prune else {}
+        key = self.key(path, "contours", W=W, H=H, min_area=min_area, thinning=THINNING, version=MASK_VERSION,
+                       **extra, **pre)
+        hit = self.get(key)
+        if hit is not None:
+            return unpack_strokes(hit["coords"], hit["offsets"])
+        if prune:
+            contours = prune_strokes(self.contours(path, W, H, min_area=min_area, **pre), W, H, radius=brush_radius)
+        else:
+            contours = extract_contours(self.mask(path, W, H, **pre), min_area=min_area)
+        coords, offsets = pack_strokes(contours)
+        self.put(key, coords=coords, offsets=offsets)
+        return contours
+
+    def hatch(self, path, W, H, spacing=6, angle=45.0, min_area=80, **pre):
+        """
+        เส้น hatch ที่เติมพื้นที่ทึบของ mask แบบ threshold (เรียง serpentine แล้ว)
+        """
+        key = self.key(path, "hatch", W=W, H=H, spacing=spacing, angle=angle, min_area=min_area,
+                       version=MASK_VERSION, **pre)
+        hit = self.get(key)
+        if hit is not None:
+            return unpack_strokes(hit["coords"], hit["offsets"])
+        mask = self.mask(path, W, H, use_canny=False, try_skeleton=False, **pre)
+        runs = hatch_fill(mask, spacing=spacing, angle=angle, min_area=min_area)
+        coords, offsets = pack_strokes(runs)
+        self.put(key, coords=coords, offsets=offsets)
+        return runs
+
+    def get_commands(self, key):
+        """
+        -> CommandBlob หรือ None
+        """
+        hit = self.get(key)
+        return None if hit is None else unpack_commands(hit["cmds"])
+
+    def get_strokes(self, key):
+        """
+        -> StrokeSet ที่ใช้สร้างคำสั่งของ key นี้ หรือ None (entry เก่าที่ไม่ได้เก็บไว้)
+        """
+        hit = self.get(key)
+        if hit is None or "coords" not in hit:
+            return None
+        return StrokeSet(hit["coords"], hit["offsets"])
+
+    def put_commands(self, key, cmds, strokes=None):
+        extra = {} if strokes is None else {"coords": strokes.coords, "offsets": strokes.offsets}
+        self.put(key, cmds=pack_commands(cmds), **extra)
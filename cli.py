@@ -0,0 +1,203 @@
+import os, sys, glob, time, argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from draw_core import build_strokes, THINNING
+from cache import JobCache, save_strokes, load_strokes
+from strokes import StrokeSet
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg")
+
+
+def parse_size(s):
+    w, h = s.lower().split("x")
+    return int(w), int(h)
+
+
+def expand_inputs(items):
+    """
+    ไฟล์ / โฟลเดอร์ / glob -> รายการไฟล์ภาพ (เฉพาะนามสกุลใน IMAGE_EXTS, ไม่ซ้ำ)
+    """
+    files, seen = [], set()
+    for it in items:
+        if os.path.isdir(it):
+            found = [os.path.join(it, name) for name in sorted(os.listdir(it))]
+        else:
+            found = sorted(glob.glob(it))
+        for p in found:
+            if not os.path.isfile(p):
+                continue
+            if not p.lower().endswith(IMAGE_EXTS):
+                print(f"skipping {p}: not an image ({', '.join(IMAGE_EXTS)})", file=sys.stderr)
+            elif os.path.abspath(p) not in seen:
+                seen.add(os.path.abspath(p))
+                files.append(p)
+    return files
+
+
+def output_paths(files, out):
+    """
+    src -> <out>/<path ต่อจากโฟลเดอร์ร่วมของ input>.npz (a/cat.png กับ b/cat.png ไม่ทับกัน)
+    ValueError ถ้ายังชนกัน (เช่น cat.png กับ cat.jpg ในโฟลเดอร์เดียวกัน)
+    """
+    dirs = [os.path.dirname(os.path.abspath(f)) for f in files]
+    base = os.path.commonpath(dirs) if dirs else ""
+    dst = {}
+    for src in files:
+        rel = os.path.relpath(os.path.abspath(src), base)
+        dst[src] = os.path.join(out, os.path.splitext(rel)[0] + ".npz")
+    seen = {}
+    for src, d in dst.items():
+        if d in seen:
+            raise ValueError(f"{seen[d]} and {src} would both be written to {d}")
+        seen[d] = src
+    return dst
+
+
+def _compile_one(src, dst, W, H, params):
+    t0 = time.perf_counter()
+    stats = {}
+    strokes = build_strokes(src, W, H, stats=stats, cache=JobCache(), **params)
+    save_strokes(dst, strokes, W, H, source=os.path.basename(src), **params)
+    n_pts = sum(len(s) for s in strokes)
+    return src, dst, len(strokes), n_pts, time.perf_counter() - t0, stats
+
+
+def cmd_compile(args):
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("no images found", file=sys.stderr); return 1
+    W, H = parse_size(args.size)
+    try:
+        dsts = output_paths(files, args.out)
+    except ValueError as e:
+        print(f"output name clash: {e}", file=sys.stderr); return 1
+    params = dict(blur=args.blur, step=args.step, simplify_tol=args.simplify,
+                  two_opt=args.two_opt, min_area=args.min_area, prune=args.prune)
+    if args.fill:
+        params.update(fill=True, hatch_spacing=args.hatch_spacing, hatch_angle=args.hatch_angle)
+    jobs = args.jobs or os.cpu_count() or 1
+    print(f"compiling {len(files)} image(s) at {W}x{H} with {jobs} worker(s), thinning: {THINNING}")
+
+    t0 = time.perf_counter(); failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        futs = {}
+        for src, dst in dsts.items():
+            os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+            futs[ex.submit(_compile_one, src, dst, W, H, params)] = src
+        for i, fut in enumerate(as_completed(futs), 1):
+            try:
+                src, dst, n_strokes, n_pts, dt, stats = fut.result()
+                pruned = f" pruned={stats['pruned_pct']:.0f}%" if "pruned_pct" in stats else ""
+                print(f"[{i}/{len(files)}] {os.path.basename(src)} -> {dst}  "
+                      f"strokes={n_strokes} points={n_pts}{pruned}  {dt:.2f}s")
+            except Exception as e:
+                failed += 1
+                print(f"[{i}/{len(files)}] {os.path.basename(futs[fut])} FAILED: {e}", file=sys.stderr)
+    print(f"done in {time.perf_counter() - t0:.2f}s ({failed} failed)")
+    return 1 if failed else 0
+
+
+def cmd_draw(args):
+    from utils import adb_devices, get_screen_size, run_adb_batch, run_adb_script
+    from backends import pick_backend
+    from metrics import Metrics, stage
+
+    strokes, (W, H), meta = load_strokes(args.file)
+    serials = adb_devices() if args.all else (args.serial or adb_devices()[:1])
+    if not serials:
+        print("no device", file=sys.stderr); return 1
+    if len(serials) > 1:
+        return _draw_many(args, serials, StrokeSet.from_polylines(strokes), (W, H))
+    serial = serials[0]
+    size = get_screen_size(serial)
+    if size != (W, H) and not args.force:
+        print(f"screen size mismatch: job {W}x{H}, device {size}", file=sys.stderr); return 1
+
+    source = os.path.basename(args.file)
+    if args.metrics is None:
+        rec = Metrics(job=source)  # ไม่เขียนไฟล์
+    else:
+        rec = Metrics(job=source, path=args.metrics) if args.metrics else Metrics.for_job(serial, source=source)
+    with rec.activate():
+        backend = pick_backend(serial, args.backend, seg_ms=args.seg_ms, screen_size=(W, H))
+        with stage("encode"):
+            cmds = backend.encode(StrokeSet.from_polylines(strokes))
+        print(f"{serial}: {len(strokes)} strokes, {len(cmds)} commands via {backend.name}")
+
+        def on_progress(p):
+            eta = rec.eta()
+            print(f"\r{p:3d}%  {rec.rate():.1f} cmd/s  ETA {'-' if eta is None else f'{eta:.0f}s'}  ",
+                  end="", flush=True)
+        t0 = time.perf_counter()
+        if args.mode == "script":
+            rc, err = run_adb_script(serial, cmds, progress_cb=on_progress)
+        else:
+            rc, err = run_adb_batch(serial, cmds, progress_cb=on_progress, sleep_ms=args.sleep_ms)
+    rec.finish(rc=rc)
+    print(f"\nrc={rc} {err}  {time.perf_counter() - t0:.1f}s" + (f"  metrics: {rec.path}" if rec.path else ""))
+    return rc
+
+
+def _draw_many(args, serials, strokes, size):
+    from orchestrator import Orchestrator
+
+    def compile_fn(W, H):
+        # ไฟล์ที่ compile แล้วมีขนาดเดียว: เครื่องที่จอไม่ตรงวาดไม่ได้ (ยกเว้น --force)
+        if (W, H) != size and not args.force:
+            raise RuntimeError(f"screen size mismatch: job {size[0]}x{size[1]}, device {W}x{H}")
+        return strokes
+
+    def on_update(serial, state, percent, message):
+        if state != "sending" or message:
+            print(f"{serial}: {state} {percent}% {message}".rstrip(), flush=True)
+    print(f"drawing on {len(serials)} devices: {', '.join(serials)}")
+    t0 = time.perf_counter()
+    res = Orchestrator(serials, compile_fn, source=os.path.basename(args.file), backend=args.backend,
+                       seg_ms=args.seg_ms, send_mode=args.mode, sleep_ms=args.sleep_ms,
+                       on_update=on_update).run()
+    ok = sum(1 for state, _ in res.values() if state == "done")
+    print(f"{ok}/{len(res)} devices done in {time.perf_counter() - t0:.1f}s")
+    return 0 if ok == len(res) else 1
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="insdraw", description="InsDraw headless tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    c = sub.add_parser("compile", help="compile images to stroke files (.npz)")
+    c.add_argument("inputs", nargs="+", help="image files, directories or globs")
+    c.add_argument("--size", required=True, help="target screen size, e.g. 1080x2400")
+    c.add_argument("-o", "--out", default="compiled")
+    c.add_argument("--blur", type=int, default=3)
+    c.add_argument("--step", type=int, default=6)
+    c.add_argument("--simplify", type=float, default=None, metavar="TOL",
+                   help="RDP tolerance in px (instead of --step)")
+    c.add_argument("--two-opt", action="store_true")
+    c.add_argument("--prune", action="store_true", help="drop stroke segments that retrace already-drawn pixels")
+    c.add_argument("--fill", action="store_true",
+                   help="fill solid (thresholded) regions with hatch lines instead of tracing edges")
+    c.add_argument("--hatch-spacing", type=int, default=6, metavar="PX")
+    c.add_argument("--hatch-angle", type=float, default=45.0, metavar="DEG")
+    c.add_argument("--min-area", type=int, default=80)
+    c.add_argument("-j", "--jobs", type=int, default=0, help="worker processes (default: all cores)")
+    c.set_defaults(func=cmd_compile)
+
+    d = sub.add_parser("draw", help="draw a compiled file on a device")
+    d.add_argument("file")
+    d.add_argument("-s", "--serial", action="append", help="device serial (repeat for several devices)")
+    d.add_argument("--all", action="store_true", help="draw on every connected device at once")
+    d.add_argument("--backend", default="auto", choices=["auto", "swipe", "motionevent", "sendevent"])
+    d.add_argument("--seg-ms", type=int, default=18)
+    d.add_argument("--sleep-ms", type=int, default=8)
+    d.add_argument("--mode", default="stream", choices=["stream", "script"])
+    d.add_argument("--force", action="store_true", help="draw even if the screen size differs")
+    d.add_argument("--metrics", nargs="?", const="", metavar="FILE.jsonl",
+                   help="write a metrics log (no FILE: ~/.insdraw/metrics/)")
+    d.set_defaults(func=cmd_draw)
+
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
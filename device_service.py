@@ -0,0 +1,152 @@
+import os, asyncio, threading
+
+import utils
+from adb_client import AdbError, EXIT_MARK, parse_device_list, split_exit
+
+
+class DeviceService:
+    """
+    งานถามข้อมูลเครื่อง (adb) ทั้งหมดวิ่งบน asyncio loop ใน thread ของตัวเอง
+    - คุย adb server (5037) ผ่าน asyncio socket ถ้าได้ ไม่งั้น asyncio.create_subprocess_exec(adb ...)
+    - ทุกคำสั่งมี timeout, ถามหลายเครื่อง/หลายค่าพร้อมกันด้วย gather
+    - submit(coro, callback, on_error): callback(result) / on_error(exc) ถูกเรียกจาก thread ของ loop
+      (ฝั่ง GUI ให้ส่งต่อผ่าน Qt signal); on_error ค่าเริ่มต้นมาจาก constructor
+    """
+    def __init__(self, timeout=6.0, host="127.0.0.1", port=None, on_error=None):
+        self.timeout = timeout
+        self.on_error = on_error
+        self.host = host
+        self.port = port or int(os.environ.get("ANDROID_ADB_SERVER_PORT", 5037))
+        self.loop = asyncio.new_event_loop()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(2.0)
+            self._thread = None
+
+    def submit(self, coro, callback=None, on_error=None):
+        """
+        -> concurrent.futures.Future; callback(result) ถ้า coroutine จบโดยไม่ error ไม่งั้น on_error(exc)
+        """
+        on_error = on_error or self.on_error
+        def done(f):
+            if f.cancelled():
+                return
+            exc = f.exception()
+            if exc is not None:
+                if on_error:
+                    on_error(exc)
+            elif callback:
+                callback(f.result())
+        fut = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        fut.add_done_callback(done)
+        return fut
+
+    # transport
+    async def _smart(self, *requests, block=False):
+        """
+        smart-socket: ส่ง request ทีละอัน (ต้องได้ OKAY) แล้วอ่านที่เหลือจนปิด
+        block=True: คำตอบของ host service เป็น 4 หลัก hex + payload อ่านเท่านั้นพอ
+        """
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        try:
+            for req in requests:
+                data = req.encode("utf-8")
+                writer.write(b"%04x" % len(data) + data)
+                await writer.drain()
+                st = await asyncio.wait_for(reader.readexactly(4), self.timeout)
+                if st != b"OKAY":
+                    raise AdbError(f"{req}: {st!r}")
+            if block:
+                n = int(await asyncio.wait_for(reader.readexactly(4), self.timeout), 16)
+                return await asyncio.wait_for(reader.readexactly(n), self.timeout)
+            return await asyncio.wait_for(reader.read(), self.timeout)
+        finally:
+            writer.close()
+
+    async def _exec(self, *args, serial=None):
+        """
+        adb binary -> (out, err, rc); rc = -1 ถ้าเกิน timeout (kill ทิ้ง)
+        """
+        cmd = [utils.ADB] + (["-s", serial] if serial else []) + list(args)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                creationflags=utils.CREATE_NO_WINDOW)
+        except OSError as e:
+            return "", str(e), 127
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return "", "timeout", -1
+        return out.decode("utf-8", "replace"), err.decode("utf-8", "replace"), proc.returncode
+
+    async def _shell(self, serial, cmd):
+        if utils.USE_NATIVE:
+            try:
+                out = await self._smart(f"host:transport:{serial}", f'shell:{cmd}; echo "{EXIT_MARK} $?"')
+                return split_exit(out.decode("utf-8", "replace"))
+            except (OSError, AdbError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass
+        out, err, rc = await self._exec("shell", cmd, serial=serial)
+        return out, rc
+
+    # queries
+    async def adb_ok(self):
+        if utils.USE_NATIVE:
+            try:
+                await self._smart("host:version", block=True)
+                return True
+            except (OSError, AdbError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass
+        out, err, rc = await self._exec("version")
+        return rc == 0
+
+    async def devices(self):
+        """
+        -> [serial ที่ state = device]
+        """
+        if utils.USE_NATIVE:
+            try:
+                raw = await self._smart("host:devices", block=True)
+                return [s for s, st in parse_device_list(raw.decode("utf-8", "replace")).items()
+                        if st == "device"]
+            except (OSError, AdbError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass
+        out, err, rc = await self._exec("devices")
+        if rc != 0:
+            return []
+        return [s for s, st in parse_device_list("\n".join(out.splitlines()[1:])).items() if st == "device"]
+
+    async def device_info(self, serial):
+        """
+        -> {"serial", "model", "size"} (ถามสองค่าพร้อมกัน) และเก็บลง cache ของ utils
+        """
+        (model_out, model_rc), (size_out, size_rc) = await asyncio.gather(
+            self._shell(serial, "getprop ro.product.model"), self._shell(serial, "wm size"))
+        model = (model_out.strip() or None) if model_rc == 0 else None
+        size = utils.parse_wm_size(size_out) if size_rc == 0 else None
+        utils.remember_device(serial, model=model, size=size)
+        return {"serial": serial, "model": model, "size": size}
+
+    async def devices_info(self):
+        """
+        -> [info ของทุกเครื่อง] ถามทุกเครื่องพร้อมกัน
+        """
+        return list(await asyncio.gather(*(self.device_info(s) for s in await self.devices())))
+
+    async def restart_server(self):
+        utils.reset_adb_state()
+        await self._exec("kill-server")
+        out, err, rc = await self._exec("start-server")
+        return rc == 0
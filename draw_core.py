@@ -1,8 +1,12 @@
 import os
+import time
 import numpy as np
 import cv2
 from PIL import Image
 
+from strokes import StrokeSet
+from metrics import stage
+
 
 def _imread_any(path):
     """pil -> cv2"""
@@ -16,6 +20,124 @@ def _imread_any(path):
         return img  # BGR
 
 
+def _zhang_suen_luts():
+    # บิตของ code: P2(N) P3(NE) P4(E) P5(SE) P6(S) P7(SW) P8(W) P9(NW) = บิต 0..7
+    p = [(np.arange(256) >> i) & 1 for i in range(8)]
+    P2, P3, P4, P5, P6, P7, P8, P9 = p
+    B = sum(p)
+    A = sum((p[i] == 0) & (p[(i + 1) % 8] == 1) for i in range(8))
+    base = (B >= 2) & (B <= 6) & (A == 1)
+    return (base & (P2 * P4 * P6 == 0) & (P4 * P6 * P8 == 0),
+            base & (P2 * P4 * P8 == 0) & (P2 * P6 * P8 == 0))
+
+
+_ZS_LUTS = _zhang_suen_luts()
+
+
+def thin_zhang_suen(mask):
+    """
+    Zhang–Suen thinning แบบ NumPy: คิดเฉพาะพิกเซลที่เป็นเส้น (flat index)
+    code เพื่อนบ้าน 8 ตัว -> lookup table ว่าลบได้ไหม, วนจนไม่มีอะไรเปลี่ยน
+    """
+    h, w = mask.shape
+    img = np.zeros((h + 2, w + 2), dtype=np.uint8)
+    img[1:-1, 1:-1] = mask > 0
+    flat = img.ravel()
+    W = w + 2
+    offs = (-W, -W + 1, 1, W + 1, W, W - 1, -1, -W - 1)
+    idx = np.flatnonzero(flat)
+    changed = True
+    while changed:
+        changed = False
+        for lut in _ZS_LUTS:
+            code = np.zeros(len(idx), dtype=np.uint8)
+            for bit, o in enumerate(offs):
+                code |= flat[idx + o] << bit
+            kill = lut[code]
+            if kill.any():
+                flat[idx[kill]] = 0
+                idx = idx[~kill]
+                changed = True
+    return img[1:-1, 1:-1] * np.uint8(255)
+
+
+if hasattr(cv2, "ximgproc"):
+    THINNING = "opencv-contrib"
+else:
+    THINNING = "numpy"
+
+
+def thin(mask):
+    """
+    ทำเส้นให้บาง 1px: ใช้ cv2.ximgproc ถ้ามี ไม่งั้นใช้ thin_zhang_suen
+    """
+    if THINNING == "opencv-contrib":
+        return cv2.ximgproc.thinning(mask)
+    return thin_zhang_suen(mask)
+
+
+# เปลี่ยนเมื่อ mask ที่ได้จากพารามิเตอร์เดิมเปลี่ยน (ให้ cache เก่าใช้ไม่ได้)
+MASK_VERSION = 2
+
+
+def _letterbox(gray, target_w, target_h, fill=0):
+    """
+    ย่อ/ขยาย gray ให้พอดีจอแล้ววางกลาง buffer ช่องเดียวที่จองไว้ (แถบข้างเป็นสี fill)
+    """
+    ih, iw = gray.shape[:2]
+    scale = min(target_w / iw, target_h / ih)
+    nw, nh = max(1, int(iw * scale)), max(1, int(ih * scale))
+    canvas = np.full((target_h, target_w), fill, dtype=np.uint8)
+    ox, oy = (target_w - nw) // 2, (target_h - nh) // 2
+    canvas[oy:oy+nh, ox:ox+nw] = cv2.resize(gray, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return canvas
+
+
+def _load_npy(path, target_w, target_h):
+    # .npy ใช้ memmap แล้วหยิบทุกๆ k แถว/คอลัมน์ -> อ่านจากดิสก์เฉพาะส่วนที่ใช้
+    arr = np.load(path, mmap_mode="r")
+    if arr.ndim == 3 and arr.shape[2] == 1:
+        arr = arr[:, :, 0]
+    ih, iw = arr.shape[:2]
+    k = max(1, int(1 / min(target_w / iw, target_h / ih)))
+    small = np.ascontiguousarray(arr[::k, ::k])
+    if small.dtype != np.uint8:
+        small = cv2.normalize(small, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small[:, :, :3], cv2.COLOR_RGB2GRAY)  # .npy ถือว่าเป็น RGB แบบ PIL
+    return small
+
+
+def load_gray(path, target_w, target_h, fill=0):
+    """
+    โหลดภาพเป็น grayscale letterbox ขนาด target_w x target_h โดยไม่ decode เต็มความละเอียด
+    - fill: สีของแถบ letterbox (0 = ดำ)
+    - JPEG: draft mode (DCT scaling 1/2, 1/4, 1/8 ตอน decode)
+    - อื่นๆ (PNG ฯลฯ): Image.reduce ด้วยตัวคูณจำนวนเต็มก่อน แล้วค่อย resize ส่วนที่เหลือ
+    - .npy: memmap
+    """
+    if path.lower().endswith(".npy"):
+        return _letterbox(_load_npy(path, target_w, target_h), target_w, target_h, fill)
+    try:
+        with Image.open(path) as img:
+            iw, ih = img.size
+            scale = min(target_w / iw, target_h / ih)
+            if img.format == "JPEG":
+                img.draft("L", (max(1, int(iw * scale + 1)), max(1, int(ih * scale + 1))))
+            k = int(1 / scale) if scale < 1 else 1
+            if img.mode not in ("L", "RGB", "RGBA", "LA", "I", "F"):
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+            if k >= 2:
+                k = max(1, int(k * img.size[0] / iw))  # draft อาจย่อไปแล้วบางส่วน
+                img = img.reduce(k) if k >= 2 else img
+            gray = np.asarray(img.convert("L"))
+    except Exception:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise RuntimeError(f"cannot identify image file '{path}'")
+    return _letterbox(gray, target_w, target_h, fill)
+
+
 def preprocess_image(path, target_w, target_h, blur=2,
                      use_canny=True, canny_low=60, canny_high=120,
                      morph_close=True, try_skeleton=True):
@@ -24,34 +146,26 @@ def preprocess_image(path, target_w, target_h, blur=2,
     แล้วสร้าง mask เส้นสีขาวบนพื้นดำ (255 = เส้นที่จะวาด)
     - use_canny: ใช้ edge detection (คมและละเอียด)
     - blur: 0..31 (ค่าคี่) — 2–3 แนะนำ
-    - try_skeleton: ถ้ามี opencv-contrib จะทำเส้นให้บาง 1px
+    - try_skeleton: ทำเส้นให้บาง 1px (opencv-contrib ถ้ามี ไม่งั้น NumPy Zhang–Suen)
+    - โหมด threshold ใช้แถบ letterbox สีขาว (= พื้นหลัง) ไม่ให้แถบกลายเป็นพื้นที่ทึบ
     """
-    img_bgr = _imread_any(path)
-
-
-    ih, iw = img_bgr.shape[:2]
-    scale = min(target_w / iw, target_h / ih)
-    nw, nh = max(1, int(iw * scale)), max(1, int(ih * scale))
-    resized = cv2.resize(img_bgr, (nw, nh), interpolation=cv2.INTER_LINEAR)
-
-    canvas = np.zeros((target_h, target_w, 3), dtype=np.uint8)
-    ox, oy = (target_w - nw) // 2, (target_h - nh) // 2
-    canvas[oy:oy+nh, ox:ox+nw] = resized
-
-    gray = cv2.cvtColor(canvas, cv2.COLOR_BGR2GRAY)
+    with stage("decode"):
+        gray = load_gray(path, target_w, target_h, fill=0 if use_canny else 255)
 
     if blur and blur > 0:
         k = blur | 1 
-        gray = cv2.GaussianBlur(gray, (k, k), 0)
+        with stage("blur"):
+            gray = cv2.GaussianBlur(gray, (k, k), 0)
 
     if use_canny:
-        edges = cv2.Canny(gray, canny_low, canny_high)
-        if morph_close:
-            edges = cv2.morphologyEx(
-                edges, cv2.MORPH_CLOSE,
-                cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)),
-                iterations=1
-            )
+        with stage("canny"):
+            edges = cv2.Canny(gray, canny_low, canny_high)
+            if morph_close:
+                edges = cv2.morphologyEx(
+                    edges, cv2.MORPH_CLOSE,
+                    cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)),
+                    iterations=1
+                )
         mask = edges
     else:
         # threshold ธรรมดา (เผื่ออยากลอง)
@@ -60,10 +174,8 @@ def preprocess_image(path, target_w, target_h, blur=2,
 
 
     if try_skeleton:
-        try:
-            mask = cv2.ximgproc.thinning(mask) 
-        except Exception:
-            pass
+        with stage("thinning"):
+            mask = thin(mask)
 
 
     mask = (mask > 0).astype(np.uint8) * 255
@@ -74,13 +186,151 @@ def extract_contours(mask, min_area=20):
     """
     x,y
     """
-    cnts, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+    with stage("contours"):
+        cnts, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+        out = []
+        for c in cnts:
+            if cv2.contourArea(c) >= float(min_area):
+                pts = c.reshape(-1, 2)
+                out.append(pts)
+        out.sort(key=lambda p: -len(p))
+    return out
+
+
+# stroke ordering (ลดระยะยกปากกา)
+
+class _EndpointGrid:
+    """
+    grid index ของจุดปลายเส้น ใช้หา nearest neighbour แบบเร็ว
+    """
+    def __init__(self, strokes, cell=64):
+        self.cell = cell
+        self.buckets = {}
+        self.used = set()
+        for i, s in enumerate(strokes):
+            for end, (x, y) in ((0, s[0]), (1, s[-1])):
+                x, y = int(x), int(y)
+                key = (x // cell, y // cell)
+                self.buckets.setdefault(key, []).append((i, end, x, y))
+        if self.buckets:
+            xs = [k[0] for k in self.buckets]; ys = [k[1] for k in self.buckets]
+            self.bounds = (min(xs), min(ys), max(xs), max(ys))
+        else:
+            self.bounds = (0, 0, 0, 0)
+
+    def take(self, i):
+        self.used.add(i)
+
+    def _ring(self, cx, cy, r):
+        if r == 0:
+            yield cx, cy; return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def nearest(self, x, y):
+        """
+        -> (index, end, d2) ของปลายเส้นที่ใกล้ (x,y) ที่สุด, end=1 คือต้องกลับด้าน
+        """
+        cell = self.cell
+        cx, cy = int(x) // cell, int(y) // cell
+        x0, y0, x1, y1 = self.bounds
+        max_r = max(abs(cx - x0), abs(cx - x1), abs(cy - y0), abs(cy - y1))
+        best = None
+        for r in range(max_r + 1):
+            for key in self._ring(cx, cy, r):
+                bucket = self.buckets.get(key)
+                if not bucket:
+                    continue
+                live = [e for e in bucket if e[0] not in self.used]
+                if len(live) != len(bucket):
+                    self.buckets[key] = live
+                for i, end, px, py in live:
+                    d2 = (px - x) * (px - x) + (py - y) * (py - y)
+                    if best is None or d2 < best[2]:
+                        best = (i, end, d2)
+            # ทุกจุดใน ring ถัดไปห่างอย่างน้อย r*cell
+            if best is not None and best[2] <= (r * cell) ** 2:
+                break
+        return best
+
+
+def stroke_travel(strokes, start=None):
+    """
+    ระยะยกปากการวม (px) จากปลายเส้นหนึ่งไปต้นเส้นถัดไป
+    """
+    if not strokes:
+        return 0.0
+    starts = np.array([s[0] for s in strokes], dtype=np.float64)
+    ends = np.array([s[-1] for s in strokes], dtype=np.float64)
+    total = float(np.hypot(*(starts[1:] - ends[:-1]).T).sum())
+    if start is not None:
+        total += float(np.hypot(*(starts[0] - np.asarray(start, dtype=np.float64))))
+    return total
+
+
+def _two_opt(strokes, start, time_budget):
+    """
+    2-opt บนลำดับเส้น: กลับช่วง i..j (พร้อมกลับทิศแต่ละเส้น) ถ้าทำให้ระยะสั้นลง
+    """
+    n = len(strokes)
+    S = np.array([s[0] for s in strokes], dtype=np.float64)
+    E = np.array([s[-1] for s in strokes], dtype=np.float64)
+    deadline = time.perf_counter() + time_budget
+    first = 0 if start is not None else 1
+    improved = True
+    while improved:
+        improved = False
+        for i in range(first, n):
+            if time.perf_counter() > deadline:
+                return strokes
+            P = E[i - 1] if i > 0 else np.asarray(start, dtype=np.float64)
+            Ej = E[i:]
+            nxt = np.empty_like(Ej); nxt[:-1] = S[i + 1:]; nxt[-1] = Ej[-1]
+            last = np.zeros(len(Ej), dtype=bool); last[-1] = True
+            d_old = np.hypot(*(P - S[i])) + np.where(last, 0.0, np.hypot(*(Ej - nxt).T))
+            d_new = np.hypot(*(P - Ej).T) + np.where(last, 0.0, np.hypot(*(S[i] - nxt).T))
+            delta = d_new - d_old
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-6:
+                j = i + k
+                strokes[i:j + 1] = [s[::-1] for s in reversed(strokes[i:j + 1])]
+                S[i:j + 1], E[i:j + 1] = E[i:j + 1][::-1].copy(), S[i:j + 1][::-1].copy()
+                improved = True
+    return strokes
+
+
+def order_strokes(strokes, start=None, two_opt=False, time_budget=1.0):
+    """
+    เรียงเส้นใหม่ให้ระยะยกปากการะหว่างเส้นสั้นที่สุด (nearest neighbour + กลับทิศได้)
+    - start: จุดเริ่ม (x,y) ถ้า None จะเริ่มจากเส้นแรกตามเดิม
+    - two_opt: ขัดเกลาต่อด้วย 2-opt ภายในเวลา time_budget (วินาที)
+    """
+    strokes = [s for s in strokes if len(s) > 0]
+    if len(strokes) < 2:
+        return strokes
+
+    grid = _EndpointGrid(strokes)
     out = []
-    for c in cnts:
-        if cv2.contourArea(c) >= float(min_area):
-            pts = c.reshape(-1, 2)
-            out.append(pts)
-    out.sort(key=lambda p: -len(p))
+    if start is None:
+        grid.take(0)
+        out.append(strokes[0])
+        x, y = (int(v) for v in strokes[0][-1])
+    else:
+        x, y = (int(v) for v in start)
+
+    while len(out) < len(strokes):
+        i, end, _ = grid.nearest(x, y)
+        grid.take(i)
+        s = strokes[i][::-1] if end == 1 else strokes[i]
+        out.append(s)
+        x, y = (int(v) for v in s[-1])
+
+    if two_opt and time_budget > 0:
+        out = _two_opt(out, start, time_budget)
     return out
 
 
@@ -95,49 +345,210 @@ def sample_points(contour, step=1):
     pts = contour[::step].astype(int)
 
     if len(pts) > 1:
-        dedup = [pts[0]]
-        for p in pts[1:]:
-            if (abs(p[0] - dedup[-1][0]) + abs(p[1] - dedup[-1][1])) > 0:
-                dedup.append(p)
-        pts = np.array(dedup, dtype=int)
+        keep = np.ones(len(pts), dtype=bool)
+        keep[1:] = np.any(pts[1:] != pts[:-1], axis=1)
+        pts = pts[keep]
     return pts
 
 
-# command generat
+def simplify_points(contour, tolerance=1.5):
+    """
+    ลดจุดแบบ Ramer–Douglas–Peucker (cv2.approxPolyDP)
+    - tolerance: ค่าคลาดเคลื่อนสูงสุด (px) ที่ยอมได้
+    เก็บเฉพาะจุดหักมุม และรวมช่วงที่อยู่แนวเดียวกันเป็นเส้นยาวเส้นเดียว
+    """
+    pts = np.asarray(contour).reshape(-1, 2).astype(np.int32)
+    if len(pts) > 2:
+        pts = cv2.approxPolyDP(pts.reshape(-1, 1, 2), float(max(tolerance, 0.0)), False).reshape(-1, 2)
 
-def _dist2(p, q):
-    dx = int(p[0]) - int(q[0])
-    dy = int(p[1]) - int(q[1])
-    return dx*dx + dy*dy
+    if len(pts) > 1:
+        keep = np.ones(len(pts), dtype=bool)
+        keep[1:] = np.any(pts[1:] != pts[:-1], axis=1)
+        pts = pts[keep]
 
-def generate_swipe_commands(points, seg_ms=35, tap_thresh2=4):
+    if len(pts) > 2:
+        d1 = pts[1:-1] - pts[:-2]
+        d2 = pts[2:] - pts[1:-1]
+        cross = d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0]
+        dot = (d1 * d2).sum(axis=1)
+        straight = (cross == 0) & (dot > 0)
+        pts = pts[np.r_[True, ~straight, True]]
+    return pts.astype(int)
+
+
+def prune_strokes(contours, W, H, radius=1, min_run=2):
     """
-    แปลง polyline → ชุด ADB swipe
+    ตัดช่วงของเส้นที่ลากทับพิกเซลที่วาดไปแล้ว (occupancy map + รัศมีแปรง)
+    - contours ต้องเป็นจุดติดกัน (CHAIN_APPROX_NONE) ก่อน sample/simplify
+    - เส้นที่ทับบางช่วงจะถูกแยกเป็นหลายเส้น (เก็บจุดที่ทับไว้ 1 จุดที่หัว/ท้ายให้เส้นต่อกัน)
+    - จุดของเส้นเดียวกันที่เพิ่งลากผ่านยังไม่นับ (lag) ไม่งั้นแปรงจะทับจุดถัดไปของตัวเองเสมอ
     """
-    cmds = []
-    if points is None or len(points) < 2:
-        return cmds
+    r = max(0, int(radius))
+    occ = np.zeros((H + 2 * r, W + 2 * r), dtype=bool)
+    lag = 2 * r + 2
+    out = []
+    for c in contours:
+        pts = np.asarray(c).reshape(-1, 2)
+        xs = np.clip(pts[:, 0], 0, W - 1).tolist()
+        ys = np.clip(pts[:, 1], 0, H - 1).tolist()
+        n = len(xs)
+        free = np.zeros(n + 2, dtype=bool)  # pad หัวท้ายไว้หา run
+        for i in range(n + lag):
+            j = i - lag
+            if j >= 0:
+                occ[ys[j]:ys[j] + 2 * r + 1, xs[j]:xs[j] + 2 * r + 1] = True
+            if i < n:
+                free[i + 1] = not occ[ys[i] + r, xs[i] + r]
+        edges = np.flatnonzero(np.diff(free.astype(np.int8)))
+        for a, b in zip(edges[::2], edges[1::2]):  # run ของจุดที่ยังไม่ถูกวาด = pts[a:b]
+            if b - a >= min_run:
+                out.append(pts[max(0, a - 1):min(n, b + 1)])
+    return out
 
-    x0, y0 = map(int, points[0])
 
-    cmds.append(f"input tap {x0} {y0}")
+def command_saving(before, after):
+    """
+    % คำสั่งที่ลดลง (นับแบบ StrokeSet.command_count)
+    """
+    n0 = StrokeSet.from_polylines(before).command_count() if before else 0
+    n1 = StrokeSet.from_polylines(after).command_count() if after else 0
+    return n0, n1, 100.0 * (n0 - n1) / max(1, n0)
 
-    for i in range(1, len(points)):
-        x1, y1 = map(int, points[i-1])
-        x2, y2 = map(int, points[i])
-        if _dist2((x1, y1), (x2, y2)) <= tap_thresh2:
-            cmds.append(f"input tap {x2} {y2}")
-        else:
-            cmds.append(f"input swipe {x1} {y1} {x2} {y2} {int(seg_ms)}")
 
-    return cmds
+def hatch_fill(mask, spacing=6, angle=45.0, min_area=80):
+    """
+    เติมพื้นที่ทึบ (mask จากโหมด threshold) ด้วยเส้น hatch ขนานกัน ห่างกัน spacing px ที่มุม angle องศา
+    - แต่ละช่วงที่อยู่ในพื้นที่ = เส้นตรง 2 จุด (swipe ยาวครั้งเดียว) ช่วงที่สั้นจนเหลือจุดเดียว = tap
+    - เรียงแบบ serpentine ทีละพื้นที่ (connected component): แถวถัดไปกลับทิศ, พื้นที่ถัดไป = ใกล้ปากกาที่สุด
+    """
+    H, W = mask.shape[:2]
+    spacing = max(1, int(spacing))
+    with stage("hatch"):
+        n, labels, st, _ = cv2.connectedComponentsWithStats((mask > 0).astype(np.uint8), connectivity=8)
+        keep = st[:, cv2.CC_STAT_AREA] >= min_area
+        keep[0] = False
+        labels = np.where(keep, np.arange(n), 0).astype(np.int32)[labels]
+
+        # พิกัดหมุน: u ตามแนวเส้น, v ตั้งฉาก -> สุ่มตัวอย่างทีละ 1px ตามแถว v = ทุก spacing
+        a = np.deg2rad(angle)
+        c, s = np.cos(a), np.sin(a)
+        corners = np.array([[0, 0], [W - 1, 0], [0, H - 1], [W - 1, H - 1]], dtype=np.float64)
+        us, vs = corners @ (c, s), corners @ (-s, c)
+        u = np.arange(np.floor(us.min()), np.ceil(us.max()) + 1)
+        v = np.arange(vs.min() + spacing / 2, vs.max() + 1, spacing)
+        X = np.rint(u[None, :] * c - v[:, None] * s).astype(np.int32)
+        Y = np.rint(u[None, :] * s + v[:, None] * c).astype(np.int32)
+        inside = (X >= 0) & (X < W) & (Y >= 0) & (Y < H)
+        L = np.zeros(X.shape, dtype=np.int32)
+        L[inside] = labels[Y[inside], X[inside]]
+
+        # run = ช่วงที่ label เดียวกันติดกันในแถว (ขอบพื้นที่ตัดเส้นให้เอง)
+        Lp = np.pad(L, ((0, 0), (1, 1)))
+        r, k = np.nonzero(Lp[:, 1:] != Lp[:, :-1])
+        old, new = Lp[r, k], Lp[r, k + 1]
+        row, c0 = r[new != 0], k[new != 0]
+        c1 = k[old != 0] - 1
+        lab = L[row, c0]
+        if not len(lab):
+            return []
+
+        # serpentine: แถวที่ลำดับคี่ของแต่ละพื้นที่เดินกลับทิศ
+        order = np.lexsort((c0, row, lab))
+        row, c0, c1, lab = row[order], c0[order], c1[order], lab[order]
+        first = np.r_[True, lab[1:] != lab[:-1]]
+        rid = np.cumsum(np.r_[True, (row[1:] != row[:-1]) | first[1:]])
+        rev = (rid - rid[np.maximum.accumulate(np.where(first, np.arange(len(lab)), 0))]) % 2 == 1
+        order = np.lexsort((np.where(rev, -c0, c0), row, lab))
+        row, c0, c1, lab, rev = row[order], c0[order], c1[order], lab[order], rev[order]
+        a0, a1 = np.where(rev, c1, c0), np.where(rev, c0, c1)
+        P0 = np.stack([X[row, a0], Y[row, a0]], axis=1)
+        P1 = np.stack([X[row, a1], Y[row, a1]], axis=1)
+
+        # เรียงพื้นที่: nearest neighbour จากปลายพื้นที่ก่อนหน้า (กลับลำดับทั้งพื้นที่ได้)
+        bounds = np.flatnonzero(np.r_[True, lab[1:] != lab[:-1], True])
+        groups = list(zip(bounds[:-1], bounds[1:]))
+        S = np.array([P0[i] for i, _ in groups]); E = np.array([P1[j - 1] for _, j in groups])
+        left = np.ones(len(groups), dtype=bool)
+        pen = S[0]
+        out = []
+        for _ in range(len(groups)):
+            ds = np.where(left, ((S - pen) ** 2).sum(axis=1), np.inf)
+            de = np.where(left, ((E - pen) ** 2).sum(axis=1), np.inf)
+            g, flip = (int(ds.argmin()), False) if ds.min() <= de.min() else (int(de.argmin()), True)
+            left[g] = False
+            i, j = groups[g]
+            runs = [(P1[t], P0[t]) for t in range(j - 1, i - 1, -1)] if flip else \
+                   [(P0[t], P1[t]) for t in range(i, j)]
+            for p, q in runs:
+                out.append(np.array([p, q]) if (p != q).any() else p[None, :].copy())
+            pen = runs[-1][1]
+    return out
 
 
+def build_strokes(path, target_w, target_h, blur=3, step=6, simplify_tol=None,
+                  two_opt=False, min_area=80, prune=False, brush_radius=1, stats=None,
+                  fill=False, hatch_spacing=6, hatch_angle=45.0, cache=None, order=True, time_budget=1.5):
+    """
+    pipeline เต็ม (CLI / GUI / orchestrator ใช้ตัวนี้ตัวเดียว):
+    ภาพ → mask → contours → (prune) → จุด (step หรือ simplify) → เรียงลำดับเส้น
+    - cache: JobCache ที่ให้ mask / contours / hatch (ไม่ให้ = cache ในหน่วยความจำเฉพาะครั้งนี้)
+    - stats: dict (ถ้าให้มา) จะได้ commands_before / commands_after / pruned_pct ตอน prune,
+      travel_before / travel_after ตอนเรียง และ step_commands (จำนวนคำสั่งถ้าใช้ step) ในโหมด simplify
+    - fill: ใช้ mask แบบ threshold (พื้นที่ทึบ) แล้วเติมด้วย hatch_fill แทนการไล่ contour (เรียง serpentine แล้ว)
+    - order=False: ไม่เรียงเส้น (เช่น preview)
+    """
+    if cache is None:
+        from cache import JobCache  # cache.py import draw_core
+        cache = JobCache(cache_dir=None)
+    # decode / blur / canny / thinning / contours / hatch จับเวลาเองข้างใน (ไม่ห่อซ้ำ ไม่งั้นนับสองรอบ)
+    if fill:
+        return cache.hatch(path, target_w, target_h, spacing=hatch_spacing, angle=hatch_angle,
+                           min_area=min_area, blur=blur)
+
+    def points(cs):
+        if simplify_tol is not None:
+            return [simplify_points(c, tolerance=simplify_tol) for c in cs]
+        return [sample_points(c, step=step) for c in cs]
+
+    contours = cache.contours(path, target_w, target_h, min_area=min_area, blur=blur)
+    with stage("points"):
+        strokes = points(contours)
+    if stats is not None and simplify_tol is not None:
+        stats["step_commands"] = sum(-(-len(c) // step) for c in contours)
+    if prune:
+        with stage("prune"):
+            pruned = points(cache.contours(path, target_w, target_h, min_area=min_area, prune=True,
+                                           brush_radius=brush_radius, blur=blur))
+        if stats is not None:
+            n0, n1, pct = command_saving(strokes, pruned)
+            stats.update(commands_before=n0, commands_after=n1, pruned_pct=round(pct, 1))
+        strokes = pruned
+    if not order:
+        return strokes
+    with stage("order"):
+        ordered = order_strokes(strokes, two_opt=two_opt, time_budget=time_budget)
+    if stats is not None:
+        stats.update(travel_before=round(stroke_travel(strokes)), travel_after=round(stroke_travel(ordered)))
+    return ordered
 
 
-def make_preview(mask):
+# command generat
+
+def generate_swipe_commands(points, seg_ms=35, tap_thresh2=4):
+    """
+    แปลง polyline → ชุด ADB swipe (ตัวห่อของ StrokeSet.commands)
+    """
+    if points is None or len(points) < 1:
+        return []
+    return StrokeSet.from_polylines([points]).commands(seg_ms=seg_ms, tap_thresh2=tap_thresh2)
+
+
+
+
+def make_preview(mask, points=None, color=(94, 197, 34)):
     """
     building preview BGR to show GUI
+    - points: (N,2) จุด vertex ที่จะส่งจริง วาดทับเป็นจุดสี (BGR)
     """
     if mask.ndim == 2:
         bgr = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
@@ -149,5 +560,14 @@ def make_preview(mask):
     fg = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
     fg[np.where(mask == 0)] = (0, 0, 0)
     out = cv2.add(bg, fg)
+
+    if points is not None and len(points):
+        h, w = out.shape[:2]
+        pts = np.asarray(points).reshape(-1, 2).astype(np.int64)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                xs = np.clip(pts[:, 0] + dx, 0, w - 1)
+                ys = np.clip(pts[:, 1] + dy, 0, h - 1)
+                out[ys, xs] = color
     return out
 
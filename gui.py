@@ -1,15 +1,26 @@
-import os, sys, time
+import os, sys, time, queue, threading
+import numpy as np
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtWidgets import QFileDialog, QMessageBox, QProgressBar
 from PyQt5.QtGui import QIcon
 
 from utils import (
-    adb_path_ok, adb_devices, get_screen_size, get_device_model,
-    adb_restart_server, run_adb_batch
+    adb_devices, get_screen_size, forget_device,
+    run_adb_batch, run_adb_script, calibrate_latency, auto_pacing,
+    DeviceTracker
 )
+from device_service import DeviceService
 from draw_core import (
-    preprocess_image, extract_contours, sample_points, make_preview, generate_swipe_commands
+    sample_points, make_preview, order_strokes, stroke_travel, simplify_points, build_strokes,
+    THINNING, MASK_VERSION
 )
+from backends import BACKENDS, pick_backend, iter_stroke_commands
+from cache import JobCache
+from jobs import DrawJob
+from metrics import Metrics, stage, format_stats
+from orchestrator import Orchestrator, compile_strokes
+from strokes import StrokeSet
+from simulate import estimate_duration, plan, format_duration, model_backend, send_sleep_ms
 
 APP_TITLE = "InsDraw ADB"
 
@@ -41,58 +52,384 @@ class DrawWorker(QtCore.QThread):
     percent = QtCore.pyqtSignal(int)
     done = QtCore.pyqtSignal()
     failed = QtCore.pyqtSignal(str)
+    stats = QtCore.pyqtSignal(object)
 
-    def __init__(self, serial, filepath, blur, step, seg_ms):
+    def __init__(self, serial, filepath, blur, step, seg_ms, two_opt=False, simplify_tol=None,
+                 backend="auto", send_mode="stream", auto_pace=False, cache=None, streaming=False, prune=False,
+                 resume=None, auto_reconnect=False, hatch=None, metrics_log=False):
         super().__init__()
         self.serial = serial; self.filepath = filepath
         self.blur = blur; self.step = step; self.seg_ms = seg_ms
+        self.two_opt = two_opt; self.simplify_tol = simplify_tol
+        self.backend = backend; self.send_mode = send_mode
+        self.auto_pace = auto_pace
+        self.cache = cache or JobCache(cache_dir=None)
+        self.hatch = hatch  # (spacing, angle) = เติมพื้นที่ทึบด้วย hatch แทน contour
+        self.streaming = streaming and send_mode == "stream" and not hatch
+        self.prune = prune
+        self.resume = resume; self.auto_reconnect = auto_reconnect
+        self.metrics_log = metrics_log  # False = เก็บสถิติในหน่วยความจำเท่านั้น ไม่เขียนไฟล์
         self._stop = False
 
     def stop(self): self._stop = True
     def _canceled(self): return self._stop
 
     def run(self):
+        source = os.path.basename(self.filepath)
+        self.metrics = Metrics.for_job(self.serial, source=source, on_update=self.stats.emit) \
+            if self.metrics_log else Metrics(job=source, on_update=self.stats.emit)
+        with self.metrics.activate():
+            self._run()
+        snap = self.metrics.finish(canceled=self._stop)
+        self.log.emit(f"Metrics: {snap['confirmed'] or snap['sent']} cmds, {snap['cmds_per_s']} cmd/s"
+                      + (f" → {self.metrics.path}" if self.metrics.path else ""))
+
+    def _run(self):
         try:
             size = get_screen_size(self.serial)
             if not size: self.failed.emit("ไม่พบขนาดหน้าจอ"); return
             W, H = size
-            self.log.emit(f"Screen {W}x{H}")
-
-            mask = preprocess_image(self.filepath, W, H, blur=self.blur)
-            contours = extract_contours(mask, min_area=80)
-            if not contours:
-                self.failed.emit("ไม่พบเส้น (Contours=0)"); return
-
-            cmds = []
-            for c in contours:
-                pts = sample_points(c, step=self.step)
-                cmds.extend(generate_swipe_commands(pts, seg_ms=self.seg_ms))
+            self.log.emit(f"Screen {W}x{H}  (thinning: {THINNING})")
+            if self.resume and (self.resume.W, self.resume.H) != (W, H):
+                self.failed.emit(f"ขนาดจอไม่ตรงกับงานที่ค้างไว้ ({self.resume.W}x{self.resume.H})"); return
+
+            pacing = {"window": 0, "ack_every": 20, "seg_ms": self.seg_ms, "sleep_ms": 8}
+            if self.auto_pace and self.send_mode == "stream":
+                with stage("calibrate"):
+                    lat = calibrate_latency(self.serial)
+                pacing = auto_pacing(lat, self.seg_ms)
+                self.seg_ms = pacing["seg_ms"]
+                self.log.emit(f"Calibrated latency: {lat:.0f}ms/cmd → window={pacing['window']} seg_ms={self.seg_ms}"
+                              if lat else "Calibration failed, using fixed pacing")
+
+            if self.resume:
+                job = self.resume
+                self.log.emit(f"Resuming {job.source or 'job'} from stroke {job.done_strokes}/{job.n_strokes} "
+                              f"({len(job.cmds) - job.next_command} commands left)")
+                return self.send_job(job, pacing)
+
+            backend = pick_backend(self.serial, self.backend, seg_ms=self.seg_ms, screen_size=(W, H))
+            self.log.emit(f"Backend: {backend.name}")
+
+            if self.streaming:
+                return self.run_streaming(W, H, backend, pacing)
+
+            key = self.cache.key(self.filepath, "commands", W=W, H=H, blur=self.blur, min_area=80,
+                                 step=self.step, simplify_tol=self.simplify_tol, two_opt=self.two_opt,
+                                 prune=self.prune, hatch=self.hatch, backend=backend.cache_key,
+                                 thinning=THINNING, version=MASK_VERSION)
+            with stage("cache"):
+                cmds, strokes = self.cache.get_commands(key), self.cache.get_strokes(key)
+            if cmds is not None and strokes is not None:
+                self.log.emit(f"Cache hit: {len(cmds)} commands")
+            else:
+                built = self.build_commands(W, H, backend)
+                if built is None: return
+                cmds, strokes = built
+                self.cache.put_commands(key, cmds, strokes)
             if not cmds:
                 self.failed.emit("ไม่มีคำสั่ง swipe"); return
 
             self.log.emit(f"Total sub-swipes: {len(cmds)}")
+            job = DrawJob(self.serial, W, H, strokes, cmds, backend.stroke_ends(strokes),
+                          source=os.path.basename(self.filepath), backend=backend.name)
+            job.save()
+            self.send_job(job, pacing)
+        except Exception as e:
+            self.failed.emit(str(e))
 
-            def on_progress(p): self.percent.emit(min(int(p), 99))
-            rc, err = run_adb_batch(
-                self.serial, cmds,
-                progress_cb=on_progress,
-                cancel_check=self._canceled,
-                sleep_ms=8
-            )
+    def send_job(self, job, pacing, max_reconnects=5):
+        """
+        ส่งคำสั่งที่เหลือของ job; checkpoint ทุกครั้งที่เครื่องยืนยัน
+        auto_reconnect: ถ้า adb หลุด รอเครื่องกลับมาแล้วส่งต่อจากเส้นที่ยืนยันล่าสุด
+        """
+        total = max(1, len(job.cmds))
+        for attempt in range(max_reconnects + 1):
+            base = job.next_command
+            cmds = job.remaining()
+            def on_progress(p): self.percent.emit(min(int((base + p * len(cmds) / 100) * 100 / total), 99))
+            def on_confirm(n): job.confirm(base + n)
+            try:
+                if self.send_mode == "script":
+                    self.log.emit("Pushing draw script…")
+                    rc, err = run_adb_script(self.serial, cmds, progress_cb=on_progress,
+                                             cancel_check=self._canceled, confirm_cb=on_confirm)
+                else:
+                    rc, err = run_adb_batch(self.serial, cmds, progress_cb=on_progress,
+                                            cancel_check=self._canceled,
+                                            sleep_ms=pacing["sleep_ms"],
+                                            window=pacing["window"],
+                                            ack_every=pacing["ack_every"],
+                                            confirm_cb=on_confirm)
+            except Exception as e:
+                rc, err = 1, str(e)
             if self._canceled():
-                self.log.emit("stop rn"); self.done.emit(); return
-            if rc != 0: self.log.emit(f"adb batch rc={rc} err={err}")
+                job.save_progress()
+                self.log.emit(f"stop rn — saved at stroke {job.done_strokes}/{job.n_strokes} (Resume to continue)")
+                self.done.emit(); return
+            if rc == 0:
+                job.discard()
+                self.percent.emit(100)
+                self.done.emit(); return
+            job.save_progress()
+            self.log.emit(f"adb batch rc={rc} err={err} — saved at stroke {job.done_strokes}/{job.n_strokes}")
+            if not self.auto_reconnect or attempt == max_reconnects or not self.wait_for_device(job):
+                break
+            self.log.emit(f"Reconnected, resuming ({attempt + 1}/{max_reconnects})")
+        self.failed.emit("ส่งไม่สำเร็จ — กด Resume เพื่อวาดต่อ")
+
+    def wait_for_device(self, job, timeout_s=120):
+        """
+        รอเครื่องกลับมา (state=device) แล้วเช็คว่าขนาดจอยังตรง
+        """
+        self.log.emit(f"Waiting for {self.serial} to reconnect…")
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline and not self._stop:
+            if self.serial in adb_devices():
+                forget_device(self.serial)
+                size = get_screen_size(self.serial)
+                if size and tuple(size) == (job.W, job.H):
+                    return True
+                if size:
+                    self.log.emit(f"Screen size changed to {size[0]}x{size[1]} — not resuming"); return False
+            time.sleep(1.0)
+        return False
+
+    def run_streaming(self, W, H, backend, pacing):
+        contours = self.cache.contours(self.filepath, W, H, min_area=80, prune=self.prune, blur=self.blur)
+        if not contours:
+            self.failed.emit("ไม่พบเส้น (Contours=0)"); return
+        contours = order_strokes(contours)  # NN อย่างเดียว ไม่รอ 2-opt
+        total_pts = sum(len(c) for c in contours)
+        # จำนวนคำสั่งประมาณได้เฉพาะโหมด step (simplify ต้องรู้ผลก่อน) -> 0 = ไม่รู้
+        est = sum(-(-len(c) // self.step) for c in contours) if self.simplify_tol is None else 0
+        self.log.emit(f"Streaming {len(contours)} contours" + (f" (~{est} commands)" if est else ""))
+
+        t0 = time.perf_counter()
+        confirmed = [0]
+        def on_confirm(n): confirmed[0] = n
+        rc, err = run_adb_batch(
+            self.serial, self.stream_commands(contours, backend, total_pts, t0),
+            cancel_check=self._canceled,
+            sleep_ms=pacing["sleep_ms"],
+            window=pacing["window"],
+            ack_every=pacing["ack_every"],
+            total=est,
+            confirm_cb=on_confirm
+        )
+        if rc == 0 and not self._canceled():
             self.percent.emit(100)
-            self.done.emit()
+            self.done.emit(); return
+        # หยุด / พัง: สร้าง job เต็มจาก contour ชุดเดียวกัน (ลำดับคำสั่งตรงกับที่ stream) แล้ว checkpoint ไว้ resume
+        strokes = StrokeSet.from_polylines(self._points(contours))
+        job = DrawJob(self.serial, W, H, strokes, backend.encode(strokes), backend.stroke_ends(strokes),
+                      source=os.path.basename(self.filepath), backend=backend.name)
+        job.confirm(confirmed[0])
+        job.save()
+        if self._canceled():
+            self.log.emit(f"stop rn — saved at stroke {job.done_strokes}/{job.n_strokes} (Resume to continue)")
+            self.done.emit(); return
+        self.log.emit(f"adb batch rc={rc} err={err} — saved at stroke {job.done_strokes}/{job.n_strokes}")
+        self.failed.emit("ส่งไม่สำเร็จ — กด Resume เพื่อวาดต่อ")
+
+    def stream_commands(self, contours, backend, total_pts, t0):
+        """
+        producer thread สร้างคำสั่งใส่ queue (จำกัดขนาด) ระหว่างที่ sender ส่งไปด้วย
+        progress คิดจากจำนวนจุดของ contour ที่ส่งครบแล้ว
+        """
+        q = queue.Queue(maxsize=512)
+        errors = []
+
+        def put(item):
+            while not self._stop:
+                try:
+                    q.put(item, timeout=0.1); return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            # Metrics ผูกกับ thread -> ส่งต่อให้ producer เอง
+            with self.metrics.activate():
+                try:
+                    for cmds, n in iter_stroke_commands(contours, backend, step=self.step,
+                                                        simplify_tol=self.simplify_tol,
+                                                        cancel_check=self._canceled):
+                        for i, cmd in enumerate(cmds):
+                            if not put((cmd, n if i == len(cmds) - 1 else 0)): return
+                        if not cmds and not put((None, n)): return
+                except Exception as e:
+                    errors.append(e)
+                put(None)
+        threading.Thread(target=produce, daemon=True).start()
+
+        done_pts = 0; sent = 0
+        while not self._stop:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None: break
+            cmd, n = item
+            if cmd is not None:
+                if sent == 0:
+                    self.log.emit(f"First command after {(time.perf_counter() - t0) * 1000:.0f}ms")
+                sent += 1
+                yield cmd
+            if n:
+                done_pts += n
+                self.percent.emit(min(99, done_pts * 100 // max(1, total_pts)))
+        if errors:
+            raise errors[0]
+        self.log.emit(f"Total sub-swipes: {sent}")
+
+    def _points(self, contours):
+        if self.simplify_tol is not None:
+            return [simplify_points(c, tolerance=self.simplify_tol) for c in contours]
+        return [sample_points(c, step=self.step) for c in contours]
+
+    def build_commands(self, W, H, backend):
+        stats = {}
+        fill = dict(fill=True, hatch_spacing=self.hatch[0], hatch_angle=self.hatch[1]) if self.hatch else {}
+        polylines = build_strokes(self.filepath, W, H, blur=self.blur, step=self.step, simplify_tol=self.simplify_tol,
+                                  two_opt=self.two_opt, prune=self.prune, stats=stats, cache=self.cache, **fill)
+        if not polylines:
+            self.failed.emit("ไม่พบพื้นที่ทึบ (threshold mask ว่าง)" if self.hatch else "ไม่พบเส้น (Contours=0)")
+            return None
+        if self.hatch:
+            self.log.emit(f"Hatch fill: {len(polylines)} runs, spacing {self.hatch[0]}px @ {self.hatch[1]:g}°, "
+                          f"pen-up travel {stroke_travel(polylines):.0f}px")
+        if "pruned_pct" in stats:
+            self.log.emit(f"Pruned overlaps: {stats['commands_before']} -> {stats['commands_after']} commands "
+                          f"({stats['pruned_pct']:.0f}% removed)")
+        if "travel_before" in stats:
+            self.log.emit(f"Pen-up travel: {stats['travel_before']}px -> {stats['travel_after']}px")
+
+        with stage("encode"):
+            strokes = StrokeSet.from_polylines(polylines)
+            cmds = backend.encode(strokes)
+        if "step_commands" in stats and cmds:
+            # เทียบกับโหมด step (ประมาณจากจำนวนจุด/step)
+            approx = stats["step_commands"]
+            self.log.emit(f"Simplify tol={self.simplify_tol}px: ~{approx} sub-swipes with step={self.step}"
+                          f" → {len(cmds)} ({approx / max(1, len(cmds)):.1f}x fewer)")
+        return cmds, strokes
+
+class MultiDrawWorker(QtCore.QThread):
+    """
+    วาดงานเดียวกันบนหลายเครื่องพร้อมกันผ่าน Orchestrator
+    """
+    row = QtCore.pyqtSignal(str, str, int, str)  # serial, state, percent, message
+    log = QtCore.pyqtSignal(str)
+
+    def __init__(self, serials, filepath, blur, step, seg_ms, two_opt=False, simplify_tol=None,
+                 backend="auto", send_mode="stream", auto_pace=False, cache=None, prune=False, hatch=None):
+        super().__init__()
+        cache = cache or JobCache(cache_dir=None)
+        fill = dict(fill=True, hatch_spacing=hatch[0], hatch_angle=hatch[1]) if hatch else {}
+        compile_fn = lambda W, H: compile_strokes(cache, filepath, W, H, blur=blur, step=step,
+                                                  simplify_tol=simplify_tol, two_opt=two_opt, prune=prune, **fill)
+        self.orch = Orchestrator(serials, compile_fn, source=os.path.basename(filepath), backend=backend,
+                                 seg_ms=seg_ms, send_mode=send_mode, auto_pace=auto_pace,
+                                 on_update=self.row.emit)
+
+    def stop(self, serial=None): self.orch.cancel(serial)
+
+    def run(self):
+        t0 = time.perf_counter()
+        res = self.orch.run()
+        ok = sum(1 for state, _ in res.values() if state == "done")
+        self.log.emit(f"All devices finished: {ok}/{len(res)} done in {time.perf_counter() - t0:.1f}s")
+
+class PreviewWorker(QtCore.QThread):
+    """
+    สร้าง preview นอก GUI thread: รอบแรกความละเอียดต่ำ (เร็ว) แล้วตามด้วยความละเอียดเต็ม
+    รอบร่างใช้ draft_cache (memory อย่างเดียว) ไม่ให้ผลทิ้งๆ ไปลง cache บน disk
+    """
+    ready = QtCore.pyqtSignal(int, object, object, object, bool)  # gen, mask, points, StrokeSet (final), final
+    failed = QtCore.pyqtSignal(int, str)
+
+    def __init__(self, gen, filepath, W, H, blur, step, simplify_tol, cache, draft_cache=None, low_scale=4,
+                 prune=False, hatch=None):
+        super().__init__()
+        self.prune = prune; self.hatch = hatch
+        self.gen = gen; self.filepath = filepath; self.W = W; self.H = H
+        self.blur = blur; self.step = step; self.simplify_tol = simplify_tol
+        self.cache = cache; self.draft_cache = draft_cache or JobCache(cache_dir=None); self.low_scale = low_scale
+        self._stop = False
+
+    def stop(self): self._stop = True
+
+    def _strokes(self, cache, W, H, blur, scale=1):
+        fill = dict(fill=True, hatch_spacing=max(1, self.hatch[0] // scale), hatch_angle=self.hatch[1]) \
+            if self.hatch else {}
+        return build_strokes(self.filepath, W, H, blur=blur, step=max(1, self.step // scale),
+                             simplify_tol=None if self.simplify_tol is None else self.simplify_tol / scale,
+                             min_area=max(1, 80 // (scale * scale)), prune=self.prune, cache=cache,
+                             order=False, **fill)
+
+    def _emit(self, W, H, blur, scale, final):
+        cache = self.cache if final else self.draft_cache
+        fill = {"use_canny": False, "try_skeleton": False} if self.hatch else {}
+        mask = cache.mask(self.filepath, W, H, blur=blur, **fill)
+        if self._stop: return
+        strokes = self._strokes(cache, W, H, blur, scale)
+        if self._stop: return
+        pts = np.concatenate(strokes) if strokes else None
+        self.ready.emit(self.gen, mask, pts, StrokeSet.from_polylines(strokes) if final else None, final)
+
+    def run(self):
+        try:
+            s = self.low_scale
+            if s > 1:
+                self._emit(max(1, self.W // s), max(1, self.H // s), self.blur // s, s, False)
+            if not self._stop:
+                self._emit(self.W, self.H, self.blur, 1, True)
+        except Exception as e:
+            self.failed.emit(self.gen, str(e))
+
+class PlanWorker(QtCore.QThread):
+    """
+    หา step / tolerance ที่ภาพเหมือนต้นฉบับที่สุดภายในเวลาที่กำหนด
+    """
+    result = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, filepath, W, H, blur, seg_ms, budget_s, cache, prune=False, backend=None, sleep_ms=8):
+        super().__init__()
+        self.prune = prune
+        self.filepath = filepath; self.W = W; self.H = H
+        self.blur = blur; self.seg_ms = seg_ms; self.budget_s = budget_s; self.cache = cache
+        self.backend = backend; self.sleep_ms = sleep_ms
+
+    def run(self):
+        try:
+            mask = self.cache.mask(self.filepath, self.W, self.H, blur=self.blur)
+            contours = self.cache.contours(self.filepath, self.W, self.H, min_area=80, prune=self.prune,
+                                           blur=self.blur)
+            self.result.emit(plan(self.filepath, self.W, self.H, self.budget_s, blur=self.blur,
+                                  seg_ms=self.seg_ms, mask=mask, contours=contours, backend=self.backend,
+                                  sleep_ms=self.sleep_ms))
         except Exception as e:
             self.failed.emit(str(e))
 
 # ui
 class Main(QtWidgets.QWidget):
+    deviceEvent = QtCore.pyqtSignal(str, str, str)
+    # ผลจาก DeviceService (มาจาก thread ของ asyncio loop)
+    adbChecked = QtCore.pyqtSignal(bool)
+    devicesListed = QtCore.pyqtSignal(object, bool)
+    deviceInfo = QtCore.pyqtSignal(object)
+    adbRestarted = QtCore.pyqtSignal(bool)
+    deviceError = QtCore.pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle(APP_TITLE); self.resize(900, 650)
         self.serial=None; self.worker=None
+        self.cache = JobCache()
+        self.previewGen = 0; self.previewWorkers = set()
+        self.draftCache = JobCache(cache_dir=None, mem_items=8); self.previewStrokes = None
 
         root = QtWidgets.QVBoxLayout(self)
         title = QtWidgets.QLabel(APP_TITLE); title.setObjectName("title"); root.addWidget(title)
@@ -119,24 +456,69 @@ class Main(QtWidgets.QWidget):
         self.spinBlur = QtWidgets.QSpinBox(); self.spinBlur.setRange(0,31); self.spinBlur.setValue(3)
         self.spinStep = QtWidgets.QSpinBox(); self.spinStep.setRange(1,30); self.spinStep.setValue(6)
         self.spinSeg  = QtWidgets.QSpinBox(); self.spinSeg.setRange(5,250); self.spinSeg.setValue(18)
-        form.addRow("Blur:", self.spinBlur); form.addRow("Sample step:", self.spinStep); form.addRow("Segment duration (ms):", self.spinSeg)
+        self.chkTwoOpt = QtWidgets.QCheckBox("Refine stroke order (2-opt)")
+        self.chkPrune = QtWidgets.QCheckBox("Skip pixels that are already drawn (prune overlaps)")
+        self.chkFill = QtWidgets.QCheckBox("Fill solid areas with hatch lines (threshold instead of edges)")
+        self.spinHatch = QtWidgets.QSpinBox(); self.spinHatch.setRange(2, 40); self.spinHatch.setValue(6)
+        self.spinHatch.setSuffix(" px"); self.spinHatch.setEnabled(False)
+        self.spinAngle = QtWidgets.QSpinBox(); self.spinAngle.setRange(0, 179); self.spinAngle.setValue(45)
+        self.spinAngle.setSuffix("°"); self.spinAngle.setEnabled(False)
+        self.chkFill.toggled.connect(lambda on: (self.spinHatch.setEnabled(on), self.spinAngle.setEnabled(on)))
+        hatchRow = QtWidgets.QHBoxLayout()
+        hatchRow.addWidget(self.chkFill); hatchRow.addWidget(QtWidgets.QLabel("Spacing:")); hatchRow.addWidget(self.spinHatch)
+        hatchRow.addWidget(QtWidgets.QLabel("Angle:")); hatchRow.addWidget(self.spinAngle)
+        self.comboBackend = QtWidgets.QComboBox(); self.comboBackend.addItems(BACKENDS)
+        self.comboSend = QtWidgets.QComboBox(); self.comboSend.addItems(["Stream (shell stdin)", "Push script"])
+        self.comboMode = QtWidgets.QComboBox(); self.comboMode.addItems(["Fixed step", "Simplify (RDP)"])
+        self.spinTol = QtWidgets.QDoubleSpinBox(); self.spinTol.setRange(0.3, 10.0); self.spinTol.setSingleStep(0.1)
+        self.spinTol.setValue(1.5); self.spinTol.setSuffix(" px"); self.spinTol.setEnabled(False)
+        self.comboMode.currentIndexChanged.connect(lambda i: (self.spinStep.setEnabled(i == 0), self.spinTol.setEnabled(i == 1)))
+        stepRow = QtWidgets.QHBoxLayout()
+        stepRow.addWidget(self.spinStep); stepRow.addWidget(self.comboMode); stepRow.addWidget(QtWidgets.QLabel("Tolerance:")); stepRow.addWidget(self.spinTol)
+        form.addRow("Blur:", self.spinBlur); form.addRow("Sample step:", stepRow); form.addRow("Segment duration (ms):", self.spinSeg)
+        form.addRow("", self.chkTwoOpt)
+        form.addRow("", self.chkPrune)
+        form.addRow("", hatchRow)
+        form.addRow("Input backend:", self.comboBackend)
+        self.chkAutoPace = QtWidgets.QCheckBox("Auto pacing (calibrate + ack flow control)")
+        self.chkStreaming = QtWidgets.QCheckBox("Start sending while strokes are still being prepared")
+        self.chkAutoResume = QtWidgets.QCheckBox("Reconnect and resume automatically if adb drops")
+        self.chkMetricsLog = QtWidgets.QCheckBox("Write metrics log (~/.insdraw/metrics)")
+        form.addRow("Send mode:", self.comboSend)
+        form.addRow("", self.chkAutoPace)
+        form.addRow("", self.chkStreaming)
+        form.addRow("", self.chkAutoResume)
+        form.addRow("", self.chkMetricsLog)
 
         ctrl = QtWidgets.QHBoxLayout(); root.addLayout(ctrl)
         self.btnPrep = QtWidgets.QPushButton("Prepare")
+        self.btnPlan = QtWidgets.QPushButton("Fit to time…")
         self.btnStart = QtWidgets.QPushButton("Start drawing")
+        self.btnResume = QtWidgets.QPushButton("Resume"); self.btnResume.setEnabled(False)
+        self.btnAll = QtWidgets.QPushButton("Draw on all devices")
         self.btnStop  = QtWidgets.QPushButton("Stop")
-        ctrl.addWidget(self.btnPrep); ctrl.addWidget(self.btnStart); ctrl.addWidget(self.btnStop)
+        ctrl.addWidget(self.btnPrep); ctrl.addWidget(self.btnPlan); ctrl.addWidget(self.btnStart)
+        ctrl.addWidget(self.btnResume); ctrl.addWidget(self.btnAll); ctrl.addWidget(self.btnStop)
 
         # progress bar green
         self.bar = QProgressBar(); self.bar.setRange(0,100); self.bar.setValue(0)
         root.addWidget(self.bar)
 
+        # แถว progress ต่อเครื่อง (โหมดวาดทุกเครื่อง)
+        self.multiBox = QtWidgets.QGroupBox("Devices"); self.multiBox.setVisible(False)
+        self.multiRows = QtWidgets.QGridLayout(self.multiBox); root.addWidget(self.multiBox)
+        self.rowWidgets = {}; self.multiWorker = None
+
         hl = QtWidgets.QHBoxLayout(); root.addLayout(hl)
         self.preview = QtWidgets.QLabel("Preview / mask will appear here")
         self.preview.setMinimumSize(420, 320)
         self.preview.setFrameShape(QtWidgets.QFrame.Box)
         self.preview.setAlignment(QtCore.Qt.AlignCenter)
-        hl.addWidget(self.preview, 0)
+        pv = QtWidgets.QVBoxLayout(); hl.addLayout(pv, 0)
+        pv.addWidget(self.preview)
+        self.lblEstimate = QtWidgets.QLabel("Commands: -"); pv.addWidget(self.lblEstimate)
+        self.lblStats = QtWidgets.QLabel(""); pv.addWidget(self.lblStats)
+        self.lblStats.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
 
         self.log = QtWidgets.QTextEdit(); self.log.setReadOnly(True); hl.addWidget(self.log, 1)
 
@@ -146,31 +528,146 @@ class Main(QtWidgets.QWidget):
         self.btnRestart.clicked.connect(self.onRestartADB)
         self.combo.currentIndexChanged.connect(self.onSelect)
         self.btnPrep.clicked.connect(self.onPrep)
+        self.btnPlan.clicked.connect(self.onPlan)
         self.btnStart.clicked.connect(self.onStart)
+        self.btnResume.clicked.connect(self.onResume)
+        self.btnAll.clicked.connect(self.onStartAll)
         self.btnStop.clicked.connect(self.onStop)
 
-        # autoscan
-        self.timer = QtCore.QTimer(self); self.timer.setInterval(2000)
-        self.timer.timeout.connect(self.refresh_devices); self.timer.start()
-
-        if not adb_path_ok():
-            QMessageBox.critical(self, "ADB not found", "ไม่พบ adb.exe ใน PATH")
+        # preview: debounce แล้วค่อยคำนวณใน thread
+        self.previewTimer = QtCore.QTimer(self); self.previewTimer.setSingleShot(True); self.previewTimer.setInterval(250)
+        self.previewTimer.timeout.connect(self.start_preview)
+        # segment / backend / โหมดส่ง เปลี่ยนแค่เวลาโดยประมาณ ไม่ต้องคำนวณ preview ใหม่
+        for sig in (self.spinSeg.valueChanged, self.comboBackend.currentIndexChanged,
+                    self.comboSend.currentIndexChanged, self.chkAutoPace.toggled):
+            sig.connect(self.update_estimate)
+        for sig in (self.spinBlur.valueChanged, self.spinStep.valueChanged,
+                    self.spinTol.valueChanged, self.comboMode.currentIndexChanged, self.chkPrune.toggled,
+                    self.chkFill.toggled, self.spinHatch.valueChanged, self.spinAngle.valueChanged):
+            sig.connect(self.schedule_preview)
+        self.fileLine.editingFinished.connect(self.schedule_preview)
+
+        # คำถาม adb ทั้งหมดไปวิ่งใน DeviceService ผลกลับมาทาง signal -> GUI ไม่ค้าง
+        self.screenSize = None
+        self.adbChecked.connect(self.onAdbChecked)
+        self.devicesListed.connect(self.set_devices)
+        self.deviceInfo.connect(self.onDeviceInfo)
+        self.adbRestarted.connect(self.onAdbRestarted)
+        self.deviceError.connect(self.onDeviceError)
+        self.devsvc = DeviceService(on_error=lambda e: self.deviceError.emit(f"{type(e).__name__}: {e}"))
+        self.devsvc.start()
+        self.devsvc.submit(self.devsvc.adb_ok(), self.adbChecked.emit)
         self.refresh_devices(initial=True)
 
+        # track-devices stream แทนการ poll ทุก 2 วิ
+        self.deviceEvent.connect(self.onDeviceEvent)
+        self.tracker = DeviceTracker(self.deviceEvent.emit)
+        self.tracker.start()
+
     def logmsg(self, s):
         ts = time.strftime("%H:%M:%S")
         self.log.append(f"[{ts}] {s}")
         self.log.moveCursor(QtGui.QTextCursor.End)
 
-    def set_preview(self, mask):
-        img = make_preview(mask)
+    def set_preview(self, mask, points=None):
+        img = make_preview(mask, points)
         h, w = img.shape[:2]
         qimg = QtGui.QImage(img.data, w, h, 3*w, QtGui.QImage.Format_BGR888)
-        self.preview.setPixmap(QtGui.QPixmap.fromImage(qimg))
+        pix = QtGui.QPixmap.fromImage(qimg).scaled(
+            self.preview.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        self.preview.setPixmap(pix)
+
+    def hatch_params(self):
+        return (self.spinHatch.value(), float(self.spinAngle.value())) if self.chkFill.isChecked() else None
+
+    def schedule_preview(self, *_):
+        self.previewTimer.start()
+
+    def start_preview(self):
+        fn = os.path.normpath(self.fileLine.text().strip())
+        if not fn or not os.path.exists(fn): return
+        self.previewGen += 1
+        for w in self.previewWorkers: w.stop()  # งานเก่าไม่ต้องทำต่อ
+        size = self.screenSize or (1080,1920)
+        w = PreviewWorker(
+            self.previewGen, fn, size[0], size[1],
+            blur=self.spinBlur.value(), step=self.spinStep.value(),
+            simplify_tol=self.spinTol.value() if self.comboMode.currentIndex() == 1 else None,
+            cache=self.cache, draft_cache=self.draftCache, prune=self.chkPrune.isChecked(),
+            hatch=self.hatch_params()
+        )
+        w.ready.connect(self.onPreviewReady)
+        w.failed.connect(lambda gen, msg: gen == self.previewGen and self.logmsg(f"Preview error: {msg}"))
+        w.finished.connect(lambda w=w: self.previewWorkers.discard(w))
+        self.previewWorkers.add(w)
+        w.start()
+
+    def onPreviewReady(self, gen, mask, points, strokes, final):
+        if gen != self.previewGen: return
+        self.set_preview(mask, points)
+        self.previewStrokes = strokes
+        self.update_estimate()
+
+    def update_estimate(self, *_):
+        if self.previewStrokes is None:
+            self.lblEstimate.setText("Commands: … (draft preview)"); return
+        cmds = self.estimate_backend().encode(self.previewStrokes)
+        secs = estimate_duration(cmds, sleep_ms=self.estimate_sleep_ms())
+        self.lblEstimate.setText(f"Commands: {len(cmds)} · est. {format_duration(secs)}")
+
+    def estimate_backend(self):
+        # backend / โหมดส่งที่เลือกอยู่ (ไม่ probe เครื่องบน GUI thread)
+        return model_backend(self.comboBackend.currentText(), self.spinSeg.value(), self.screenSize or (1080, 1920))
+
+    def estimate_sleep_ms(self):
+        return send_sleep_ms("script" if self.comboSend.currentIndex() == 1 else "stream", self.chkAutoPace.isChecked())
+
+    def onPlan(self):
+        fn = os.path.normpath(self.fileLine.text().strip())
+        if not fn or not os.path.exists(fn):
+            QMessageBox.warning(self, "No file", "pick file PNG/JPG"); return
+        budget, ok = QtWidgets.QInputDialog.getInt(self, "Fit to time", "Time budget (seconds):", 120, 5, 36000)
+        if not ok: return
+        size = self.screenSize or (1080,1920)
+        self.planWorker = PlanWorker(fn, size[0], size[1], self.spinBlur.value(), self.spinSeg.value(), budget, self.cache,
+                                     prune=self.chkPrune.isChecked(), backend=self.estimate_backend(),
+                                     sleep_ms=self.estimate_sleep_ms())
+        self.planWorker.result.connect(self.onPlanResult)
+        self.planWorker.failed.connect(lambda msg: self.logmsg(f"Plan error: {msg}"))
+        self.btnPlan.setEnabled(False)
+        self.planWorker.finished.connect(lambda: self.btnPlan.setEnabled(True))
+        self.planWorker.start()
+        self.logmsg(f"Planning for {budget}s…")
+
+    def onPlanResult(self, res):
+        best = res["best"]
+        if not best:
+            fastest = min(res["candidates"], key=lambda r: r["seconds"])
+            self.logmsg(f"Nothing fits — fastest is {fastest['mode']}={fastest['value']} "
+                        f"({format_duration(fastest['seconds'])})")
+            return
+        if best["mode"] == "step":
+            self.comboMode.setCurrentIndex(0); self.spinStep.setValue(int(best["value"]))
+        else:
+            self.comboMode.setCurrentIndex(1); self.spinTol.setValue(float(best["value"]))
+        self.logmsg(f"Plan: {best['mode']}={best['value']} → {best['commands']} cmds, "
+                    f"est. {format_duration(best['seconds'])}, fidelity {best['fidelity']:.3f}")
 
     # devicee
     def refresh_devices(self, initial=False):
-        devs = adb_devices()
+        self.devsvc.submit(self.devsvc.devices(), lambda devs: self.devicesListed.emit(devs, initial))
+
+    def onAdbChecked(self, ok):
+        if not ok:
+            QMessageBox.critical(self, "ADB not found", "ไม่พบ adb.exe ใน PATH")
+
+    def onDeviceEvent(self, kind, serial, state):
+        self.logmsg(f"Device {kind}: {serial} ({state})")
+        if state == "unauthorized":
+            self.logmsg("if u see unauthorized pls Allow USB debugging!!!")
+        self.set_devices([s for s, st in self.tracker.devices.items() if st == "device"])
+
+    def set_devices(self, devs, initial=False):
         cur = self.combo.currentText()
         self.combo.blockSignals(True)
         self.combo.clear()
@@ -178,9 +675,6 @@ class Main(QtWidgets.QWidget):
             self.combo.addItems(devs)
             i = self.combo.findText(cur); 
             if i >= 0: self.combo.setCurrentIndex(i)
-            if self.timer.isActive():
-                self.timer.stop()
-                self.logmsg("✅ Device detected — stop scanning to reduce load.")
         else:
             self.combo.addItem("No device")
             self.lblModel.setText("Model: -"); self.lblSize.setText("Screen: -")
@@ -189,40 +683,61 @@ class Main(QtWidgets.QWidget):
 
         if devs and (self.serial is None or self.serial not in devs):
             self.serial = devs[0]; self.update_device_info()
+        elif not devs:
+            self.serial = None
         if initial and not devs:
             self.logmsg("if u see unauthorized pls Allow USB debugging!!!")
 
     def update_device_info(self):
         if not self.serial: return
-        model = get_device_model(self.serial) or "-"
-        size  = get_screen_size(self.serial)
+        self.screenSize = None
+        self.lblModel.setText("Model: …"); self.lblSize.setText("Screen: …")
+        self.devsvc.submit(self.devsvc.device_info(self.serial), self.deviceInfo.emit)
+        self.update_resume()
+
+    def onDeviceInfo(self, info):
+        if info["serial"] != self.serial: return  # ผลของเครื่องที่เลือกไว้ก่อนหน้า
+        model, size = info["model"] or "-", info["size"]
+        self.screenSize = size
         self.lblModel.setText(f"Model: {model}")
         self.lblSize.setText(f"Screen: {size[0]}x{size[1]}" if size else "Screen: -")
         self.logmsg(f"Selected: {self.serial} | Model: {model} | Size: {size}")
+        self.schedule_preview()
+
+    def update_resume(self):
+        info = DrawJob.pending(self.serial) if self.serial else None
+        busy = bool(self.worker and self.worker.isRunning())
+        self.btnResume.setEnabled(bool(info) and not busy)
+        self.btnResume.setToolTip(f"{info['source']}: stroke {info['done_strokes']}/{info['n_strokes']}"
+                                  if info else "")
 
     def onSelect(self, _i):
         t = self.combo.currentText()
         self.serial = None if (not t or t=="No device") else t
         if self.serial: self.update_device_info()
+        else: self.update_resume()
 
     # actions
     def onRestartADB(self):
         self.logmsg("Restarting ADB server…")
-        ok = adb_restart_server()
+        self.btnRestart.setEnabled(False)
+        self.devsvc.submit(self.devsvc.restart_server(), self.adbRestarted.emit)
+
+    def onAdbRestarted(self, ok):
+        self.btnRestart.setEnabled(True)
         self.logmsg("ADB restarted" if ok else "ADB restart failed")
-        self.timer.start(); self.refresh_devices()
+        self.refresh_devices()
+
+    def onDeviceError(self, msg):
+        self.btnRestart.setEnabled(True)
+        self.logmsg(f"ADB query failed: {msg}")
 
     def onBrowse(self):
         fn, _ = QFileDialog.getOpenFileName(self, "Select PNG/JPG", "", "Images (*.png *.jpg *.jpeg)")
         if not fn: return
         fn = os.path.normpath(fn)
         self.fileLine.setText(fn)
-        try:
-            size = get_screen_size(self.serial) if self.serial else (1080,1920)
-            mask = preprocess_image(fn, size[0], size[1], blur=self.spinBlur.value())
-            self.set_preview(mask)
-        except Exception as e:
-            self.logmsg(f"Preview error: {e}")
+        self.previewTimer.stop(); self.start_preview()
 
     def onPrep(self):
         QMessageBox.information(self, "Prepare",
@@ -240,14 +755,114 @@ class Main(QtWidgets.QWidget):
             QMessageBox.warning(self, "No file", "pick file PNG/JPG"); return
 
         self.bar.setValue(0)
-        self.btnStart.setEnabled(False)
+        self.btnStart.setEnabled(False); self.btnResume.setEnabled(False)
 
         self.worker = DrawWorker(
             self.serial, fn,
             blur=self.spinBlur.value(),
             step=self.spinStep.value(),
-            seg_ms=self.spinSeg.value()
+            seg_ms=self.spinSeg.value(),
+            two_opt=self.chkTwoOpt.isChecked(),
+            simplify_tol=self.spinTol.value() if self.comboMode.currentIndex() == 1 else None,
+            backend=self.comboBackend.currentText(),
+            send_mode="script" if self.comboSend.currentIndex() == 1 else "stream",
+            auto_pace=self.chkAutoPace.isChecked(),
+            cache=self.cache,
+            streaming=self.chkStreaming.isChecked(),
+            prune=self.chkPrune.isChecked(),
+            auto_reconnect=self.chkAutoResume.isChecked(),
+            hatch=self.hatch_params(),
+            metrics_log=self.chkMetricsLog.isChecked()
         )
+        self.start_worker()
+
+    def onResume(self):
+        if self.worker and self.worker.isRunning():
+            QMessageBox.information(self, "Busy", "drawing"); return
+        if not self.serial:
+            QMessageBox.warning(self, "No device", "No connect"); return
+        job = DrawJob.load(self.serial)
+        if job is None:
+            self.logmsg("No saved job for this device"); self.update_resume(); return
+        size = self.screenSize
+        if not size or tuple(size) != (job.W, job.H):
+            QMessageBox.warning(self, "Screen size changed",
+                                f"job {job.W}x{job.H}, device {'x'.join(map(str, size)) if size else '-'}"); return
+
+        self.bar.setValue(int(job.next_command * 100 / max(1, len(job.cmds))))
+        self.btnStart.setEnabled(False); self.btnResume.setEnabled(False)
+        self.worker = DrawWorker(
+            self.serial, job.source, blur=0, step=0, seg_ms=self.spinSeg.value(),
+            send_mode="script" if self.comboSend.currentIndex() == 1 else "stream",
+            auto_pace=self.chkAutoPace.isChecked(), cache=self.cache,
+            resume=job, auto_reconnect=self.chkAutoResume.isChecked(),
+            metrics_log=self.chkMetricsLog.isChecked()
+        )
+        self.start_worker()
+
+    def onStartAll(self):
+        if (self.worker and self.worker.isRunning()) or (self.multiWorker and self.multiWorker.isRunning()):
+            QMessageBox.information(self, "Busy", "drawing"); return
+        serials = [self.combo.itemText(i) for i in range(self.combo.count())
+                   if self.combo.itemText(i) != "No device"]
+        if not serials:
+            QMessageBox.warning(self, "No device", "No connect"); return
+        fn = os.path.normpath(self.fileLine.text().strip())
+        if not fn or not os.path.exists(fn):
+            QMessageBox.warning(self, "No file", "pick file PNG/JPG"); return
+
+        while self.multiRows.count():
+            w = self.multiRows.takeAt(0).widget()
+            if w: w.deleteLater()
+        self.rowWidgets = {}
+        for r, serial in enumerate(serials):
+            bar = QProgressBar(); bar.setRange(0, 100); bar.setValue(0)
+            state = QtWidgets.QLabel("waiting")
+            stop = QtWidgets.QPushButton("Stop")
+            stop.clicked.connect(lambda _=False, s=serial: self.multiWorker and self.multiWorker.stop(s))
+            self.multiRows.addWidget(QtWidgets.QLabel(serial), r, 0)
+            self.multiRows.addWidget(bar, r, 1); self.multiRows.addWidget(state, r, 2); self.multiRows.addWidget(stop, r, 3)
+            self.rowWidgets[serial] = (bar, state, stop)
+        self.multiBox.setVisible(True)
+
+        self.btnStart.setEnabled(False); self.btnAll.setEnabled(False); self.btnResume.setEnabled(False)
+        self.multiWorker = MultiDrawWorker(
+            serials, fn,
+            blur=self.spinBlur.value(),
+            step=self.spinStep.value(),
+            seg_ms=self.spinSeg.value(),
+            two_opt=self.chkTwoOpt.isChecked(),
+            simplify_tol=self.spinTol.value() if self.comboMode.currentIndex() == 1 else None,
+            backend=self.comboBackend.currentText(),
+            send_mode="script" if self.comboSend.currentIndex() == 1 else "stream",
+            auto_pace=self.chkAutoPace.isChecked(),
+            cache=self.cache,
+            prune=self.chkPrune.isChecked(),
+            hatch=self.hatch_params()
+        )
+        self.multiWorker.row.connect(self.onDeviceRow)
+        self.multiWorker.log.connect(self.logmsg)
+        self.multiWorker.finished.connect(self.onAllDone)
+        self.multiWorker.start()
+        self.logmsg(f"Drawing on {len(serials)} devices")
+
+    def onDeviceRow(self, serial, state, percent, message):
+        if serial not in self.rowWidgets: return
+        bar, label, stop = self.rowWidgets[serial]
+        bar.setValue(percent)
+        label.setText(f"{state} {message}".strip())
+        if state in ("done", "failed", "canceled"):
+            stop.setEnabled(False)
+            self.logmsg(f"{serial}: {state} {message}".strip())
+
+    def onAllDone(self):
+        self.multiWorker = None
+        self.btnStart.setEnabled(True); self.btnAll.setEnabled(True)
+        self.update_resume()
+
+    def start_worker(self):
+        self.lblStats.setText("")
+        self.worker.stats.connect(lambda snap: self.lblStats.setText(format_stats(snap)))
         self.worker.log.connect(self.logmsg)
         self.worker.percent.connect(self.bar.setValue)
         self.worker.done.connect(self.onDone)
@@ -259,14 +874,24 @@ class Main(QtWidgets.QWidget):
         self.logmsg("Finished ✅")
         self.btnStart.setEnabled(True)
         self.worker = None
+        self.update_resume()
 
     def onFailed(self, msg):
         self.logmsg("ERROR: " + msg)
         self.btnStart.setEnabled(True)
         self.worker = None
+        self.update_resume()
+
+    def closeEvent(self, ev):
+        self.tracker.stop()
+        self.devsvc.stop()
+        super().closeEvent(ev)
 
     def onStop(self):
-        if self.worker and self.worker.isRunning():
+        if self.multiWorker and self.multiWorker.isRunning():
+            self.multiWorker.stop()
+            self.logmsg("Stopping all devices…")
+        elif self.worker and self.worker.isRunning():
             self.worker.stop()
             self.logmsg("Stopping…")
         else:
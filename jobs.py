@@ -0,0 +1,127 @@
+import os, re, json, time, zlib, zipfile
+
+import numpy as np
+
+from strokes import StrokeSet, CommandBlob
+
+
+JOBS_DIR = os.environ.get("INSDRAW_JOBS", os.path.join(os.path.expanduser("~"), ".insdraw", "jobs"))
+
+
+def _safe(serial):
+    # serial ของเครื่อง wifi เป็น host:port
+    return re.sub(r"[^A-Za-z0-9._-]", "_", serial)
+
+
+def _remove(base):
+    for ext in (".npz", ".json"):
+        try:
+            os.remove(base + ext)
+        except OSError:
+            pass
+
+
+class DrawJob:
+    """
+    งานวาดที่ compile แล้วของเครื่องหนึ่ง + จำนวนเส้นที่เครื่องยืนยันว่าวาดเสร็จ (resume ได้)
+    - <serial>.npz: strokes + คำสั่ง + stroke_ends (เขียนครั้งเดียวตอนเริ่มงาน)
+    - <serial>.json: ความคืบหน้า (เขียนทับบ่อยๆ แบบ atomic)
+    """
+    def __init__(self, serial, W, H, strokes, cmds, stroke_ends, source="", backend="",
+                 done_strokes=0, jobs_dir=None):
+        self.serial = serial; self.W = W; self.H = H
+        self.strokes = strokes; self.cmds = cmds
+        self.stroke_ends = np.asarray(stroke_ends, dtype=np.int64)
+        self.source = source; self.backend = backend
+        self.done_strokes = done_strokes
+        self.jobs_dir = jobs_dir or JOBS_DIR
+        self._saved_at = 0.0
+
+    @property
+    def _base(self):
+        return os.path.join(self.jobs_dir, _safe(self.serial))
+
+    @property
+    def n_strokes(self):
+        return len(self.stroke_ends)
+
+    @property
+    def next_command(self):
+        """
+        index คำสั่งแรกที่ยังไม่ยืนยัน (ต้นเส้นเสมอ)
+        """
+        return int(self.stroke_ends[self.done_strokes - 1]) if self.done_strokes else 0
+
+    def remaining(self):
+        return self.cmds[self.next_command:]
+
+    def confirm(self, n_cmds, min_interval=1.0):
+        """
+        เครื่องรันครบ n_cmds คำสั่งแรกแล้ว -> นับเส้นที่จบครบ, เขียน progress ไม่ถี่เกิน min_interval วินาที
+        """
+        done = int(np.searchsorted(self.stroke_ends, n_cmds, side="right"))
+        if done <= self.done_strokes:
+            return
+        self.done_strokes = done
+        if time.monotonic() - self._saved_at >= min_interval:
+            self.save_progress()
+
+    @property
+    def finished(self):
+        return self.done_strokes >= self.n_strokes
+
+    def save(self):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        tmp = self._base + ".tmp.npz"
+        np.savez_compressed(tmp, coords=self.strokes.coords, offsets=self.strokes.offsets,
+                            cmds=np.frombuffer(self.cmds.tobytes(), dtype=np.uint8),
+                            stroke_ends=self.stroke_ends)
+        os.replace(tmp, self._base + ".npz")
+        self.save_progress()
+
+    def save_progress(self):
+        info = {"serial": self.serial, "size": [self.W, self.H], "source": self.source,
+                "backend": self.backend, "done_strokes": self.done_strokes, "n_strokes": self.n_strokes,
+                "updated": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        tmp = self._base + ".tmp.json"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        os.replace(tmp, self._base + ".json")
+        self._saved_at = time.monotonic()
+
+    def discard(self):
+        _remove(self._base)
+
+    @classmethod
+    def load(cls, serial, jobs_dir=None):
+        """
+        -> DrawJob ที่ค้างไว้ของเครื่องนี้ หรือ None (checkpoint ที่เสีย/ไม่ครบจะถูกลบทิ้ง)
+        """
+        base = os.path.join(jobs_dir or JOBS_DIR, _safe(serial))
+        if not os.path.exists(base + ".json"):
+            return None
+        try:
+            with open(base + ".json", encoding="utf-8") as f:
+                info = json.load(f)
+            with np.load(base + ".npz") as z:
+                strokes = StrokeSet(z["coords"], z["offsets"])
+                cmds = CommandBlob(z["cmds"].tobytes())
+                ends = z["stroke_ends"]
+            W, H = info["size"]
+        except (OSError, ValueError, KeyError, TypeError, EOFError, zipfile.BadZipFile, zlib.error):
+            _remove(base)
+            return None
+        return cls(serial, W, H, strokes, cmds, ends, source=info.get("source", ""),
+                   backend=info.get("backend", ""), done_strokes=int(info.get("done_strokes", 0)),
+                   jobs_dir=jobs_dir)
+
+    @classmethod
+    def pending(cls, serial, jobs_dir=None):
+        """
+        อ่านเฉพาะ progress (ไม่โหลดคำสั่ง) -> dict หรือ None
+        """
+        try:
+            with open(os.path.join(jobs_dir or JOBS_DIR, _safe(serial)) + ".json", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
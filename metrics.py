@@ -0,0 +1,200 @@
+import os, re, json, time, bisect, threading
+from contextlib import contextmanager
+
+
+METRICS_DIR = os.environ.get("INSDRAW_METRICS", os.path.join(os.path.expanduser("~"), ".insdraw", "metrics"))
+
+METRICS_KEEP = 50  # เก็บไฟล์ metrics ล่าสุดไว้แค่นี้ ไฟล์เก่ากว่าลบทิ้ง
+
+# ขอบ bucket ของ latency การเขียนต่อคำสั่ง (ms); bucket สุดท้าย = มากกว่าค่าสุดท้าย
+LATENCY_EDGES_MS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+_local = threading.local()
+
+
+def current():
+    """
+    Metrics ที่ active อยู่ใน thread นี้ (หรือ None = ไม่วัด)
+    """
+    return getattr(_local, "rec", None)
+
+
+@contextmanager
+def stage(name):
+    """
+    จับเวลา stage ให้ Metrics ที่ active อยู่ ไม่มีก็ไม่ทำอะไร
+    """
+    rec = current()
+    if rec is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        rec.add_stage(name, time.perf_counter() - t0)
+
+
+class Metrics:
+    """
+    ตัวเก็บสถิติของงานวาดหนึ่งงาน
+    - stages: เวลารวมต่อ stage (วินาที)
+    - histogram latency ของการเขียนแต่ละคำสั่งลง stdin ของ shell
+    - sent / confirmed -> commands/s และ ETA
+    - path: ไฟล์ JSON-lines (stage / progress / summary ทีละบรรทัด)
+    - on_update(snapshot): เรียกไม่ถี่เกิน interval วินาที (เช่น อัปเดต GUI)
+    """
+    def __init__(self, job="", path=None, on_update=None, interval=0.5):
+        self.job = job
+        self.path = path
+        self.on_update = on_update
+        self.interval = interval
+        self.stages = {}
+        self.hist = [0] * (len(LATENCY_EDGES_MS) + 1)
+        self.writes = 0; self.write_s = 0.0
+        self.sent = 0; self.confirmed = 0; self.total = 0
+        self.t_start = time.time()
+        self.t_send = None
+        self._last_emit = 0.0
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @classmethod
+    def for_job(cls, serial, source="", **kw):
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", f"{time.strftime('%Y%m%d-%H%M%S')}_{serial}")
+        prune_metrics(METRICS_DIR, METRICS_KEEP - 1)
+        return cls(job=source, path=os.path.join(METRICS_DIR, name + ".jsonl"), **kw)
+
+    @contextmanager
+    def activate(self):
+        prev = current()
+        _local.rec = self
+        try:
+            yield self
+        finally:
+            _local.rec = prev
+
+    def _log(self, event, **data):
+        if not self.path:
+            return
+        line = json.dumps({"t": round(time.time() - self.t_start, 4), "event": event, **data})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self._log("stage", stage=name, seconds=round(seconds, 5))
+        self._maybe_emit(force=True)
+
+    def start_send(self, total):
+        self.total = total; self.sent = self.confirmed = 0
+        self.t_send = time.perf_counter()
+
+    def write(self, seconds):
+        ms = seconds * 1000.0
+        self.hist[bisect.bisect_left(LATENCY_EDGES_MS, ms)] += 1
+        self.writes += 1; self.write_s += seconds
+        self.sent += 1
+        self._maybe_emit()
+
+    def confirm(self, n):
+        self.confirmed = max(self.confirmed, n)
+        self._maybe_emit()
+
+    def rate(self):
+        """
+        คำสั่ง/วินาที นับจากที่เครื่องยืนยัน (ถ้ามี) ไม่งั้นนับจากที่เขียนไป
+        """
+        if self.t_send is None:
+            return 0.0
+        dt = time.perf_counter() - self.t_send
+        return (self.confirmed or self.sent) / dt if dt > 0 else 0.0
+
+    def eta(self):
+        r = self.rate()
+        if not r or not self.total:
+            return None
+        return max(0.0, (self.total - (self.confirmed or self.sent)) / r)
+
+    def percentile(self, q):
+        """
+        latency (ms) ประมาณจาก histogram = ขอบบนของ bucket ที่ครอบ percentile q
+        """
+        n = sum(self.hist)
+        if not n:
+            return None
+        acc = 0
+        for i, c in enumerate(self.hist):
+            acc += c
+            if acc >= q * n:
+                return LATENCY_EDGES_MS[i] if i < len(LATENCY_EDGES_MS) else float("inf")
+
+    def snapshot(self):
+        eta = self.eta()
+        return {
+            "job": self.job,
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+            "sent": self.sent, "confirmed": self.confirmed, "total": self.total,
+            "cmds_per_s": round(self.rate(), 1),
+            "eta_s": None if eta is None else round(eta, 1),
+            "write_ms_mean": round(self.write_s * 1000 / self.writes, 3) if self.writes else None,
+            "write_ms_p50": self.percentile(0.5), "write_ms_p95": self.percentile(0.95),
+            "write_hist": {"edges_ms": list(LATENCY_EDGES_MS), "counts": list(self.hist)},
+        }
+
+    def _maybe_emit(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_emit < self.interval:
+            return
+        self._last_emit = now
+        snap = self.snapshot()
+        if self.t_send is not None:
+            self._log("progress", sent=snap["sent"], confirmed=snap["confirmed"], total=snap["total"],
+                      cmds_per_s=snap["cmds_per_s"], eta_s=snap["eta_s"])
+        if self.on_update:
+            self.on_update(snap)
+
+    def finish(self, **extra):
+        """
+        เขียน summary บรรทัดสุดท้าย -> snapshot
+        """
+        snap = self.snapshot()
+        snap["wall_s"] = round(time.time() - self.t_start, 3)
+        snap.update(extra)
+        self._log("summary", **snap)
+        if self.on_update:
+            self.on_update(snap)
+        return snap
+
+
+def prune_metrics(metrics_dir=METRICS_DIR, keep=METRICS_KEEP):
+    """
+    ลบไฟล์ .jsonl เก่าสุดใน metrics_dir ให้เหลือไม่เกิน keep ไฟล์
+    """
+    try:
+        paths = [e.path for e in os.scandir(metrics_dir) if e.is_file() and e.name.endswith(".jsonl")]
+    except OSError:
+        return
+    paths.sort(key=lambda p: os.path.getmtime(p))
+    for p in paths[:max(0, len(paths) - keep)]:
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+
+def format_stats(snap):
+    """
+    snapshot -> ข้อความหลายบรรทัดสำหรับ panel ใน GUI
+    """
+    lines = [f"{k:<12}{v * 1000:8.1f} ms" for k, v in snap["stages"].items()]
+    if snap["total"]:
+        eta = snap["eta_s"]
+        lines.append(f"sent {snap['sent']}/{snap['total']}  confirmed {snap['confirmed']}")
+        lines.append(f"{snap['cmds_per_s']:.1f} cmd/s  ETA " + ("-" if eta is None else f"{eta:.0f}s"))
+    if snap["write_ms_p50"] is not None:
+        lines.append(f"write p50 ≤{snap['write_ms_p50']}ms  p95 ≤{snap['write_ms_p95']}ms  "
+                     f"mean {snap['write_ms_mean']}ms")
+    return "\n".join(lines)
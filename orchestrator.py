@@ -0,0 +1,128 @@
+import threading
+from concurrent.futures import Future
+
+from utils import get_screen_size, run_adb_batch, run_adb_script, calibrate_latency, auto_pacing
+from backends import pick_backend
+from draw_core import build_strokes
+from strokes import StrokeSet
+from jobs import DrawJob
+
+
+def compile_strokes(cache, path, W, H, **params):
+    """
+    ภาพ -> StrokeSet ที่เรียงแล้วสำหรับจอ W x H (build_strokes ผ่าน JobCache) ใช้เป็น compile_fn ได้
+    """
+    return StrokeSet.from_polylines(build_strokes(path, W, H, cache=cache, **params))
+
+
+class Orchestrator:
+    """
+    วาดงานเดียวกันบนหลายเครื่องพร้อมกัน
+    - compile ครั้งเดียวต่อขนาดจอ (เครื่องที่ขนาดเดียวกันรอผลเดียวกัน), encode ครั้งเดียวต่อ backend
+    - แต่ละเครื่องมี thread, backend, pacing, progress, checkpoint และ cancel ของตัวเอง
+      เครื่องที่ช้า/หลุดไม่ถ่วงเครื่องอื่น
+    - on_update(serial, state, percent, message): state = compiling | sending | done | failed | canceled
+      (เรียกจาก thread ของเครื่องนั้น)
+    """
+    def __init__(self, serials, compile_fn, source="", backend="auto", seg_ms=18, send_mode="stream",
+                 sleep_ms=8, auto_pace=False, on_update=None):
+        self.serials = list(serials)
+        self.compile_fn = compile_fn
+        self.source = source
+        self.backend = backend; self.seg_ms = seg_ms
+        self.send_mode = send_mode; self.sleep_ms = sleep_ms; self.auto_pace = auto_pace
+        self.on_update = on_update
+        self.results = {}
+        self._compiled = {}
+        self._encoded = {}
+        self._lock = threading.Lock()
+        self._cancel = {s: threading.Event() for s in self.serials}
+        self._threads = []
+
+    def _emit(self, serial, state, percent=0, message=""):
+        if self.on_update:
+            self.on_update(serial, state, percent, message)
+
+    def cancel(self, serial=None):
+        for s in ([serial] if serial else self.serials):
+            self._cancel[s].set()
+
+    def _once(self, table, key, fn):
+        # คนแรกที่ขอ key ได้ทำ fn คนอื่นรอผลเดียวกัน
+        with self._lock:
+            fut = table.get(key)
+            owner = fut is None
+            if owner:
+                fut = table[key] = Future()
+        if owner:
+            try:
+                fut.set_result(fn())
+            except Exception as e:
+                fut.set_exception(e)
+        return fut.result()
+
+    def start(self):
+        for s in self.serials:
+            t = threading.Thread(target=self._device, args=(s,), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def join(self, timeout=None):
+        for t in self._threads:
+            t.join(timeout)
+        return self.results
+
+    def run(self):
+        self.start()
+        return self.join()
+
+    def _device(self, serial):
+        canceled = self._cancel[serial].is_set
+        try:
+            size = get_screen_size(serial)
+            if not size:
+                raise RuntimeError("screen size unavailable")
+            W, H = size
+            self._emit(serial, "compiling", 0, f"{W}x{H}")
+            strokes = self._once(self._compiled, (W, H), lambda: self.compile_fn(W, H))
+
+            pacing = {"window": 0, "ack_every": 20, "seg_ms": self.seg_ms, "sleep_ms": self.sleep_ms}
+            if self.auto_pace and self.send_mode == "stream":
+                lat = calibrate_latency(serial)
+                if lat:
+                    pacing = auto_pacing(lat, self.seg_ms)
+            backend = pick_backend(serial, self.backend, seg_ms=pacing["seg_ms"], screen_size=(W, H))
+            cmds = self._once(self._encoded, ((W, H), backend.cache_key), lambda: backend.encode(strokes))
+            if not cmds:
+                raise RuntimeError("no commands")
+
+            job = DrawJob(serial, W, H, strokes, cmds, backend.stroke_ends(strokes),
+                          source=self.source, backend=backend.name)
+            job.save()
+            total = len(cmds)
+            self._emit(serial, "sending", 0, f"{total} cmds via {backend.name}")
+
+            def on_progress(p): self._emit(serial, "sending", min(int(p), 99))
+            if self.send_mode == "script":
+                rc, err = run_adb_script(serial, cmds, progress_cb=on_progress, cancel_check=canceled,
+                                         confirm_cb=job.confirm)
+            else:
+                rc, err = run_adb_batch(serial, cmds, progress_cb=on_progress, cancel_check=canceled,
+                                        sleep_ms=pacing["sleep_ms"], window=pacing["window"],
+                                        ack_every=pacing["ack_every"], confirm_cb=job.confirm)
+            if canceled():
+                job.save_progress()
+                self.results[serial] = ("canceled", job.done_strokes)
+                self._emit(serial, "canceled", int(job.next_command * 100 / total),
+                           f"stroke {job.done_strokes}/{job.n_strokes}")
+            elif rc == 0:
+                job.discard()
+                self.results[serial] = ("done", total)
+                self._emit(serial, "done", 100, f"{total} cmds")
+            else:
+                job.save_progress()
+                self.results[serial] = ("failed", err)
+                self._emit(serial, "failed", int(job.next_command * 100 / total), f"rc={rc} {err}")
+        except Exception as e:
+            self.results[serial] = ("failed", str(e))
+            self._emit(serial, "failed", 0, str(e))
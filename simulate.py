@@ -0,0 +1,134 @@
+import numpy as np
+import cv2
+
+from draw_core import preprocess_image, extract_contours, sample_points, simplify_points, order_strokes
+from backends import SwipeBackend, MotionEventBackend, SendeventBackend
+from strokes import StrokeSet
+
+STEPS = (1, 2, 3, 4, 6, 8, 10, 14, 20, 30)
+TOLERANCES = (0.5, 0.8, 1.0, 1.5, 2.0, 3.0, 4.0, 6.0)
+
+
+def model_backend(name, seg_ms=18, screen_size=(1080, 1920)):
+    """
+    backend ไว้ประมาณเวลา/จำลองภาพโดยไม่ probe เครื่อง ("auto" = swipe เหมือน pick_backend)
+    sendevent ใช้ touch range เท่าขนาดจอ (เวลาไม่ขึ้นกับ node/range)
+    """
+    if name == "motionevent":
+        return MotionEventBackend()
+    if name == "sendevent":
+        W, H = screen_size
+        return SendeventBackend({"node": "/dev/input/event0", "x": (0, W - 1), "y": (0, H - 1)}, W, H)
+    return SwipeBackend(seg_ms=seg_ms)
+
+
+def send_sleep_ms(send_mode="stream", auto_pace=False, sleep_ms=8):
+    """
+    host sleep ต่อบรรทัดของโหมดส่ง: script / auto pacing ไม่ sleep
+    """
+    return 0 if send_mode == "script" or auto_pace else sleep_ms
+
+
+def estimate_duration(cmds, tap_ms=60, cmd_latency_ms=120, sleep_ms=8, sendevent_ms=12):
+    """
+    เวลาวาดบนเครื่องโดยประมาณ (วินาที)
+    - ฝั่งเครื่อง: ทุกคำสั่ง `input` เสีย cmd_latency_ms (spawn) + เวลา swipe (seg_ms ในคำสั่ง) หรือ tap_ms
+      (motionevent ไม่มีเวลา swipe), คำสั่ง sendevent เสีย sendevent_ms ต่อ event
+    - ฝั่ง host: sleep_ms ต่อบรรทัด (ดู send_sleep_ms) — เครื่องกับ host ทำงานซ้อนกัน เลยเอาค่าที่มากกว่า
+    """
+    device_ms = 0.0
+    for c in cmds:
+        if c.startswith("sendevent"):
+            device_ms += sendevent_ms * c.count("sendevent ")
+            continue
+        parts = c.split()
+        device_ms += cmd_latency_ms
+        if len(parts) >= 7 and parts[1] == "swipe":
+            device_ms += int(parts[6])
+        elif len(parts) >= 2 and parts[1] == "tap":
+            device_ms += tap_ms
+    return max(device_ms, len(cmds) * sleep_ms) / 1000.0
+
+
+def rasterize(cmds, W, H, thickness=3):
+    """
+    วาดคำสั่ง (tap/swipe/motionevent) กลับเป็นภาพ mask เพื่อเทียบกับต้นฉบับ
+    """
+    out = np.zeros((H, W), np.uint8)
+    r = max(1, thickness // 2)
+    last = None
+    for c in cmds:
+        p = c.split()
+        if len(p) < 4 or p[0] != "input":
+            continue
+        if p[1] == "tap":
+            cv2.circle(out, (int(p[2]), int(p[3])), r, 255, -1)
+        elif p[1] == "swipe" and len(p) >= 6:
+            cv2.line(out, (int(p[2]), int(p[3])), (int(p[4]), int(p[5])), 255, thickness)
+        elif p[1] == "motionevent" and len(p) >= 5:
+            pt = (int(p[3]), int(p[4]))
+            if p[2] == "DOWN":
+                cv2.circle(out, pt, r, 255, -1)
+            elif last is not None:
+                cv2.line(out, last, pt, 255, thickness)
+            last = None if p[2] == "UP" else pt
+    return out
+
+
+def fidelity(raster, mask, tol=2):
+    """
+    F1 ระหว่างภาพที่วาดได้กับ mask (ยอมคลาดได้ tol px)
+    """
+    k = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * tol + 1, 2 * tol + 1))
+    drawn = raster > 0; want = mask > 0
+    if not want.any():
+        return 1.0 if not drawn.any() else 0.0
+    if not drawn.any():
+        return 0.0
+    near_want = cv2.dilate(mask, k) > 0
+    near_drawn = cv2.dilate(raster, k) > 0
+    precision = (drawn & near_want).sum() / drawn.sum()
+    recall = (want & near_drawn).sum() / want.sum()
+    return float(2 * precision * recall / max(precision + recall, 1e-9))
+
+
+def _strokes(contours, step=None, tol=None):
+    if tol is not None:
+        strokes = [simplify_points(c, tolerance=tol) for c in contours]
+    else:
+        strokes = [sample_points(c, step=step) for c in contours]
+    return StrokeSet.from_polylines(order_strokes(strokes))
+
+
+def plan(path, W, H, budget_s, blur=3, seg_ms=18, min_area=80, mask=None, contours=None, backend=None, **timing):
+    """
+    หา step / tolerance ที่ได้ภาพใกล้ต้นฉบับที่สุดภายในเวลา budget_s
+    - backend: backend ที่จะใช้วาดจริง (ดู model_backend) ไม่ให้มา = swipe; timing ส่งต่อให้ estimate_duration
+    -> {"best": {...} หรือ None, "candidates": [...]}  แต่ละตัวมี mode, value, commands, seconds, fidelity
+    """
+    backend = backend or SwipeBackend(seg_ms=seg_ms)
+    # sendevent เป็นพิกัดของ touch device วาดกลับไม่ได้ -> จำลองภาพด้วย motionevent (gesture เดียวกัน)
+    raster_backend = MotionEventBackend() if backend.name == "sendevent" else backend
+    if mask is None:
+        mask = preprocess_image(path, W, H, blur=blur)
+    if contours is None:
+        contours = extract_contours(mask, min_area=min_area)
+    candidates = [("step", s) for s in STEPS] + [("simplify", t) for t in TOLERANCES]
+    results = []
+    for mode, value in candidates:
+        strokes = _strokes(contours, step=value) if mode == "step" else _strokes(contours, tol=value)
+        cmds = backend.encode(strokes)
+        secs = estimate_duration(cmds, **timing)
+        r = {"mode": mode, "value": value, "commands": len(cmds), "seconds": round(secs, 1), "fidelity": None}
+        if secs <= budget_s:
+            drawn = cmds if raster_backend is backend else raster_backend.encode(strokes)
+            r["fidelity"] = round(fidelity(rasterize(drawn, W, H), mask), 4)
+        results.append(r)
+    fits = [r for r in results if r["fidelity"] is not None]
+    best = max(fits, key=lambda r: (r["fidelity"], -r["seconds"])) if fits else None
+    return {"best": best, "candidates": results}
+
+
+def format_duration(secs):
+    m, s = divmod(int(round(secs)), 60)
+    return f"{m}m {s:02d}s" if m else f"{s}s"
@@ -0,0 +1,161 @@
+import numpy as np
+
+
+def _digits(vals, width=5):
+    """
+    เลขจำนวนเต็ม (>=0) -> (ascii (n,width), mask) จัดชิดขวา, mask บอกช่องที่เป็นตัวเลขจริง
+    """
+    v = np.asarray(vals, dtype=np.int64).reshape(-1, 1)
+    pow10 = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    chars = (v // pow10 % 10 + 48).astype(np.uint8)
+    ndig = 1 + (v >= pow10[:-1][::-1]).sum(axis=1, keepdims=True)
+    mask = np.arange(width) >= (width - ndig)
+    return chars, mask
+
+
+def _const(text, n):
+    b = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    return np.broadcast_to(b, (n, len(b))), np.ones((n, len(b)), dtype=bool)
+
+
+def _rows(fields, n):
+    """
+    ต่อ field (ข้อความคงที่ / array ตัวเลข) เป็นตาราง ascii (n, W) + mask
+    """
+    blocks = [_const(f, n) if isinstance(f, str) else _digits(f) for f in fields]
+    return np.hstack([b[0] for b in blocks]), np.hstack([b[1] for b in blocks])
+
+
+COORD_MAX = np.iinfo(np.int16).max
+
+
+class StrokeSet:
+    """
+    เก็บทุกเส้นใน buffer เดียว: coords (N,2) int16 + offsets (K+1,) — เส้นที่ i คือ coords[offsets[i]:offsets[i+1]]
+    พิกัดต้องอยู่ใน 0..32767 (พิกัดจอ) ไม่งั้น ValueError — ไม่ปล่อยให้ int16 วนค่าเงียบๆ
+    """
+    __slots__ = ("coords", "offsets")
+
+    def __init__(self, coords, offsets):
+        coords = np.asarray(coords)
+        if coords.size and (coords.min() < 0 or coords.max() > COORD_MAX):
+            raise ValueError(f"stroke coordinates out of range 0..{COORD_MAX}: "
+                             f"min {coords.min()}, max {coords.max()}")
+        self.coords = np.ascontiguousarray(coords, dtype=np.int16).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_polylines(cls, polylines):
+        polylines = [np.asarray(p).reshape(-1, 2) for p in polylines]
+        offsets = np.zeros(len(polylines) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in polylines])
+        coords = np.concatenate(polylines) if polylines else np.zeros((0, 2))
+        return cls(coords, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.coords[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def n_points(self):
+        return len(self.coords)
+
+    def _starts(self):
+        first = np.zeros(len(self.coords), dtype=bool)
+        first[self.offsets[:-1][self.lengths > 0]] = True
+        return first
+
+    def _command_rows(self, tap_thresh2):
+        # หนึ่งคำสั่งต่อหนึ่งจุด: จุดแรก = tap, ที่เหลือ = swipe จากจุดก่อน (สั้นมาก = tap)
+        # ยกเว้นเส้น 2 จุด (เช่น hatch run) = swipe เดียวไม่ต้อง tap นำ, เส้น 1 จุด = tap
+        c = self.coords.astype(np.int32)
+        prev = np.empty_like(c); prev[1:] = c[:-1]; prev[:1] = c[:1]
+        d2 = ((c - prev) ** 2).sum(axis=1)
+        first = self._starts()
+        tap = first | (d2 <= tap_thresh2)
+        keep = ~(first & np.repeat(self.lengths == 2, self.lengths))
+        return c[keep], prev[keep], tap[keep]
+
+    def command_counts(self):
+        """
+        จำนวนคำสั่ง tap/swipe ของแต่ละเส้น
+        """
+        n = self.lengths
+        return np.where(n >= 3, n, np.minimum(n, 1))
+
+    def command_count(self):
+        return int(self.command_counts().sum())
+
+    def command_bytes(self, seg_ms=35, tap_thresh2=4):
+        """
+        สร้างคำสั่ง tap/swipe ทั้งหมดเป็น bytes ก้อนเดียว (คั่นด้วย \\n) แบบ vectorized
+        """
+        cur, prev, tap = self._command_rows(tap_thresh2)
+        n = len(cur)
+        if n == 0:
+            return b""
+        t_chars, t_mask = _rows(["input tap ", cur[tap, 0], " ", cur[tap, 1], "\n"], int(tap.sum()))
+        sw = ~tap
+        s_chars, s_mask = _rows(["input swipe ", prev[sw, 0], " ", prev[sw, 1], " ", cur[sw, 0], " ", cur[sw, 1],
+                                 f" {int(seg_ms)}\n"], int(sw.sum()))
+        width = max(t_chars.shape[1], s_chars.shape[1])
+        chars = np.zeros((n, width), dtype=np.uint8)
+        mask = np.zeros((n, width), dtype=bool)
+        chars[tap, :t_chars.shape[1]] = t_chars; mask[tap, :t_mask.shape[1]] = t_mask
+        chars[sw, :s_chars.shape[1]] = s_chars; mask[sw, :s_mask.shape[1]] = s_mask
+        return chars[mask].tobytes()[:-1]
+
+    def commands(self, seg_ms=35, tap_thresh2=4):
+        blob = self.command_bytes(seg_ms, tap_thresh2)
+        return blob.decode("ascii").split("\n") if blob else []
+
+    def command_blob(self, seg_ms=35, tap_thresh2=4):
+        return CommandBlob(self.command_bytes(seg_ms, tap_thresh2))
+
+
+class CommandBlob:
+    """
+    คำสั่งทั้งหมดเป็น bytes ก้อนเดียว (คั่นด้วย \\n) ใช้ len / iter / slice ได้เหมือน list
+    แต่ไม่สร้าง str ทีละบรรทัดจนกว่าจะส่งจริง
+    """
+    __slots__ = ("blob", "_starts", "_ends")
+
+    def __init__(self, blob):
+        self.blob = bytes(blob)
+        if self.blob:
+            nl = np.flatnonzero(np.frombuffer(self.blob, dtype=np.uint8) == 10)
+            self._starts = np.r_[0, nl + 1]
+            self._ends = np.r_[nl, len(self.blob)]
+        else:
+            self._starts = self._ends = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def from_lines(cls, lines):
+        return cls("\n".join(lines).encode("utf-8"))
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        blob = self.blob
+        for s, e in zip(self._starts.tolist(), self._ends.tolist()):
+            yield blob[s:e].decode("utf-8")
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            idx = range(*i.indices(len(self)))
+            return [self.blob[self._starts[j]:self._ends[j]].decode("utf-8") for j in idx]
+        return self.blob[self._starts[i]:self._ends[i]].decode("utf-8")
+
+    def tobytes(self):
+        return self.blob
@@ -0,0 +1,294 @@
+import os, re, sys, json, stat, time, queue, socket, struct, threading, socketserver
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+import backends
+
+
+FAKE_ADB = """#!{python}
+import sys, json, os
+here = os.path.dirname(os.path.abspath(__file__))
+args = sys.argv[1:]
+serial = None
+if args[:1] == ["-s"]:
+    serial, args = args[1], args[2:]
+with open(os.path.join(here, "responses.json")) as f:
+    responses = json.load(f)
+lines = []
+chatter = responses.get("__stderr_per_cmd", 0)
+if args == ["shell"]:
+    for line in sys.stdin:
+        line = line.rstrip("\\n")
+        if line.startswith("echo "):
+            print(line[5:], flush=True)
+        else:
+            lines.append(line)
+elif args[:1] == ["push"]:
+    os.makedirs(os.path.join(here, "device"), exist_ok=True)
+    with open(args[1], "rb") as src, open(os.path.join(here, "device", os.path.basename(args[2])), "wb") as dst:
+        dst.write(src.read())
+elif args[:1] == ["shell"] and " ".join(args[1:]).startswith("sh /"):
+    # รัน script ที่ push มา: echo -> stdout, คำสั่งอื่นบันทึกไว้ (+ stderr ตามที่ตั้ง)
+    with open(os.path.join(here, "device", os.path.basename(args[-1].split()[-1]))) as f:
+        for line in f.read().splitlines()[1:]:
+            if line.startswith("echo "):
+                print(line[5:].strip('"').replace("$$", "1234"), flush=True)
+            else:
+                lines.append(line)
+                sys.stderr.write("x" * chatter + "\\n")
+with open(os.path.join(here, "calls.jsonl"), "a") as f:
+    f.write(json.dumps({{"serial": serial, "args": args, "stdin": lines}}) + "\\n")
+out, rc = responses.get(" ".join(args), ["", 0])
+sys.stdout.write(out)
+sys.exit(rc)
+"""
+
+
+class FakeAdb:
+    """
+    adb ปลอม (script) ที่บันทึกทุกการเรียก + บรรทัดที่เขียนเข้า stdin ของ shell
+    respond("shell wm size", "Physical size: 1080x2400\\n") กำหนดคำตอบของแต่ละคำสั่ง
+    """
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, "adb")
+        with open(self.path, "w") as f:
+            f.write(FAKE_ADB.format(python=sys.executable))
+        os.chmod(self.path, os.stat(self.path).st_mode | stat.S_IEXEC)
+        self.responses = {}
+        self._save()
+
+    def _save(self):
+        with open(os.path.join(self.root, "responses.json"), "w") as f:
+            json.dump(self.responses, f)
+
+    def respond(self, cmd, out, rc=0):
+        self.responses[cmd] = [out, rc]
+        self._save()
+
+    def chatter(self, n):
+        """
+        script ที่รันจะเขียน stderr n ไบต์ต่อคำสั่ง
+        """
+        self.responses["__stderr_per_cmd"] = n
+        self._save()
+
+    def calls(self):
+        try:
+            with open(os.path.join(self.root, "calls.jsonl")) as f:
+                return [json.loads(line) for line in f]
+        except OSError:
+            return []
+
+    def pushed(self, name):
+        with open(os.path.join(self.root, "device", name)) as f:
+            return f.read()
+
+    def sent(self):
+        """
+        คำสั่งทั้งหมดที่เขียนเข้า interactive shell
+        """
+        return [line for c in self.calls() if c["args"] == ["shell"] for line in c["stdin"]]
+
+
+@pytest.fixture
+def fake_adb(tmp_path, monkeypatch):
+    fake = FakeAdb(str(tmp_path))
+    monkeypatch.setattr(utils, "ADB", fake.path)
+    monkeypatch.setattr(utils, "USE_NATIVE", False)
+    monkeypatch.setattr(backends, "_touch_cache", {})
+    monkeypatch.setattr(backends, "_input_cache", {})
+    utils.forget_device()
+    return fake
+
+
+def _block(data):
+    return b"%04x" % len(data) + data
+
+
+class _AdbHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        srv = self.server.fake
+        sock = self.request
+        f = sock.makefile("rb")
+        srv.conns.append(sock)
+        while True:
+            head = f.read(4)
+            if len(head) < 4:
+                return
+            req = f.read(int(head, 16)).decode("utf-8")
+            srv.requests.append(req)
+            if req == "host:version":
+                sock.sendall(b"OKAY" + _block(b"0029")); return
+            if req == "host:devices":
+                sock.sendall(b"OKAY" + _block(srv.device_list())); return
+            if req == "host:track-devices":
+                sock.sendall(b"OKAY"); return srv.track(sock)
+            if req.startswith("host:transport:"):
+                if req.split(":", 2)[2] in srv.hang_transport:
+                    f.read(); return  # เครื่องค้าง: ไม่ตอบจน client ปิดเอง
+                if srv.devices.get(req.split(":", 2)[2]) != "device":
+                    sock.sendall(b"FAIL" + _block(b"device not found")); return
+                sock.sendall(b"OKAY"); continue
+            if req == "shell:sh":
+                sock.sendall(b"OKAY"); return srv.interactive(sock, f)
+            if req.startswith("shell:"):
+                sock.sendall(b"OKAY"); return srv.oneshot(sock, f, req[6:])
+            if req == "sync:":
+                sock.sendall(b"OKAY"); return srv.sync(sock, f)
+            sock.sendall(b"FAIL" + _block(b"unknown service")); return
+
+
+class FakeAdbServer:
+    """
+    adb server ปลอมระดับ socket (smart-socket protocol): host:version/devices/transport, shell:, sync: (push)
+    - respond(cmd, out, rc): คำตอบของคำสั่ง shell; HANG = รับคำสั่งแล้วเงียบ, DROP = ตัด connection
+    - executed: ทุกคำสั่งที่ "เครื่อง" ได้รันจริง (นับว่ารันซ้ำหรือไม่)
+    - hang_transport: serial ที่ host:transport ค้างไม่ตอบ
+    - ack_gate / ack_delay: กั้น / หน่วง marker "@@A n" ของ interactive shell (จำลองเครื่องที่รันไม่ทัน)
+    """
+    HANG, DROP = "<hang>", "<drop>"
+
+    def __init__(self, devices=("S1",)):
+        self.devices = {s: "device" for s in devices}  # serial -> state
+        self._changed = threading.Condition()
+        self.responses = {}
+        self.requests = []; self.executed = []; self.files = {}
+        self.conns = []
+        self.fail_sync = False
+        self.hang_transport = set()
+        self.ack_gate = threading.Event(); self.ack_gate.set()
+        self.ack_delay = 0.0
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _AdbHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for s in self.conns:
+            try:
+                s.shutdown(socket.SHUT_RDWR)
+                s.close()
+            except OSError:
+                pass
+
+    def respond(self, cmd, out="", rc=0):
+        self.responses[cmd] = (out, rc)
+
+    def set_device(self, serial, state="device"):
+        """
+        เปลี่ยนสถานะเครื่อง (state=None = ถอดออก) แล้วส่ง snapshot ใหม่ให้ทุก track-devices
+        """
+        with self._changed:
+            if state is None:
+                self.devices.pop(serial, None)
+            else:
+                self.devices[serial] = state
+            self._changed.notify_all()
+
+    def device_list(self):
+        return "".join(f"{s}\t{st}\n" for s, st in self.devices.items()).encode()
+
+    def track(self, sock):
+        while True:
+            with self._changed:
+                snap = self.device_list()
+                try:
+                    sock.sendall(_block(snap))
+                except OSError:
+                    return
+                self._changed.wait_for(lambda: self.device_list() != snap)
+
+    def _run(self, cmd):
+        self.executed.append(cmd)
+        return self.responses.get(cmd, ("", 0))
+
+    def interactive(self, sock, f):
+        # marker "@@A n" ตอบผ่าน thread แยก: หน่วงได้ (ack_delay) หรือกั้นไว้ (ack_gate.clear())
+        # shell ปิดแล้ว: marker ที่ยังกั้นไว้ทิ้งได้ ที่ไม่ได้กั้นต้องส่งให้ครบก่อนปิด socket
+        acks, done = queue.Queue(), threading.Event()
+        def send_acks():
+            for line in iter(acks.get, None):
+                while not self.ack_gate.wait(0.05):
+                    if done.is_set():
+                        return
+                time.sleep(self.ack_delay)
+                try:
+                    sock.sendall(line)
+                except OSError:
+                    return
+        sender = threading.Thread(target=send_acks, daemon=True)
+        sender.start()
+        try:
+            self._interactive(sock, f, acks)
+        finally:
+            done.set()
+            acks.put(None)
+            sender.join(5)
+
+    def _interactive(self, sock, f, acks):
+        for raw in f:
+            line = raw.decode("utf-8").rstrip("\n")
+            m = re.match(r'(.*) 2>&1; echo "(@@END\d+:)\$\?"$', line)
+            if m:
+                out, rc = self._run(m.group(1))
+                if out == self.HANG:
+                    f.read(); return  # รอจน client ปิดเอง
+                if out == self.DROP:
+                    return
+                sock.sendall(f"{out}{m.group(2)}{rc}\n".encode())
+            elif line.startswith("echo @@A "):
+                acks.put((line[5:] + "\n").encode())
+            elif line.startswith("echo "):
+                sock.sendall((line[5:].strip('"').replace("$?", "0") + "\n").encode())
+            elif line == "exit":
+                return
+            elif self._run(line)[0] == self.DROP:
+                return
+
+    def oneshot(self, sock, f, cmd):
+        m = re.match(r'(.*); echo "@@EXIT \$\?"$', cmd)
+        out, rc = self._run(m.group(1) if m else cmd)
+        if out in (self.HANG, self.DROP):
+            return
+        sock.sendall(out.encode() + (f"@@EXIT {rc}\n".encode() if m else b""))
+
+    def sync(self, sock, f):
+        def frame():
+            rid = f.read(4)
+            return rid, f.read(struct.unpack("<I", f.read(4))[0]) if rid in (b"SEND", b"DATA") else \
+                struct.unpack("<I", f.read(4))[0]
+        rid, spec = frame()
+        path, data = spec.decode().split(",")[0], b""
+        while True:
+            rid, payload = frame()
+            if rid == b"DATA":
+                data += payload
+            elif rid == b"DONE":
+                break
+        if self.fail_sync:
+            sock.sendall(b"FAIL" + struct.pack("<I", 17) + b"permission denied"); return
+        self.files[path] = data
+        sock.sendall(b"OKAY" + struct.pack("<I", 0))
+        frame()  # QUIT
+
+
+@pytest.fixture
+def adb_server(fake_adb, monkeypatch):
+    """
+    เปิด native path ของ utils ไปที่ FakeAdbServer (adb binary ยังเป็น fake_adb ไว้ดูว่ามี fallback ไหม)
+    """
+    srv = FakeAdbServer()
+    monkeypatch.setenv("ANDROID_ADB_SERVER_PORT", str(srv.port))
+    monkeypatch.setattr(utils, "USE_NATIVE", True)
+    monkeypatch.setattr(utils, "_native_client", None)
+    monkeypatch.setattr(utils, "_native_checked", 0.0)
+    yield srv
+    utils.reset_adb_state()
+    srv.close()
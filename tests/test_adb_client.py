@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+import utils
+from adb_client import AdbClient, AdbError, AdbSentError
+
+
+def client(srv, **kw):
+    return AdbClient(port=srv.port, **kw)
+
+
+def test_host_services(adb_server):
+    c = client(adb_server)
+    assert c.available() and c.version() == 0x29
+    assert c.devices() == {"S1": "device"}
+    assert utils.adb_devices() == ["S1"]
+
+
+def test_transport_to_unknown_device_fails(adb_server):
+    with pytest.raises(AdbError, match="device not found"):
+        client(adb_server).shell("NOPE", "true")
+
+
+def test_shell_session_output_and_exit_code(adb_server, fake_adb):
+    adb_server.respond("wm size", "Physical size: 1080x2400\n")
+    adb_server.respond("false", "", 1)
+    assert utils._shell("S1", "wm size") == ("Physical size: 1080x2400\n", 0)
+    assert utils._shell("S1", "false") == ("", 1)
+    # สองคำสั่งใช้ session เดียวกัน และไม่ได้ spawn adb binary
+    assert adb_server.requests.count("shell:sh") == 1
+    assert not fake_adb.calls()
+
+
+def test_missing_device_keeps_native_for_others(adb_server, fake_adb):
+    assert utils._shell("S1", "true") == ("", 0)
+    sess = utils._native_client._sessions["S1"]
+    utils._shell("GONE", "true")
+    assert utils._native_client is not None and utils._native_client._sessions.get("S1") is sess
+    assert utils._shell("S1", "echo again") == ("", 0)
+    assert adb_server.executed == ["true", "echo again"]
+    assert [(c["serial"], c["args"]) for c in fake_adb.calls()] == [("GONE", ["shell", "true"])]
+
+
+def test_server_down_disables_native(adb_server, fake_adb):
+    assert utils._shell("S1", "true") == ("", 0)
+    adb_server.close()
+    utils._shell("S1", "true")
+    assert utils._native_client is None
+    assert [(c["serial"], c["args"]) for c in fake_adb.calls()] == [("S1", ["shell", "true"])]
+
+
+def test_hung_device_does_not_block_other_serials(adb_server):
+    adb_server.hang_transport.add("SLOW")
+    c = client(adb_server, timeout=1.5)
+    t = threading.Thread(target=lambda: pytest.raises(OSError, c.shell, "SLOW", "true"), daemon=True)
+    t.start()
+    time.sleep(0.1)
+    t0 = time.perf_counter()
+    assert c.shell("S1", "true") == ("", 0)
+    assert time.perf_counter() - t0 < 0.5
+    t.join(3)
+
+
+def test_timeout_after_write_is_not_resent(adb_server, fake_adb):
+    adb_server.respond("input tap 1 1", adb_server.HANG)
+    out, rc = utils._shell("S1", "input tap 1 1", timeout=0.3)
+    assert rc != 0
+    assert adb_server.executed.count("input tap 1 1") == 1
+    assert not fake_adb.calls()  # ไม่ fallback ไปรันซ้ำผ่าน adb binary
+
+
+def test_drop_after_write_raises_sent_error(adb_server):
+    adb_server.respond("input tap 2 2", adb_server.DROP)
+    with pytest.raises(AdbSentError):
+        client(adb_server).shell("S1", "input tap 2 2")
+    assert adb_server.executed.count("input tap 2 2") == 1
+
+
+def test_stale_session_is_reopened_before_writing(adb_server):
+    c = client(adb_server)
+    assert c.shell("S1", "echo hi")[1] == 0
+    for s in adb_server.conns:
+        s.close()  # server ปิด session ที่ค้างไว้
+    assert c.shell("S1", "true") == ("", 0)
+    assert adb_server.executed == ["echo hi", "true"]
+
+
+def test_stream_shell_exit_status(adb_server):
+    c = client(adb_server)
+    p = c.open_shell("S1")
+    p.stdin.write("input tap 1 1\necho @@A 1\n"); p.stdin.flush()
+    p.stdin.close()
+    assert p.wait(5) == 0
+    assert [l.strip() for l in p.stdout] == ["@@A 1"]
+
+    adb_server.respond("sh /data/local/tmp/x.sh", "", 3)
+    assert c.open_shell("S1", "sh /data/local/tmp/x.sh").wait(5) == 3
+
+
+def test_stream_shell_dropped_is_a_failure(adb_server):
+    adb_server.respond("input tap 9 9", adb_server.DROP)
+    p = client(adb_server).open_shell("S1")
+    p.stdin.write("input tap 9 9\n"); p.stdin.flush()
+    assert p.wait(5) == 1
+
+
+def test_sync_push(adb_server, tmp_path, fake_adb):
+    local = tmp_path / "job.sh"
+    local.write_bytes(b"echo hi\n" * 20000)  # หลาย DATA chunk
+    assert utils._push("S1", str(local), "/data/local/tmp/job.sh") == (0, "")
+    assert adb_server.files["/data/local/tmp/job.sh"] == local.read_bytes()
+    assert not fake_adb.calls()
+
+
+def test_push_falls_back_to_adb_binary(adb_server, tmp_path, fake_adb):
+    adb_server.fail_sync = True
+    local = tmp_path / "job.sh"
+    local.write_bytes(b"echo hi\n")
+    assert utils._push("S1", str(local), "/data/local/tmp/job.sh") == (0, "")
+    assert [c["args"][0] for c in fake_adb.calls()] == ["push"]
+    assert fake_adb.pushed("job.sh") == "echo hi\n"
@@ -0,0 +1,88 @@
+import numpy as np
+
+from backends import (pick_backend, parse_getevent, SwipeBackend, MotionEventBackend, SendeventBackend,
+                      EV_ABS, ABS_MT_POSITION_X)
+from strokes import StrokeSet
+from utils import run_adb_batch
+
+
+GETEVENT = """add device 1: /dev/input/event4
+  name:     "gpio-keys"
+  events:
+    KEY (0001): 0072  0073  0074
+add device 2: /dev/input/event2
+  name:     "fts_ts touchscreen"
+  events:
+    ABS (0003): 002f  : value 0, min 0, max 9, fuzz 0, flat 0, resolution 0
+                0035  : value 0, min 0, max 4319, fuzz 0, flat 0, resolution 0
+                0036  : value 0, min 0, max 9599, fuzz 0, flat 0, resolution 0
+                0039  : value 0, min 0, max 65535, fuzz 0, flat 0, resolution 0
+"""
+
+INPUT_USAGE = "Usage: input [<source>] <command> [<arg>...]\n      motionevent <DOWN|UP|MOVE|CANCEL> <x> <y>\n"
+
+STROKES = StrokeSet.from_polylines([np.array([[10, 20], [30, 40], [50, 40]]), np.array([[5, 5]])])
+
+
+def test_parse_getevent_keeps_multitouch_devices_only():
+    devs = parse_getevent(GETEVENT)
+    assert devs == [{"node": "/dev/input/event2", "name": "fts_ts touchscreen",
+                     "x": (0, 4319), "y": (0, 9599)}]
+
+
+def test_parse_getevent_empty():
+    assert parse_getevent("") == []
+    assert parse_getevent("add device 1: /dev/input/event0\n  name: \"keys\"\n") == []
+
+
+def test_auto_stays_on_swipe_even_with_motionevent_support(fake_adb):
+    fake_adb.respond("shell input", INPUT_USAGE)
+    backend = pick_backend("S1", "auto", seg_ms=18)
+    assert isinstance(backend, SwipeBackend)
+    assert not fake_adb.calls()  # auto ไม่ต้อง probe เครื่อง
+
+
+def test_swipe_backend_sends_tap_and_swipes(fake_adb):
+    cmds = pick_backend("S1", "swipe", seg_ms=18).encode(STROKES)
+    assert run_adb_batch("S1", cmds, sleep_ms=0) == (0, "")
+    # เส้นจุดเดียว = tap
+    assert fake_adb.sent() == ["input tap 10 20", "input swipe 10 20 30 40 18", "input swipe 30 40 50 40 18",
+                               "input tap 5 5"]
+
+
+def test_motionevent_backend_sends_one_gesture_per_stroke(fake_adb):
+    fake_adb.respond("shell input", INPUT_USAGE)
+    backend = pick_backend("S1", "motionevent")
+    assert isinstance(backend, MotionEventBackend)
+    assert run_adb_batch("S1", backend.encode(STROKES), sleep_ms=0) == (0, "")
+    assert fake_adb.sent() == [
+        "input motionevent DOWN 10 20", "input motionevent MOVE 30 40", "input motionevent MOVE 50 40",
+        "input motionevent UP 50 40",
+        "input motionevent DOWN 5 5", "input motionevent UP 5 5",
+    ]
+
+
+def test_motionevent_unsupported_falls_back_to_swipe(fake_adb):
+    fake_adb.respond("shell input", "Usage: input text <string>\n")
+    assert isinstance(pick_backend("S1", "motionevent"), SwipeBackend)
+
+
+def test_sendevent_backend_scales_to_touch_range(fake_adb):
+    fake_adb.respond("shell getevent -p", GETEVENT)
+    backend = pick_backend("S1", "sendevent", screen_size=(1080, 2400))
+    assert isinstance(backend, SendeventBackend)
+    assert backend.node == "/dev/input/event2"
+    assert run_adb_batch("S1", backend.encode(STROKES), sleep_ms=0) == (0, "")
+    sent = fake_adb.sent()
+    assert len(sent) == 4 + 2  # DOWN, MOVE x2, UP + DOWN, UP
+    assert sent[0].startswith("sendevent /dev/input/event2 3 47 0 ; sendevent /dev/input/event2 3 57 0")
+    # x = 1079 -> 4319 (ขอบขวาของจอ = ขอบขวาของ touch)
+    assert backend._abs(1079, 2399) == (4319, 9599)
+    assert f"sendevent /dev/input/event2 {EV_ABS} {ABS_MT_POSITION_X} {round(30 * 4319 / 1079)}" in sent[1]
+    assert sent[3].endswith("sendevent /dev/input/event2 1 330 0 ; sendevent /dev/input/event2 0 0 0")
+    assert list(backend.stroke_ends(STROKES)) == [4, 6]
+
+
+def test_sendevent_without_touch_node_falls_back_to_swipe(fake_adb):
+    fake_adb.respond("shell getevent -p", "", rc=1)
+    assert isinstance(pick_backend("S1", "sendevent", screen_size=(1080, 2400)), SwipeBackend)
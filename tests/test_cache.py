@@ -0,0 +1,55 @@
+import os
+
+import cv2
+import numpy as np
+
+from cache import JobCache
+
+
+def test_disk_roundtrip(tmp_path):
+    c = JobCache(cache_dir=str(tmp_path))
+    c.put("k1", a=np.arange(5))
+    assert sorted(os.listdir(tmp_path)) == ["k1.npz"]
+    fresh = JobCache(cache_dir=str(tmp_path))
+    assert fresh.get("k1")["a"].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_truncated_entry_is_a_miss_and_removed(tmp_path):
+    JobCache(cache_dir=str(tmp_path)).put("k1", a=np.arange(10000))
+    p = tmp_path / "k1.npz"
+    p.write_bytes(p.read_bytes()[:100])
+    c = JobCache(cache_dir=str(tmp_path))
+    assert c.get("k1") is None
+    assert not p.exists()
+
+
+def test_garbage_entry_is_a_miss(tmp_path):
+    (tmp_path / "k2.npz").write_bytes(b"")
+    assert JobCache(cache_dir=str(tmp_path)).get("k2") is None
+    assert not (tmp_path / "k2.npz").exists()
+
+
+def test_evict_and_clear_leave_in_flight_temp_files(tmp_path):
+    tmp = tmp_path / "k3.abc.npz.tmp"  # writer อื่นกำลังเขียนอยู่
+    tmp.write_bytes(b"x" * 4096)
+    c = JobCache(cache_dir=str(tmp_path), max_bytes=1)
+    c.put("k4", a=np.arange(1000))
+    c.clear()
+    assert tmp.exists()
+
+
+def test_pipeline_keys_change_with_mask_version(tmp_path, monkeypatch):
+    import cache
+    img = np.zeros((60, 60, 3), np.uint8)
+    img[20:40, 20:40] = 255
+    path = str(tmp_path / "sq.png")
+    cv2.imwrite(path, img)
+    c = JobCache(cache_dir=None)
+    c.contours(path, 60, 60, min_area=1)
+    keys = set(c._mem)
+    monkeypatch.setattr(cache, "MASK_VERSION", -1)
+    c.contours(path, 60, 60, min_area=1)
+    assert len(c._mem) == 2 * len(keys)  # mask + contours ใหม่ทั้งคู่
+    monkeypatch.setattr(cache, "THINNING", "other")
+    c.contours(path, 60, 60, min_area=1)
+    assert len(c._mem) == 3 * len(keys)
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from cli import expand_inputs, output_paths, parse_size
+
+
+def touch(p):
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    open(p, "wb").close()
+    return p
+
+
+def test_parse_size():
+    assert parse_size("1080x2400") == (1080, 2400)
+    assert parse_size("720X1612") == (720, 1612)
+
+
+def test_expand_inputs_filters_extensions(tmp_path):
+    d = str(tmp_path)
+    for name in ("a.png", "b.JPG", "notes.txt", "c.jpeg", "thumbs.db"):
+        touch(os.path.join(d, name))
+    assert [os.path.basename(p) for p in expand_inputs([d])] == ["a.png", "b.JPG", "c.jpeg"]
+    assert [os.path.basename(p) for p in expand_inputs([os.path.join(d, "*")])] == ["a.png", "b.JPG", "c.jpeg"]
+    # ไฟล์ซ้ำจากหลาย input นับครั้งเดียว
+    assert len(expand_inputs([d, os.path.join(d, "a.png")])) == 3
+
+
+def test_same_name_in_different_folders_does_not_collide(tmp_path):
+    a = touch(str(tmp_path / "in" / "a" / "cat.png"))
+    b = touch(str(tmp_path / "in" / "b" / "cat.png"))
+    out = output_paths([a, b], "compiled")
+    assert out == {a: os.path.join("compiled", "a", "cat.npz"), b: os.path.join("compiled", "b", "cat.npz")}
+
+
+def test_single_folder_stays_flat(tmp_path):
+    files = [touch(str(tmp_path / n)) for n in ("x.png", "y.jpg")]
+    assert sorted(output_paths(files, "o").values()) == [os.path.join("o", "x.npz"), os.path.join("o", "y.npz")]
+
+
+def test_clash_is_reported(tmp_path):
+    files = [touch(str(tmp_path / n)) for n in ("cat.png", "cat.jpg")]
+    with pytest.raises(ValueError, match="cat.npz"):
+        output_paths(files, "o")
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+from adb_client import split_exit
+from device_service import DeviceService
+
+
+@pytest.fixture
+def svc(adb_server):
+    s = DeviceService(timeout=2.0, port=adb_server.port)
+    s.start()
+    yield s
+    s.stop()
+
+
+def test_split_exit():
+    assert split_exit("a\nb\n@@EXIT 3\n") == ("a\nb\n", 3)
+    assert split_exit("@@EXIT 0\r\n") == ("", 0)
+    assert split_exit("partial out") == ("partial out", 1)
+    assert split_exit("x @@EXIT 0\n") == ("x @@EXIT 0\n", 1)
+
+
+def test_native_shell_reports_exit_code(svc, adb_server):
+    adb_server.respond("getprop ro.product.model", "Pixel\n", 0)
+    adb_server.respond("wm size", "no window manager\n", 5)
+    assert svc.submit(svc._shell("S1", "getprop ro.product.model")).result(5) == ("Pixel\n", 0)
+    assert svc.submit(svc._shell("S1", "wm size")).result(5) == ("no window manager\n", 5)
+    info = svc.submit(svc.device_info("S1")).result(5)
+    assert info == {"serial": "S1", "model": "Pixel", "size": None}
+
+
+def test_native_shell_dropped_is_a_failure(svc, adb_server):
+    adb_server.respond("wm size", adb_server.DROP)
+    assert svc.submit(svc._shell("S1", "wm size")).result(5)[1] != 0
+
+
+def test_submit_routes_exceptions_to_on_error(svc):
+    async def boom():
+        raise RuntimeError("boom")
+    got, ok = [], threading.Event()
+    svc.submit(boom(), lambda r: got.append(("ok", r)), on_error=lambda e: (got.append(str(e)), ok.set()))
+    assert ok.wait(5) and got == ["boom"]
+
+
+def test_submit_uses_default_on_error():
+    got, ok = [], threading.Event()
+    s = DeviceService(on_error=lambda e: (got.append(type(e)), ok.set()))
+    s.start()
+    try:
+        async def boom():
+            raise ValueError
+        s.submit(boom(), got.append)
+        assert ok.wait(5) and got == [ValueError]
+    finally:
+        s.stop()
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+
+from backends import SwipeBackend
+from jobs import DrawJob
+from strokes import StrokeSet
+
+STROKES = StrokeSet.from_polylines([np.array([[0, 0], [10, 0], [10, 10]]), np.array([[5, 5], [50, 5]]),
+                                    np.array([[7, 7]])])
+
+
+def make_job(tmp_path, serial="S1:5555"):
+    backend = SwipeBackend(seg_ms=20)
+    return DrawJob(serial, 100, 200, STROKES, backend.encode(STROKES), backend.stroke_ends(STROKES),
+                   source="cat.png", backend="swipe", jobs_dir=str(tmp_path))
+
+
+def test_save_confirm_load_roundtrip(tmp_path):
+    job = make_job(tmp_path)
+    job.save()
+    job.confirm(4, min_interval=0)  # เส้นแรก (3 คำสั่ง) + เส้นที่สอง (1 คำสั่ง) ครบ
+    assert job.done_strokes == 2
+    assert DrawJob.pending("S1:5555", jobs_dir=str(tmp_path))["done_strokes"] == 2
+
+    back = DrawJob.load("S1:5555", jobs_dir=str(tmp_path))
+    assert (back.W, back.H, back.source, back.backend) == (100, 200, "cat.png", "swipe")
+    assert list(back.cmds) == list(job.cmds) and back.stroke_ends.tolist() == [3, 4, 5]
+    assert back.strokes.coords.tolist() == STROKES.coords.tolist()
+    assert back.done_strokes == 2 and not back.finished
+
+
+def test_resume_starts_at_first_unfinished_stroke(tmp_path):
+    job = make_job(tmp_path)
+    job.confirm(2, min_interval=0)  # กลางเส้นแรก -> ยังไม่นับ
+    assert job.done_strokes == 0 and job.next_command == 0
+    job.confirm(4, min_interval=0)
+    assert job.next_command == 4 and job.remaining() == ["input tap 7 7"]
+    job.confirm(5, min_interval=0)
+    assert job.finished
+
+
+def test_missing_job_is_none(tmp_path):
+    assert DrawJob.load("S1", jobs_dir=str(tmp_path)) is None
+
+
+def test_corrupt_checkpoint_is_discarded(tmp_path):
+    job = make_job(tmp_path, serial="S1")
+    job.save()
+    npz = tmp_path / "S1.npz"
+    npz.write_bytes(npz.read_bytes()[:60])
+    assert DrawJob.load("S1", jobs_dir=str(tmp_path)) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_checkpoint_without_commands_is_discarded(tmp_path):
+    make_job(tmp_path, serial="S1").save()
+    os.remove(tmp_path / "S1.npz")
+    assert DrawJob.load("S1", jobs_dir=str(tmp_path)) is None
+    assert DrawJob.pending("S1", jobs_dir=str(tmp_path)) is None
@@ -0,0 +1,41 @@
+import os
+
+import metrics
+from metrics import Metrics, prune_metrics
+from utils import run_adb_batch
+
+
+def test_prune_metrics_keeps_newest(tmp_path):
+    for i in range(6):
+        p = tmp_path / f"{i}.jsonl"
+        p.write_text("{}\n")
+        os.utime(p, (1000 + i, 1000 + i))
+    (tmp_path / "other.txt").write_text("x")
+    prune_metrics(str(tmp_path), keep=2)
+    assert sorted(os.listdir(tmp_path)) == ["4.jsonl", "5.jsonl", "other.txt"]
+
+
+def test_for_job_caps_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "METRICS_KEEP", 3)
+    for i in range(5):
+        (tmp_path / f"old{i}.jsonl").write_text("{}\n")
+    rec = Metrics.for_job("S1")
+    rec.finish()
+    assert len(os.listdir(tmp_path)) == 3 and os.path.exists(rec.path)
+
+
+def test_in_memory_metrics_write_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    rec = Metrics(job="x")
+    rec.add_stage("encode", 0.1)
+    assert rec.finish()["stages"] == {"encode": 0.1} and os.listdir(tmp_path) == []
+
+
+def test_active_recorder_does_not_change_what_is_sent(fake_adb):
+    cmds = [f"input tap {i} {i}" for i in range(30)]
+    rec = Metrics(job="x")
+    with rec.activate():
+        assert run_adb_batch("S1", cmds, sleep_ms=0) == (0, "")
+    assert fake_adb.sent() == cmds
+    assert rec.sent == 30
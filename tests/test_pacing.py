@@ -0,0 +1,63 @@
+import threading
+import time
+
+from utils import run_adb_batch, calibrate_latency, auto_pacing
+
+CMDS = [f"input tap {i} {i}" for i in range(50)]
+
+
+def _wait_until(cond, timeout=3.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.02)
+    return cond()
+
+
+def _send(result, **kw):
+    t = threading.Thread(target=lambda: result.append(run_adb_batch("S1", CMDS, sleep_ms=0, **kw)), daemon=True)
+    t.start()
+    return t
+
+
+def test_window_limits_commands_in_flight(adb_server):
+    adb_server.ack_gate.clear()  # เครื่องยังไม่ยืนยันอะไรเลย
+    result = []
+    t = _send(result, window=8, ack_every=4)
+    assert _wait_until(lambda: len(adb_server.executed) >= 8)
+    time.sleep(0.3)
+    assert len(adb_server.executed) == 8  # ไม่เกิน window จนกว่าจะได้ ack
+    adb_server.ack_gate.set()
+    t.join(5)
+    assert result == [(0, "")] and adb_server.executed == CMDS
+
+
+def test_cancel_inside_a_full_window(adb_server):
+    adb_server.ack_gate.clear()
+    cancel = threading.Event()
+    result = []
+    t = _send(result, window=8, ack_every=4, cancel_check=cancel.is_set)
+    assert _wait_until(lambda: len(adb_server.executed) >= 8)
+    t0 = time.monotonic()
+    cancel.set()
+    t.join(3)
+    assert not t.is_alive() and time.monotonic() - t0 < 1.0
+    assert len(adb_server.executed) == 8
+    adb_server.ack_gate.set()
+
+
+def test_calibrated_latency_drives_pacing(adb_server):
+    adb_server.ack_delay = 0.05
+    slow = calibrate_latency("S1", probes=4)
+    adb_server.ack_delay = 0.0
+    fast = calibrate_latency("S1", probes=4)
+    assert slow >= 45 and fast < slow
+    p_slow, p_fast = auto_pacing(slow, seg_ms=18), auto_pacing(fast, seg_ms=18)
+    assert p_slow["window"] < p_fast["window"] and p_slow["window"] <= 400 / 45 + 1
+    assert p_slow["ack_every"] == p_slow["window"] // 2 and p_slow["sleep_ms"] == 0
+
+
+def test_auto_pacing_limits():
+    assert auto_pacing(None, seg_ms=20) == {"window": 0, "ack_every": 20, "seg_ms": 20, "sleep_ms": 8}
+    assert auto_pacing(0.1)["window"] == 256
+    assert auto_pacing(1000)["window"] == 4
+    assert auto_pacing(200, seg_ms=18)["seg_ms"] == 50  # เครื่องช้า -> swipe นานขึ้น
@@ -0,0 +1,93 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import draw_core
+from cache import JobCache
+from draw_core import build_strokes
+from metrics import Metrics
+from orchestrator import compile_strokes
+from strokes import StrokeSet
+
+
+@pytest.fixture
+def image(tmp_path):
+    img = np.full((200, 200, 3), 255, np.uint8)
+    cv2.circle(img, (60, 60), 35, (0, 0, 0), -1)
+    cv2.rectangle(img, (110, 110), (180, 170), (0, 0, 0), -1)
+    path = str(tmp_path / "shapes.png")
+    cv2.imwrite(path, img)
+    return path
+
+
+def test_same_result_with_and_without_cache(image, tmp_path):
+    plain = build_strokes(image, 400, 400, two_opt=True)
+    cached = build_strokes(image, 400, 400, two_opt=True, cache=JobCache(cache_dir=str(tmp_path / "c")))
+    assert len(plain) and [s.tolist() for s in plain] == [s.tolist() for s in cached]
+
+
+def test_second_build_reuses_cached_contours(image, monkeypatch):
+    cache = JobCache(cache_dir=None)
+    first = build_strokes(image, 400, 400, prune=True, cache=cache)
+    monkeypatch.setattr(draw_core, "preprocess_image", lambda *a, **k: pytest.fail("recomputed mask"))
+    monkeypatch.setattr("cache.preprocess_image", lambda *a, **k: pytest.fail("recomputed mask"))
+    again = build_strokes(image, 400, 400, prune=True, cache=cache)
+    assert [s.tolist() for s in first] == [s.tolist() for s in again]
+
+
+def test_stats(image):
+    stats = {}
+    build_strokes(image, 400, 400, simplify_tol=1.5, prune=True, stats=stats)
+    assert {"commands_before", "commands_after", "pruned_pct", "travel_before", "travel_after",
+            "step_commands"} <= set(stats)
+    assert stats["travel_after"] <= stats["travel_before"]
+
+
+def test_orchestrator_compiles_through_build_strokes(image):
+    cache = JobCache(cache_dir=None)
+    strokes = compile_strokes(cache, image, 400, 400, step=4)
+    assert strokes[0].tolist() == build_strokes(image, 400, 400, step=4, cache=cache)[0].tolist()
+    fill = compile_strokes(cache, image, 400, 400, fill=True, hatch_spacing=8)
+    assert len(fill) == len(build_strokes(image, 400, 400, fill=True, hatch_spacing=8))
+
+
+def test_fill_skips_letterbox_bars(tmp_path):
+    img = np.full((500, 500, 3), 255, np.uint8)
+    cv2.circle(img, (250, 250), 150, (0, 0, 0), -1)
+    path = str(tmp_path / "circle.png")
+    cv2.imwrite(path, img)
+    oy, nh = (2400 - 1080) // 2, 1080  # ภาพ 1080x1080 กลางจอ แถบบน/ล่าง 660px
+
+    mask = draw_core.preprocess_image(path, 1080, 2400, use_canny=False, try_skeleton=False)
+    assert not mask[:oy].any() and not mask[oy + nh:].any() and mask[oy:oy + nh].any()
+    for runs in (build_strokes(path, 1080, 2400, fill=True),
+                 JobCache(cache_dir=None).hatch(path, 1080, 2400, blur=3)):
+        ys = np.concatenate(runs)[:, 1]
+        assert len(runs) and ys.min() >= oy and ys.max() < oy + nh
+
+
+def test_hatch_runs_encode_to_one_command_each():
+    mask = np.zeros((100, 100), np.uint8)
+    mask[10:40, 10:60] = 255   # แถว hatch y = 15, 21, 27, 33, 39 -> swipe ละเส้น
+    mask[:, 80] = 255          # เส้นกว้าง 1px -> ทุกแถวเป็นจุดเดียว = tap
+    runs = draw_core.hatch_fill(mask, spacing=6, angle=0)
+    cmds = StrokeSet.from_polylines(runs).commands(seg_ms=20)
+    swipes = [c for c in cmds if c.startswith("input swipe")]
+    taps = [c for c in cmds if c.startswith("input tap")]
+    assert len(runs) == len(cmds) == 5 + 17
+    spans = sorted((int(y0), min(int(x0), int(x1)), max(int(x0), int(x1)))
+                   for _, _, x0, y0, x1, y1, _ in (c.split() for c in swipes))
+    assert spans == [(y, 10, 59) for y in (15, 21, 27, 33, 39)]
+    assert sorted(taps) == sorted(f"input tap 80 {y}" for y in range(3, 100, 6))
+
+
+@pytest.mark.parametrize("params", [dict(prune=True, two_opt=True), dict(fill=True)])
+def test_stage_times_are_not_double_counted(image, params):
+    rec = Metrics()
+    t0 = time.perf_counter()
+    with rec.activate():
+        build_strokes(image, 800, 800, cache=JobCache(cache_dir=None), **params)
+    wall = time.perf_counter() - t0
+    assert "decode" in rec.stages and sum(rec.stages.values()) <= wall
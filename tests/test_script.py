@@ -0,0 +1,45 @@
+import threading
+
+import utils
+from utils import run_adb_script, compile_script
+
+
+def test_compile_script_markers():
+    script = compile_script([f"input tap {i} {i}" for i in range(5)], marker_every=2)
+    lines = script.splitlines()
+    assert lines[:2] == ["#!/system/bin/sh", 'echo "@@PID $$"']
+    assert [l for l in lines if l.startswith("echo @@")] == ["echo @@P 2", "echo @@P 4", "echo @@P 5", "echo @@END"]
+
+
+def _script_calls(fake):
+    return [c for c in fake.calls() if c["args"][:1] == ["shell"] and " ".join(c["args"][1:]).startswith("sh /")]
+
+
+def test_script_runs_every_command_and_reports_progress(fake_adb):
+    cmds = [f"input tap {i} {i}" for i in range(120)]
+    progress, confirmed = [], []
+    rc, err = run_adb_script("S1", cmds, progress_cb=progress.append, confirm_cb=confirmed.append)
+    assert (rc, err) == (0, "")
+    run, = _script_calls(fake_adb)
+    assert run["stdin"] == cmds
+    assert confirmed == [50, 100, 120] and progress[-1] == 100
+
+
+def test_chatty_stderr_does_not_block_script(fake_adb):
+    # stderr รวมมากกว่าขนาด pipe (64KB) หลายเท่า: ถ้าไม่มีใครอ่าน stderr script จะค้าง
+    fake_adb.chatter(4096)
+    cmds = [f"input tap {i} {i}" for i in range(200)]
+    res = []
+    t = threading.Thread(target=lambda: res.append(run_adb_script("S1", cmds)), daemon=True)
+    t.start(); t.join(30)
+    assert res, "run_adb_script hung on a full stderr pipe"
+    rc, err = res[0]
+    assert rc == 0 and err.startswith("x")
+    assert len(_script_calls(fake_adb)[0]["stdin"]) == 200
+
+
+def test_script_without_end_marker_is_an_error(fake_adb, monkeypatch):
+    # เหมือนเครื่องหลุดกลางทาง: stream จบก่อน @@END
+    monkeypatch.setattr(utils, "compile_script", lambda c, m=50: compile_script(c, m).replace("echo @@END\n", ""))
+    rc, err = run_adb_script("S1", [f"input tap {i} {i}" for i in range(10)])
+    assert rc == 1 and "ended early" in err
@@ -0,0 +1,45 @@
+import numpy as np
+
+from simulate import estimate_duration, model_backend, send_sleep_ms, plan
+from backends import SwipeBackend, MotionEventBackend, SendeventBackend
+from strokes import StrokeSet
+
+STROKES = StrokeSet.from_polylines([np.array([[0, 0], [10, 0], [10, 10]])])
+
+
+def test_estimate_depends_on_backend():
+    swipe = SwipeBackend(seg_ms=50).encode(STROKES)      # tap + 2 swipe
+    motion = MotionEventBackend().encode(STROKES)        # DOWN, MOVE, MOVE, UP
+    send = model_backend("sendevent", screen_size=(100, 100)).encode(STROKES)
+    assert estimate_duration(swipe, sleep_ms=0) == (3 * 120 + 60 + 2 * 50) / 1000
+    assert estimate_duration(motion, sleep_ms=0) == 4 * 120 / 1000
+    # 6 + 3 + 3 + 3 events ละ 12ms
+    assert estimate_duration(send, sleep_ms=0) == 15 * 12 / 1000
+
+
+def test_host_sleep_only_in_stream_mode():
+    assert send_sleep_ms("stream") == 8
+    assert send_sleep_ms("script") == 0
+    assert send_sleep_ms("stream", auto_pace=True) == 0
+    cmds = ["input motionevent MOVE 1 1"] * 10
+    assert estimate_duration(cmds, cmd_latency_ms=1, sleep_ms=8) == 0.08
+
+
+def test_model_backend_does_not_probe():
+    assert isinstance(model_backend("auto"), SwipeBackend)
+    assert isinstance(model_backend("motionevent"), MotionEventBackend)
+    assert isinstance(model_backend("sendevent"), SendeventBackend)
+
+
+def test_plan_uses_given_backend():
+    mask = np.zeros((200, 200), np.uint8)
+    mask[50, 20:180] = 255
+    contours = [np.array([[x, 50] for x in range(20, 180)])]
+    swipe = plan(None, 200, 200, 1000, mask=mask, contours=contours)
+    motion = plan(None, 200, 200, 1000, mask=mask, contours=contours, backend=MotionEventBackend())
+    send = plan(None, 200, 200, 1000, mask=mask, contours=contours, backend=model_backend("sendevent", screen_size=(200, 200)))
+    s0, m0, e0 = (r["candidates"][0] for r in (swipe, motion, send))
+    assert (s0["mode"], s0["value"]) == (m0["mode"], m0["value"]) == ("step", 1)
+    assert m0["commands"] == s0["commands"] + 1  # DOWN + MOVE... + UP เทียบกับ tap + swipe
+    assert m0["seconds"] != s0["seconds"]
+    assert e0["fidelity"] == m0["fidelity"] > 0.9
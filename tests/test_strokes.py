@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from draw_core import generate_swipe_commands
+from strokes import StrokeSet, CommandBlob
+
+
+def reference(points, seg_ms=18, tap_thresh2=4):
+    # แบบเดิม (ทีละจุดด้วย f-string) + เส้น 2 จุดไม่มี tap นำ
+    pts = [tuple(map(int, p)) for p in points]
+    cmds = [f"input tap {pts[0][0]} {pts[0][1]}"] if len(pts) != 2 else []
+    for (x0, y0), (x1, y1) in zip(pts, pts[1:]):
+        if (x1 - x0) ** 2 + (y1 - y0) ** 2 <= tap_thresh2:
+            cmds.append(f"input tap {x1} {y1}")
+        else:
+            cmds.append(f"input swipe {x0} {y0} {x1} {y1} {seg_ms}")
+    return cmds
+
+
+def test_commands_match_reference():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        pts = rng.integers(0, 3200, size=(int(rng.integers(1, 20)), 2))
+        assert generate_swipe_commands(pts, seg_ms=18) == reference(pts)
+
+
+def test_edge_values_are_exact():
+    assert generate_swipe_commands([[0, 0], [32767, 9]], seg_ms=5) == ["input swipe 0 0 32767 9 5"]
+    assert generate_swipe_commands([[32767, 0]]) == ["input tap 32767 0"]
+
+
+def test_command_counts_match_encoding():
+    s = StrokeSet.from_polylines([np.array([[1, 1]]), np.array([[0, 0], [50, 0]]),
+                                  np.array([[0, 0], [9, 0], [9, 9]])])
+    assert s.command_counts().tolist() == [1, 1, 3]
+    assert len(s.commands()) == s.command_count() == 5
+
+
+@pytest.mark.parametrize("bad", [[[40000, 5], [40010, 5]], [[-1, 5], [10, 5]]])
+def test_out_of_range_coordinates_raise(bad):
+    with pytest.raises(ValueError, match="out of range"):
+        generate_swipe_commands(bad)
+
+
+def test_command_blob_behaves_like_a_list():
+    blob = CommandBlob.from_lines(["a", "bb", "ccc"])
+    assert len(blob) == 3 and list(blob) == ["a", "bb", "ccc"]
+    assert blob[1] == "bb" and blob[1:] == ["bb", "ccc"]
@@ -0,0 +1,60 @@
+import queue
+import socket
+
+import pytest
+
+import utils
+from utils import DeviceTracker
+
+
+@pytest.fixture
+def tracker(adb_server):
+    events = queue.Queue()
+    t = DeviceTracker(lambda *e: events.put(e), retry_s=0.1)
+    t.start()
+    yield t, events
+    t.stop()
+
+
+def _next(events):
+    return events.get(timeout=3)
+
+
+def test_added_changed_removed(tracker, adb_server):
+    t, events = tracker
+    assert _next(events) == ("added", "S1", "device")
+    adb_server.set_device("S2", "unauthorized")
+    assert _next(events) == ("added", "S2", "unauthorized")
+    adb_server.set_device("S2", "device")
+    assert _next(events) == ("changed", "S2", "device")
+    adb_server.set_device("S1", None)
+    assert _next(events) == ("removed", "S1", "device")
+    assert t.devices == {"S2": "device"}
+    assert events.empty()
+
+
+def test_state_change_and_removal_forget_cached_info(tracker, adb_server):
+    t, events = tracker
+    _next(events)
+    utils.remember_device("S1", size=(1080, 2400))
+    adb_server.set_device("S1", "offline")
+    assert _next(events) == ("changed", "S1", "offline")
+    assert "S1" not in utils._device_info
+    utils.remember_device("S1", size=(1080, 2400))
+    adb_server.set_device("S1", None)
+    assert _next(events) == ("removed", "S1", "offline")
+    assert "S1" not in utils._device_info
+
+
+def test_stream_is_reopened_after_it_dies(tracker, adb_server):
+    t, events = tracker
+    assert _next(events) == ("added", "S1", "device")
+    for s in adb_server.conns:
+        try:
+            s.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # connection ที่ปิดไปแล้ว
+    # stream ตาย -> ถือว่าทุกเครื่องหลุด แล้วเปิดใหม่ได้ snapshot เดิมกลับมา
+    assert _next(events) == ("removed", "S1", "device")
+    assert _next(events) == ("added", "S1", "device")
+    assert sum(r == "host:track-devices" for r in adb_server.requests) == 2
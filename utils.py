@@ -1,9 +1,48 @@
-import subprocess, sys, time, re, os
+import subprocess, sys, time, re, os, tempfile, threading, queue
+
+from adb_client import AdbClient, AdbError, AdbSentError, parse_device_list
+import metrics
 
 CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+# ชี้ไปที่ adb ตัวอื่นได้ (เช่น fake adb script ที่บันทึกคำสั่งไว้ตอนทดสอบ)
+ADB = os.environ.get("INSDRAW_ADB", "adb")
+# คุยกับ adb server (5037) ตรงๆ ถ้าเปิดอยู่ ปิดได้ด้วย INSDRAW_NATIVE=0 (ปิดเองถ้าตั้ง INSDRAW_ADB)
+USE_NATIVE = os.environ.get("INSDRAW_NATIVE", "1" if ADB == "adb" else "0") == "1"
+
+_native_client = None
+_native_checked = 0.0
+
+def _native():
+    """
+    AdbClient ถ้าต่อ adb server ได้ ไม่งั้น None (ใช้ adb binary แทน) — probe ซ้ำทุก 5 วิ
+    """
+    global _native_client, _native_checked
+    if not USE_NATIVE:
+        return None
+    if _native_client is None and time.monotonic() - _native_checked > 5.0:
+        _native_checked = time.monotonic()
+        client = AdbClient()
+        if client.available():
+            _native_client = client
+    return _native_client
+
+def _native_failed(serial=None, err=None):
+    """
+    native path ใช้ไม่ได้: ถ้าเป็นปัญหาของเครื่องเดียว (AdbError เช่น device not found หรือ server ยังตอบ)
+    ปิดแค่ session ของ serial นั้น ไม่งั้น (server ไม่ตอบ) เลิกใช้ native ทั้งหมด 5 วิ
+    """
+    global _native_client, _native_checked
+    client = _native_client
+    if client and serial and (not isinstance(err, OSError) or client.available()):
+        client.drop(serial)
+        return
+    if client:
+        client.drop()
+    _native_client = None
+    _native_checked = time.monotonic()
 
 def run_adb(args, serial=None, timeout=None):
-    cmd = ["adb"]
+    cmd = [ADB]
     if serial:
         cmd += ["-s", serial]
     cmd += args
@@ -30,7 +69,60 @@ def adb_path_ok():
     except Exception:
         return False
 
+def _shell(serial, cmd, timeout=None):
+    """
+    รันคำสั่งสั้นบนเครื่อง -> (out, rc)
+    ถ้าคำสั่งถึงเครื่องแล้วแต่ไม่ได้ผล (AdbSentError) จะไม่รันซ้ำผ่าน adb binary -> rc=124
+    """
+    client = _native()
+    if client:
+        try:
+            return client.shell(serial, cmd, timeout=timeout)
+        except AdbSentError:
+            return "", 124
+        except (OSError, AdbError) as e:
+            _native_failed(serial, e)
+    out, err, rc = run_adb(["shell", cmd], serial=serial, timeout=timeout)
+    return out, rc
+
+def _push(serial, local, remote):
+    client = _native()
+    if client:
+        try:
+            client.push(serial, local, remote)
+            return 0, ""
+        except (OSError, AdbError) as e:
+            _native_failed(serial, e)  # push ซ้ำได้ ถอยไปใช้ adb binary
+    out, err, rc = run_adb(["push", local, remote], serial=serial, timeout=120)
+    return rc, err.strip()
+
+def _open_shell(serial, cmd=None, merge_stderr=False):
+    """
+    เปิด shell แบบ stream: SocketShell (native) หรือ Popen ของ adb binary — ใช้ interface เดียวกัน
+    merge_stderr: รวม stderr เข้า stdout (ผู้เรียกที่อ่านแค่ stdout จะได้ไม่ค้างเพราะ pipe ของ stderr เต็ม)
+    """
+    client = _native()
+    if client:
+        try:
+            return client.open_shell(serial, cmd or "sh")
+        except (OSError, AdbError) as e:
+            _native_failed(serial, e)
+    return subprocess.Popen(
+        [ADB, "-s", serial, "shell"] + ([cmd] if cmd else []),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+        text=True,
+        creationflags=CREATE_NO_WINDOW
+    )
+
 def adb_devices():
+    client = _native()
+    if client:
+        try:
+            return [s for s, state in client.devices().items() if state == "device"]
+        except (OSError, AdbError):
+            _native_failed()
     out, err, rc = run_adb(["devices"])
     if rc != 0: return []
     devs = []
@@ -41,49 +133,302 @@ def adb_devices():
             devs.append(serial)
     return devs
 
-def get_screen_size(serial):
-    out, err, rc = run_adb(["shell", "wm", "size"], serial=serial)
-    if rc != 0: return None
+# cache ข้อมูลเครื่อง {serial: {"size": (w,h), "model": str}} ล้างเมื่อเครื่องหลุด
+_device_info = {}
+_device_lock = threading.Lock()
+
+def forget_device(serial=None):
+    with _device_lock:
+        if serial is None:
+            _device_info.clear()
+        else:
+            _device_info.pop(serial, None)
+    if _native_client:
+        _native_client.drop(serial)
+
+def _cached(serial, key, fetch):
+    with _device_lock:
+        val = _device_info.get(serial, {}).get(key)
+    if val is None:
+        val = fetch(serial)
+        if val is not None:
+            with _device_lock:
+                _device_info.setdefault(serial, {})[key] = val
+    return val
+
+def parse_wm_size(out):
     m = re.search(r"Physical size:\s*(\d+)x(\d+)", out)
     if not m: return None
     return int(m.group(1)), int(m.group(2))
 
-def get_device_model(serial):
-    out, err, rc = run_adb(["shell", "getprop", "ro.product.model"], serial=serial)
+def _fetch_screen_size(serial):
+    out, rc = _shell(serial, "wm size")
+    if rc != 0: return None
+    return parse_wm_size(out)
+
+def _fetch_device_model(serial):
+    out, rc = _shell(serial, "getprop ro.product.model")
     if rc != 0: return None
     return out.strip()
 
+def get_screen_size(serial):
+    return _cached(serial, "size", _fetch_screen_size)
+
+def get_device_model(serial):
+    return _cached(serial, "model", _fetch_device_model)
+
+def remember_device(serial, **info):
+    """
+    ใส่ข้อมูลเครื่องที่ได้มาจากที่อื่น (เช่น DeviceService) ลง cache เดียวกับ get_screen_size
+    """
+    with _device_lock:
+        _device_info.setdefault(serial, {}).update({k: v for k, v in info.items() if v is not None})
+
+class _SocketProc:
+    def __init__(self, sock):
+        self.sock = sock
+
+    def kill(self):
+        self.sock.close()
+
+class DeviceTracker:
+    """
+    เปิด `adb track-devices` ค้างไว้ stream เดียวแทนการ poll `adb devices`
+    callback(kind, serial, state): kind = "added" | "removed" | "changed" (เรียกจาก thread ของ tracker)
+    ถ้า stream ตาย (เช่น restart server) จะเปิดใหม่เอง
+    """
+    def __init__(self, callback, retry_s=1.0):
+        self.callback = callback
+        self.retry_s = retry_s
+        self.devices = {}
+        self._proc = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._proc:
+            try:
+                self._proc.kill()
+            except Exception:
+                pass
+
+    def _update(self, snapshot):
+        old = self.devices
+        self.devices = snapshot
+        for serial, state in snapshot.items():
+            if serial not in old:
+                self.callback("added", serial, state)
+            elif old[serial] != state:
+                if state != "device":
+                    forget_device(serial)
+                self.callback("changed", serial, state)
+        for serial, state in old.items():
+            if serial not in snapshot:
+                forget_device(serial)
+                self.callback("removed", serial, state)
+
+    def _read_snapshots(self, stream):
+        # แต่ละ snapshot = ความยาว 4 หลัก hex + payload
+        while not self._stop.is_set():
+            head = stream.read(4)
+            if len(head) < 4:
+                return
+            n = int(head, 16)
+            payload = stream.read(n) if n else b""
+            if len(payload) < n:
+                return
+            self._update(parse_device_list(payload.decode("utf-8", "replace")))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                client = _native()
+                if client:
+                    sock, stream = client.track_devices()
+                    self._proc = _SocketProc(sock)
+                else:
+                    self._proc = subprocess.Popen(
+                        [ADB, "track-devices"],
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.DEVNULL,
+                        stdin=subprocess.DEVNULL,
+                        creationflags=CREATE_NO_WINDOW
+                    )
+                    stream = self._proc.stdout
+                self._read_snapshots(stream)
+            except Exception:
+                pass
+            finally:
+                if self._proc:
+                    try:
+                        self._proc.kill()
+                    except Exception:
+                        pass
+            if not self._stop.is_set():
+                self._update({})
+                self._stop.wait(self.retry_s)
+
+def reset_adb_state():
+    forget_device()
+    _native_failed()
+
 def adb_restart_server():
+    reset_adb_state()
     run_adb(["kill-server"])
     out, err, rc = run_adb(["start-server"])
     return rc == 0
 
-def run_adb_batch(serial, shell_commands, progress_cb=None, cancel_check=None, sleep_ms=8):
+class _AckReader:
+    """
+    อ่าน stdout ของ shell ใน thread แยก แล้วจำเลข marker "@@A <n>" ล่าสุดที่เครื่องรันถึง
+    """
+    def __init__(self, stream):
+        self.acked = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        threading.Thread(target=self._run, args=(stream,), daemon=True).start()
+
+    def _run(self, stream):
+        try:
+            for line in stream:
+                parts = line.split()
+                if len(parts) == 2 and parts[0] == "@@A" and parts[1].isdigit():
+                    with self.cond:
+                        self.acked = max(self.acked, int(parts[1]))
+                        self.cond.notify_all()
+        except Exception:
+            pass
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def wait_for(self, n, timeout):
+        with self.cond:
+            self.cond.wait_for(lambda: self.acked >= n or self.closed, timeout)
+            return self.acked >= n
+
+def calibrate_latency(serial, probes=8, probe_cmd="input keyevent 0"):
+    """
+    วัด latency ต่อคำสั่งบนเครื่อง (ms, median)
+    ส่ง probe ทีละคำสั่ง + echo marker แล้วจับเวลาจนกว่า marker จะกลับมา
+    """
+    proc = _open_shell(serial)
+    reader = _AckReader(proc.stdout)
+    samples = []
+    try:
+        for i in range(1, probes + 1):
+            t0 = time.perf_counter()
+            proc.stdin.write(f"{probe_cmd}\necho @@A {i}\n")
+            proc.stdin.flush()
+            if not reader.wait_for(i, 10):
+                break
+            samples.append((time.perf_counter() - t0) * 1000.0)
+    except Exception:
+        pass
+    finally:
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            proc.kill()
+        except Exception:
+            pass
+    if len(samples) > 1:
+        samples = samples[1:]  # รอบแรกรวมเวลาเปิด shell
+    if not samples:
+        return None
+    samples.sort()
+    return samples[len(samples) // 2]
+
+def auto_pacing(latency_ms, seg_ms=18, buffer_ms=400):
+    """
+    latency (ms) -> {"window", "ack_every", "seg_ms", "sleep_ms"}
+    - window: ให้มีงานค้างบนเครื่องประมาณ buffer_ms ไม่ต้อง sleep ฝั่ง host
+    - seg_ms: เครื่องช้าจะเพิ่มเวลา swipe (อย่างน้อย latency/4) กันเส้นหลุด
+    ถ้าวัด latency ไม่ได้ จะคืนค่าแบบเดิม (sleep 8ms, ไม่มี window)
+    """
+    if not latency_ms:
+        return {"window": 0, "ack_every": 20, "seg_ms": int(seg_ms), "sleep_ms": 8}
+    window = max(4, min(256, int(buffer_ms / latency_ms) + 1))
+    return {
+        "window": window,
+        "ack_every": max(1, window // 2),
+        "seg_ms": max(int(seg_ms), int(latency_ms / 4)),
+        "sleep_ms": 0,
+    }
+
+def run_adb_batch(serial, shell_commands, progress_cb=None, cancel_check=None, sleep_ms=8,
+                  window=0, ack_every=20, total=None, confirm_cb=None):
     """
     ส่งคำสั่ง ADB หลายบรรทัดเพื่อวาดรูป
     1) พยายามเปิด interactive shell แล้วเขียนทีละบรรทัดผ่าน stdin (เร็ว)
     2) ถ้าเขียนไม่ได้/โดนปิด -> fallback เป็นรันก้อนละหลายบรรทัดด้วย 'adb shell sh -c "<...>"'
+    window > 0: แทรก "echo @@A <n>" ทุก ack_every คำสั่ง แล้วให้มีคำสั่งค้างบนเครื่องไม่เกิน window
+    progress จะนับจาก marker ที่เครื่องตอบกลับ (รันจริง) แทนจำนวนที่เขียนไป
+    shell_commands เป็น iterator ได้ (ส่งไปพร้อมกับที่ยังสร้างคำสั่งอยู่) total = ค่าประมาณ (0/None = ไม่รู้)
+    และถ้า shell พังจะไม่ fallback (เล่นซ้ำ iterator ไม่ได้)
+    confirm_cb(n): เรียกเมื่อรู้ว่าเครื่องรันครบ n คำสั่งแรกแล้ว (ใช้ทำ checkpoint) — ถ้าให้มาจะแทรก marker เสมอ
+    แม้ window = 0 (แค่ไม่รอ) และถ้า shell พังหลังยืนยันไปแล้วจะคืน error ให้ผู้เรียก resume เอง (ต้นเส้น)
+    แทนการ fallback
     """
     if not shell_commands:
         return 0, ""
+    if total is None:
+        total = len(shell_commands) if hasattr(shell_commands, "__len__") else 0
+    total = max(1, total)
+    confirmed = 0
+    rec = metrics.current()
+    if rec:
+        rec.start_send(total)
+
+    def confirm(n):
+        nonlocal confirmed
+        if n > confirmed:
+            confirmed = n
+            if rec:
+                rec.confirm(n)
+            if confirm_cb:
+                confirm_cb(n)
     try:
-        proc = subprocess.Popen(
-            ["adb", "-s", serial, "shell"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            creationflags=CREATE_NO_WINDOW
-        )
+        proc = _open_shell(serial)
         if proc.stdin is None:
             raise RuntimeError("stdin is None")
-        total = len(shell_commands)
+        sent = 0
+        reader = None
+        if window > 0 or confirm_cb:
+            reader = _AckReader(proc.stdout)
+            ack_every = max(1, min(ack_every, window // 2 or 1) if window > 0 else ack_every)
+        canceled = False
         for i, cmd in enumerate(shell_commands, 1):
             if cancel_check and cancel_check():
+                canceled = True
                 break
+            if reader and window > 0:
+                # คำสั่งที่ยังไม่ยืนยัน = (i-1) - acked ต้อง < window
+                while not reader.wait_for(i - window, 0.1):
+                    if reader.closed:
+                        raise RuntimeError("shell closed")
+                    if cancel_check and cancel_check():
+                        canceled = True
+                        break
+                if canceled:
+                    break
             try:
+                t0 = time.perf_counter()
                 proc.stdin.write(cmd + "\n")
+                if reader and (i % ack_every == 0 or i == total):
+                    proc.stdin.write(f"echo @@A {i}\n")
                 proc.stdin.flush()
+                if rec:
+                    rec.write(time.perf_counter() - t0)
+                sent = i
             except Exception as e:
 
                 try:
@@ -91,10 +436,29 @@ def run_adb_batch(serial, shell_commands, progress_cb=None, cancel_check=None, s
                 except Exception:
                     pass
                 raise RuntimeError(f"stdin write error: {e}")
+            if reader:
+                confirm(reader.acked)
+                if reader.closed:
+                    raise RuntimeError("shell closed")
             if progress_cb:
-                progress_cb(int(i * 100 / total))
+                progress_cb(min(100, int((reader.acked if reader else i) * 100 / total)))
             if sleep_ms > 0:
                 time.sleep(sleep_ms / 1000.0)
+        if reader and not canceled:
+            if sent % ack_every and sent != total:
+                proc.stdin.write(f"echo @@A {sent}\n")
+                proc.stdin.flush()
+            while not reader.wait_for(sent, 0.1):
+                if reader.closed or (cancel_check and cancel_check()):
+                    break
+                confirm(reader.acked)
+                if progress_cb:
+                    progress_cb(min(100, int(reader.acked * 100 / total)))
+            confirm(reader.acked)
+            if progress_cb:
+                progress_cb(min(100, int(reader.acked * 100 / total)))
+            if reader.acked < sent and not (cancel_check and cancel_check()):
+                raise RuntimeError("shell closed before all commands ran")
         try:
             proc.stdin.close()
         except Exception:
@@ -106,9 +470,11 @@ def run_adb_batch(serial, shell_commands, progress_cb=None, cancel_check=None, s
         except Exception:
             pass
         return proc.returncode or 0, err
-    except Exception:
-
-        pass
+    except Exception as e:
+        if not hasattr(shell_commands, "__getitem__"):
+            return 1, f"interactive shell failed: {e}"
+        if confirmed and confirm_cb:
+            return 1, f"interactive shell failed after {confirmed} commands: {e}"
     CHUNK = 350
     total = len(shell_commands)
     sent  = 0
@@ -121,6 +487,104 @@ def run_adb_batch(serial, shell_commands, progress_cb=None, cancel_check=None, s
         if rc != 0:
             return rc, err or "sh -c batch failed"
         sent = min(start + len(chunk), total)
+        confirm(sent)
         if progress_cb:
             progress_cb(int(sent * 100 / total))
     return 0, ""
+
+REMOTE_DIR = "/data/local/tmp"
+
+def compile_script(shell_commands, marker_every=50):
+    """
+    รวมคำสั่งทั้งหมดเป็น shell script ไฟล์เดียว
+    พิมพ์ "@@PID <pid>" ตอนเริ่ม และ "@@P <n>" ทุก marker_every คำสั่ง (ไว้คิด progress)
+    """
+    total = len(shell_commands)
+    lines = ["#!/system/bin/sh", 'echo "@@PID $$"']
+    for i, cmd in enumerate(shell_commands, 1):
+        lines.append(cmd)
+        if i % marker_every == 0 or i == total:
+            lines.append(f"echo @@P {i}")
+    lines.append("echo @@END")
+    return "\n".join(lines) + "\n"
+
+def run_adb_script(serial, shell_commands, progress_cb=None, cancel_check=None, marker_every=50,
+                   confirm_cb=None):
+    """
+    compile → adb push ไป /data/local/tmp ครั้งเดียว → รันบนเครื่องรอบเดียว
+    progress มาจาก marker ที่ script พิมพ์ออก stdout, cancel = kill process บนเครื่อง
+    stderr รวมเข้า stdout (อ่าน stream เดียว) บรรทัดที่ไม่ใช่ marker เก็บท้ายๆ ไว้เป็นข้อความ error
+    confirm_cb(n): เรียกทุก marker (รันครบ n คำสั่งแล้ว); ถ้า stream จบก่อนเจอ @@END ถือว่าหลุด (rc=1)
+    """
+    if not shell_commands:
+        return 0, ""
+    total = len(shell_commands)
+    rec = metrics.current()
+    fd, local = tempfile.mkstemp(prefix="insdraw_", suffix=".sh")
+    with os.fdopen(fd, "wb") as f:
+        f.write(compile_script(shell_commands, marker_every).encode("utf-8"))
+    remote = f"{REMOTE_DIR}/{os.path.basename(local)}"
+    try:
+        with metrics.stage("push"):
+            rc, err = _push(serial, local, remote)
+    finally:
+        os.remove(local)
+    if rc != 0:
+        return rc, err or "adb push failed"
+
+    proc = _open_shell(serial, f"sh {remote}", merge_stderr=True)
+    lines = queue.Queue()
+    other = []
+    def reader():
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+    threading.Thread(target=reader, daemon=True).start()
+
+    pid = None
+    canceled = False
+    finished = False
+    if rec:
+        rec.start_send(total)
+    try:
+        while True:
+            if cancel_check and cancel_check():
+                canceled = True
+                break
+            try:
+                line = lines.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if line is None:
+                break
+            parts = line.split()
+            if len(parts) == 2 and parts[0] == "@@PID":
+                pid = parts[1]
+            elif len(parts) == 2 and parts[0] == "@@P":
+                if rec:
+                    rec.confirm(int(parts[1]))
+                if confirm_cb:
+                    confirm_cb(int(parts[1]))
+                if progress_cb:
+                    progress_cb(int(int(parts[1]) * 100 / total))
+            elif parts == ["@@END"]:
+                finished = True
+            elif line.strip():
+                other = (other + [line.strip()])[-20:]
+        if canceled:
+            if pid:
+                # ฆ่าลูก (input ที่กำลังรัน) แล้วค่อยฆ่า script
+                _shell(serial, f"pkill -P {pid}; kill {pid}", timeout=10)
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        proc.wait()
+        err = "\n".join(other)
+        if canceled:
+            return 0, err
+        if not finished:
+            return proc.returncode or 1, err or "draw script ended early (device disconnected?)"
+        return proc.returncode or 0, err
+    finally:
+        _shell(serial, f"rm -f {remote}", timeout=10)